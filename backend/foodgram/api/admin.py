@@ -1,16 +1,120 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils.functional import cached_property
 
-from .models import (Ingredients, ListFavorite, ListIngredients, Recipes,
-                     ShoppingCartIngredients, Tags, Units, User)
+from .constants import ESTIMATED_COUNT_THRESHOLD
+from .deletion import schedule_deletion
+from .jobs import FAILED, QUEUED
+from .models import (DeletionJob, Ingredients, ListFavorite, ListIngredients,
+                     MealPlan, MealPlanEntry, Recipes, ShoppingCartIngredients,
+                     Tags, Units, User)
+from .tag_masks import sync_tags_mask
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой размера таблицы из статистики PostgreSQL.
+
+    Оценка берётся только для запросов без фильтров и только для больших
+    таблиц, в остальных случаях выполняется обычный COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE relname = %s',
+                        [self.object_list.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                    return int(row[0])
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех значений."""
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (name, value)
+            for name, value in changelist.get_filters_params().items()
+            if name != self.parameter_name
+        )
+        yield all_choice
+
+
+class UserEmailFilter(InputFilter):
+    title = 'email пользователя'
+    parameter_name = 'user_email'
+    lookup = 'user__email__istartswith'
+
+
+class RecipeNameFilter(InputFilter):
+    title = 'названию рецепта'
+    parameter_name = 'recipe_name'
+    lookup = 'recipe__name__istartswith'
+
+
+class IngredientNameFilter(InputFilter):
+    title = 'названию ингредиента'
+    parameter_name = 'ingredient_name'
+    lookup = 'ingredient__name__istartswith'
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    """Базовая админка для больших таблиц."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ScheduledDeletionAdmin(PerformanceAdmin):
+    """Удаление через фоновую очистку вместо каскада в одной транзакции.
+
+    Страница подтверждения не собирает все зависимые объекты: для автора
+    с тысячами рецептов это тот же каскад, только ради списка.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            schedule_deletion(obj)
 
 
 @admin.register(Ingredients)
-class IngredientsAdmin(admin.ModelAdmin):
+class IngredientsAdmin(PerformanceAdmin):
     list_display = (
         'name', 'measurement_unit'
     )
+    list_select_related = ('measurement_unit',)
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
 
 
 @admin.register(Units)
@@ -19,34 +123,49 @@ class UnitsAdmin(admin.ModelAdmin):
 
 
 @admin.register(ListFavorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(PerformanceAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'user__username', 'recipe__name')
+    list_filter = (UserEmailFilter, RecipeNameFilter)
+    autocomplete_fields = ('user', 'recipe')
 
 
 class ListIngredientsInLine(admin.TabularInline):
     model = ListIngredients
     extra = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipes)
-class RecipesAdmin(admin.ModelAdmin):
+class RecipesAdmin(ScheduledDeletionAdmin):
     list_display = (
         'name', 'text',
         'author', 'cooking_time', 'image',
         'display_tags', 'display_ingredients',
         'display_recipe_favorite',
     )
+    list_select_related = ('author',)
     search_fields = ('name', 'author__email')
     list_filter = ('tags',)
+    autocomplete_fields = ('author',)
     inlines = [
         ListIngredientsInLine,
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'tags', 'ingredients'
+        ).annotate(
+            favorite_count=Count('recipe_favorite', distinct=True)
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        sync_tags_mask(form.instance)
+
     def display_recipe_favorite(self, obj):
-        count = ListFavorite.objects.filter(recipe=obj).count()
-        return count
+        return obj.favorite_count
 
     def display_tags(self, obj):
         return ', '.join([str(item) for item in obj.tags.all()])
@@ -59,13 +178,17 @@ class RecipesAdmin(admin.ModelAdmin):
     display_recipe_favorite.short_description = (
         'Количесво добавлений в избранное'
     )
+    display_recipe_favorite.admin_order_field = 'favorite_count'
 
 
 @admin.register(ListIngredients)
-class ListIngredientsAdmin(admin.ModelAdmin):
+class ListIngredientsAdmin(PerformanceAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    list_filter = (RecipeNameFilter, IngredientNameFilter)
+    raw_id_fields = ('recipe',)
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Tags)
@@ -76,13 +199,58 @@ class TagsAdmin(admin.ModelAdmin):
 
 
 @admin.register(ShoppingCartIngredients)
-class ShoppingCartIngredientsAdmin(admin.ModelAdmin):
+class ShoppingCartIngredientsAdmin(PerformanceAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'user__username', 'recipe__name')
+    list_filter = (UserEmailFilter, RecipeNameFilter)
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ScheduledDeletionAdmin):
     list_display = ('email', 'username', 'first_name', 'last_name')
     search_fields = ('email', 'username')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(is_hidden=False)
+
+
+class MealPlanEntryInLine(admin.TabularInline):
+    model = MealPlanEntry
+    extra = 1
+    raw_id_fields = ('recipe',)
+
+
+@admin.register(MealPlan)
+class MealPlanAdmin(PerformanceAdmin):
+    list_display = ('name', 'user', 'week_start', 'version')
+    list_select_related = ('user',)
+    search_fields = ('name', 'user__email')
+    autocomplete_fields = ('user',)
+    inlines = [
+        MealPlanEntryInLine,
+    ]
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'kind', 'object_id', 'status', 'step', 'deleted', 'attempts',
+        'updated_at',
+    )
+    list_filter = ('kind', 'status')
+    readonly_fields = (
+        'kind', 'object_id', 'status', 'step', 'deleted', 'error',
+        'attempts', 'retry_at', 'created_at', 'updated_at',
+    )
+    actions = ('retry',)
+
+    @admin.action(description='Повторить удаление')
+    def retry(self, request, queryset):
+        queryset.filter(status=FAILED).update(
+            status=QUEUED, attempts=0, retry_at=None
+        )
+
+    def has_add_permission(self, request):
+        return False
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def backfill_tag_bits(sender, **kwargs):
+    # Миграции не хранятся в репозитории, поэтому данные для нового поля
+    # bit заполняются после migrate: теги, созданные до его появления или
+    # через bulk_create, получают биты, а их рецепты - маски.
+    from .tag_masks import backfill_tag_bits
+
+    backfill_tag_bits()
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(backfill_tag_bits, sender=self)
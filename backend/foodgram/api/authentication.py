@@ -0,0 +1,63 @@
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import TieredCache
+from .invalidation import TOKEN, USER
+
+
+class TokenCache(TieredCache):
+    """Двухуровневый кеш token -> (user, token) и профиля для /users/me/.
+
+    Настройки - TOKEN_CACHE, второй уровень по умолчанию отключён.
+    """
+
+    settings_name = 'TOKEN_CACHE'
+    key_prefix = 'auth-token'
+
+    def get_profile(self, key, host):
+        entry = self.get(key)
+        return entry and entry['profiles'].get(host)
+
+    def set_profile(self, key, host, profile):
+        entry = self.get(key)
+        if entry is not None:
+            self.set(key, {
+                **entry, 'profiles': {**entry['profiles'], host: profile}
+            })
+
+    def invalidate(self, key):
+        self.delete(key)
+
+    def invalidate_user(self, user_id):
+        for key in Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True):
+            self.invalidate(key)
+
+    def invalidate_keys(self, keys):
+        """Подписчик шины: удалённые токены и изменённые пользователи.
+
+        Подписан с ``broadcast``, поэтому выход, удаление токена, смена
+        пароля и деактивация сбрасывают кеш во всех процессах, а не только
+        в том, что обработал запрос.
+        """
+        for key in keys:
+            if key.kind == TOKEN:
+                self.invalidate(key.pk)
+            elif key.kind == USER:
+                self.invalidate_user(key.pk)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для недавно виденных токенов."""
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            entry = {'user': user, 'token': token, 'profiles': {}}
+            token_cache.set(key, entry)
+        return entry['user'], entry['token']
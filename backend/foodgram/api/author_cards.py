@@ -0,0 +1,78 @@
+from users.models import User
+
+from .cache import TieredCache
+
+CARD_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+
+
+def make_card(row):
+    """Статическая часть карточки автора из строки ``.values()``.
+
+    Аватар хранится относительной ссылкой: абсолютный адрес зависит от
+    хоста запроса и собирается при выдаче.
+    """
+    card = {name: row[name] for name in CARD_FIELDS}
+    avatar = row['avatar']
+    card['avatar'] = (
+        User._meta.get_field('avatar').storage.url(avatar) if avatar else None
+    )
+    return card
+
+
+def render_card(card, request, is_subscribed):
+    """Карточка для ответа: поля в порядке UserSerializer."""
+    avatar = card['avatar']
+    if avatar and request is not None:
+        avatar = request.build_absolute_uri(avatar)
+    return {
+        'id': card['id'],
+        'email': card['email'],
+        'username': card['username'],
+        'first_name': card['first_name'],
+        'last_name': card['last_name'],
+        'is_subscribed': is_subscribed,
+        'avatar': avatar,
+    }
+
+
+class AuthorCardCache(TieredCache):
+    """Кеш карточек авторов: одна запись на пользователя для всех зрителей.
+
+    ``is_subscribed`` зависит от зрителя и в кеш не попадает. Запись
+    сбрасывается при сохранении или удалении пользователя, в том числе
+    при смене аватара.
+    """
+
+    settings_name = 'AUTHOR_CARDS'
+    key_prefix = 'author-card'
+
+    def get_cards(self, user_ids):
+        cards = self.get_many(user_ids)
+        missing = set(user_ids) - cards.keys()
+        if missing:
+            loaded = {
+                row['id']: make_card(row)
+                for row in User.objects.filter(id__in=missing).values(
+                    *CARD_FIELDS, 'avatar'
+                )
+            }
+            self.set_many(loaded)
+            cards.update(loaded)
+        return cards
+
+    def get_card(self, user):
+        card = self.get(user.pk)
+        if card is None:
+            card = make_card({
+                **{name: getattr(user, name) for name in CARD_FIELDS},
+                'avatar': user.avatar.name,
+            })
+            self.set(user.pk, card)
+        return card
+
+    def invalidate(self, user_ids):
+        for user_id in user_ids:
+            self.delete(user_id)
+
+
+author_cards = AuthorCardCache()
@@ -0,0 +1,119 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.signals import got_request_exception
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .constants import BATCH_MAX_WORKERS, BATCH_RESPONSE_HEADERS
+from .invalidation import bus
+from .viewer_state import ViewerState
+
+API_PREFIX = '/api/'
+
+
+def build_request(request, item):
+    """WSGI-запрос под-запроса поверх окружения пакетного запроса.
+
+    Аутентификация не повторяется: DRF берёт пользователя и токен из
+    ``_force_auth_user``/``_force_auth_token``, как в тестовом клиенте.
+    """
+    path, _, query = item['path'].partition('?')
+    body = b''
+    if 'body' in item:
+        body = json.dumps(item['body']).encode()
+    environ = {
+        name: value for name, value in request.META.items()
+        if not name.startswith('HTTP_') or name == 'HTTP_HOST'
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    for name, value in item.get('headers', {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def response_body(response):
+    if isinstance(response, Response):
+        return response.data
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    return content.decode(response.charset, 'replace') or None
+
+
+def error(status, detail):
+    return {'status': status, 'headers': {}, 'body': {'detail': detail}}
+
+
+def run_item(request, item, state, batch_view):
+    """Выполняет один под-запрос и возвращает его ответ для пакета."""
+    if not item['path'].startswith(API_PREFIX):
+        return error(400, f'Путь должен начинаться с {API_PREFIX}.')
+    sub_request = build_request(request, item)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return error(404, 'Страница не найдена.')
+    if getattr(match.func, 'cls', None) is batch_view:
+        return error(400, 'Пакеты нельзя вкладывать друг в друга.')
+    sub_request.viewer_state = state
+    try:
+        # Свой batch() на под-запрос: кеши сбрасываются до следующего.
+        with bus.batch():
+            response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        got_request_exception.send(sender=None, request=sub_request)
+        return error(500, 'Внутренняя ошибка сервера.')
+    if item['method'] not in SAFE_METHODS:
+        state.clear()
+    return {
+        'status': response.status_code,
+        'headers': {
+            name: response[name]
+            for name in BATCH_RESPONSE_HEADERS if response.has_header(name)
+        },
+        'body': response_body(response),
+    }
+
+
+def run_read(request, item, state, batch_view):
+    try:
+        return run_item(request, item, state, batch_view)
+    finally:
+        # У каждого потока своё соединение с базой.
+        connections.close_all()
+
+
+def run_batch(request, items, batch_view):
+    """Ответы под-запросов в порядке запроса.
+
+    Пакет только из чтений выполняется в пуле потоков. Если в пакете есть
+    запись, все под-запросы идут по очереди: чтение после записи видит её.
+    """
+    state = ViewerState(request.user)
+    if (
+        BATCH_MAX_WORKERS < 2 or len(items) < 2
+        or any(item['method'] not in SAFE_METHODS for item in items)
+    ):
+        return [run_item(request, item, state, batch_view) for item in items]
+    with ThreadPoolExecutor(
+        max_workers=min(BATCH_MAX_WORKERS, len(items))
+    ) as pool:
+        return list(pool.map(
+            lambda item: run_read(request, item, state, batch_view), items
+        ))
@@ -0,0 +1,47 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BUNDLE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+IMAGES_DIR = 'images'
+
+
+def chunk_name(index):
+    return f'recipes-{index:05d}.ndjson.gz'
+
+
+def write_json(path, data):
+    """Атомарно записывает JSON: через временный файл и rename."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class Checkpoint:
+    """Состояние экспорта или импорта для продолжения после сбоя."""
+
+    def __init__(self, path, **defaults):
+        self.path = path
+        self.data = defaults
+        if os.path.exists(path):
+            with open(path, encoding='utf8') as file:
+                self.data.update(json.load(file))
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def save(self, **values):
+        self.data.update(values)
+        write_json(self.path, self.data)
+
+
+def copy_files(pairs, copy, workers):
+    """Копирует файлы в пуле потоков.
+
+    ``copy(source, target)`` копирует один файл и возвращает 1 или 0, если
+    файл уже на месте. Возвращает число скопированных файлов.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(lambda pair: copy(*pair), pairs))
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+
+from .metrics import counter
+
+cache_requests = counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кешам по результату: hit или miss.',
+)
+
+
+def record_lookups(name, hits, misses=0):
+    if hits:
+        cache_requests.inc(hits, cache=name, result='hit')
+    if misses:
+        cache_requests.inc(misses, cache=name, result='miss')
+
+
+class LocalTTLCache:
+    """Ограниченный LRU-кеш в памяти процесса со сроком жизни записей."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TieredCache:
+    """Двухуровневый кеш: LRU в памяти процесса и общий кеш Django.
+
+    Настройки берутся из словаря ``settings_name``: LOCAL_TTL, SHARED_TTL,
+    MAX_SIZE и SHARED_CACHE - алиас из CACHES или None, чтобы обойтись
+    без второго уровня. В своём процессе сброс срабатывает сразу, в
+    остальных - не позже LOCAL_TTL.
+    """
+
+    settings_name = None
+    key_prefix = None
+    defaults = {
+        'LOCAL_TTL': 30,
+        'SHARED_TTL': 300,
+        'MAX_SIZE': 10000,
+        'SHARED_CACHE': None,
+    }
+
+    @cached_property
+    def config(self):
+        return {
+            **self.defaults,
+            **getattr(settings, self.settings_name, {}),
+        }
+
+    @cached_property
+    def local(self):
+        return LocalTTLCache(
+            self.config['MAX_SIZE'], self.config['LOCAL_TTL']
+        )
+
+    @cached_property
+    def shared(self):
+        alias = self.config['SHARED_CACHE']
+        return caches[alias] if alias else None
+
+    def make_key(self, key):
+        return f'{self.key_prefix}:{key}'
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(self.make_key(key))
+            if value is not None:
+                self.local.set(key, value)
+        record_lookups(self.key_prefix, value is not None, value is None)
+        return value
+
+    def get_many(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing and self.shared is not None:
+            shared = self.shared.get_many(
+                [self.make_key(key) for key in missing]
+            )
+            for key in missing:
+                value = shared.get(self.make_key(key))
+                if value is not None:
+                    self.local.set(key, value)
+                    found[key] = value
+        record_lookups(self.key_prefix, len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(
+                self.make_key(key), value, self.config['SHARED_TTL']
+            )
+
+    def set_many(self, values):
+        for key, value in values.items():
+            self.local.set(key, value)
+        if values and self.shared is not None:
+            self.shared.set_many(
+                {self.make_key(key): value for key, value in values.items()},
+                self.config['SHARED_TTL'],
+            )
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.make_key(key))
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from users.models import ListSubscriptions
+
+from .conditional import bump_recipe_versions
+from .constants import SYNC_BATCH_SIZE, SYNC_SETTLE_SECONDS
+from .invalidation import FAVORITE, RECIPE, SHOPPING_CART, SUBSCRIPTION
+from .models import ChangeLog, ListFavorite, ShoppingCartIngredients
+
+# Модель списка пользователя: (вид, поле пользователя, поле объекта).
+USER_LISTS = {
+    ListFavorite: (FAVORITE, 'user_id', 'recipe_id'),
+    ShoppingCartIngredients: (SHOPPING_CART, 'user_id', 'recipe_id'),
+    ListSubscriptions: (SUBSCRIPTION, 'author_id', 'subscription_on_id'),
+}
+USER_LISTS_BY_KIND = {
+    kind: model for model, (kind, *_) in USER_LISTS.items()
+}
+# Списки пользователя в ответе синхронизации.
+SYNC_LISTS = (
+    (FAVORITE, 'favorites'),
+    (SHOPPING_CART, 'shopping_cart'),
+    (SUBSCRIPTION, 'subscriptions'),
+)
+
+
+def log_changes(kind, object_ids, user_id=None):
+    ChangeLog.objects.bulk_create(
+        ChangeLog(kind=kind, object_id=object_id, user_id=user_id)
+        for object_id in object_ids
+    )
+
+
+def record_recipe_changes(keys):
+    """Подписчик шины: версии рецептов и журнал изменений.
+
+    Записи появляются после коммита, поэтому номер в журнале не может
+    оказаться меньше уже выданного клиенту курсора из-за долгой транзакции.
+    Рецепт из события, которого больше нет, - удалённый.
+    """
+    changed = bump_recipe_versions(keys)
+    deleted = {key.pk for key in keys if key.kind == RECIPE} - changed
+    log_changes(RECIPE, sorted(changed | deleted))
+
+
+def log_user_list_change(sender, instance, using, **kwargs):
+    """post_save/post_delete списков пользователя: запись после коммита."""
+    kind, user_field, object_field = USER_LISTS[sender]
+    transaction.on_commit(partial(
+        log_changes, kind, (getattr(instance, object_field),),
+        getattr(instance, user_field),
+    ), using=using)
+
+
+def latest_cursor():
+    return ChangeLog.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    ).aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+def is_expired(since):
+    """Курсор старше очищенной части журнала: нужна полная загрузка."""
+    first = ChangeLog.objects.aggregate(first=Min('id'))['first']
+    return first is not None and since < first - 1
+
+
+def collect_changes(since, user, limit=SYNC_BATCH_SIZE):
+    """Объекты, изменившиеся после курсора, сгруппированные по видам.
+
+    Свежие записи моложе SYNC_SETTLE_SECONDS откладываются до следующей
+    синхронизации: так параллельные вставки успевают закоммититься.
+    """
+    condition = Q(user=None)
+    if not user.is_anonymous:
+        condition |= Q(user=user)
+    rows = list(ChangeLog.objects.filter(
+        condition,
+        id__gt=since,
+        created_at__lt=timezone.now() - timedelta(
+            seconds=SYNC_SETTLE_SECONDS
+        ),
+    ).values_list('id', 'kind', 'object_id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = {}
+    for _, kind, object_id in rows:
+        changes.setdefault(kind, set()).add(object_id)
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': has_more,
+        'changes': changes,
+    }
+
+
+def user_list_state(kind, user, object_ids):
+    """Делит объекты списка пользователя на добавленные и убранные."""
+    if not object_ids:
+        return {'added': [], 'removed': []}
+    model = USER_LISTS_BY_KIND[kind]
+    _, user_field, object_field = USER_LISTS[model]
+    present = set(model.objects.filter(**{
+        user_field: user.id, f'{object_field}__in': object_ids,
+    }).values_list(object_field, flat=True))
+    return {
+        'added': sorted(present),
+        'removed': sorted(set(object_ids) - present),
+    }
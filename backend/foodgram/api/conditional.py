@@ -0,0 +1,107 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from users.models import ListSubscriptions
+
+from .invalidation import INGREDIENT, RECIPE, TAG, USER
+from .models import ListFavorite, Recipes, ShoppingCartIngredients
+
+STAMP_VALUES = ('id', 'version', 'updated_at', 'author_id')
+VERSION_FILTERS = {
+    RECIPE: 'pk__in',
+    USER: 'author_id__in',
+    TAG: 'tags__in',
+    INGREDIENT: 'ingredients__in',
+}
+
+
+def bump_recipe_versions(keys):
+    """Повышает версию рецептов, чей ответ API изменился.
+
+    Подписчик шины: кроме самих рецептов, их выдачу меняют правки профиля
+    автора, переименование тегов и ингредиентов. Возвращает id рецептов,
+    которые ещё существуют.
+    """
+    ids = {}
+    for key in keys:
+        ids.setdefault(VERSION_FILTERS[key.kind], set()).add(key.pk)
+    condition = Q()
+    for lookup, values in ids.items():
+        condition |= Q(**{lookup: values})
+    changed = set(
+        Recipes.objects.filter(condition).values_list('pk', flat=True)
+    )
+    Recipes.objects.filter(pk__in=changed).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    return changed
+
+
+def viewer_flags(user, fields=None, expand=None):
+    """EXISTS-подзапросы для полей зрителя, которые попадут в ответ.
+
+    Без ``?fields=`` нужны все; ``is_subscribed`` есть только в раскрытой
+    карточке автора.
+    """
+    flags = {}
+    if fields is None or 'is_favorited' in fields:
+        flags['viewer_favorited'] = Exists(ListFavorite.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ))
+    if fields is None or 'is_in_shopping_cart' in fields:
+        flags['viewer_in_cart'] = Exists(
+            ShoppingCartIngredients.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )
+        )
+    if fields is None or ('author' in fields and 'author' in expand):
+        flags['viewer_subscribed'] = Exists(ListSubscriptions.objects.filter(
+            author=user, subscription_on=OuterRef('author_id')
+        ))
+    return flags
+
+
+def recipe_stamps(queryset, user, fields=None, expand=None):
+    """Версии рецептов и флаги зрителя - всё, от чего зависит ETag.
+
+    ``is_favorited``, ``is_in_shopping_cart`` и ``is_subscribed`` в ответе
+    зависят от зрителя, поэтому они читаются тем же запросом через EXISTS,
+    и только если есть в ответе (``fields`` и ``expand`` из
+    ``sparse_params``).
+    """
+    flags = {} if user.is_anonymous else viewer_flags(user, fields, expand)
+    if not flags:
+        return queryset.values_list(*STAMP_VALUES)
+    return queryset.annotate(**flags).values_list(*STAMP_VALUES, *flags)
+
+
+def make_etag(request, *parts):
+    """ETag из версий, а не из тела ответа: сериализация не нужна."""
+    digest = hashlib.sha1(repr((
+        request.get_host(),
+        request.accepted_renderer.format,
+        request.query_params.urlencode(),
+        parts,
+    )).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag, last_modified=None):
+    """304 или 412 по заголовкам If-*; None, если нужен полный ответ."""
+    return get_conditional_response(
+        request, etag=etag,
+        last_modified=last_modified and timegm(last_modified.utctimetuple()),
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(
+            timegm(last_modified.utctimetuple())
+        )
+    return response
@@ -3,3 +3,51 @@ INGREDIENTS_LIMIT_LENGHT = 128
 MEASUREMENT_UNIT_LENGHT = 64
 TEXT_LIMIT_LENGHT = 256
 PAGE_SIZE_PAGINATION = 6
+ESTIMATED_COUNT_THRESHOLD = 100000
+RECIPES_PER_THROTTLE_COST = 10
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_MAX_EXPONENT = 50
+RANKING_WATERMARK_NAME = 'recipes'
+RANKING_BATCH_SIZE = 1000
+# Маска тегов хранится в знаковом BIGINT, старший бит не используем.
+MAX_TAG_BITS = 63
+COOKING_TIME_BUCKETS = ((0, 15), (15, 30), (30, 60), (60, None))
+FACET_AUTHORS_LIMIT = 20
+FACETS_CACHE_TIMEOUT = 600
+FACETS_TIMEOUT_MS = 200
+PROFILE_STATS_LIMIT = 40
+# Бюджеты bench_startup в CI: замер ~640 и ~580 мс плюс запас на шум.
+STARTUP_IMPORT_BUDGET_MS = 800
+STARTUP_FIRST_REQUEST_BUDGET_MS = 750
+SYNC_BATCH_SIZE = 500
+SYNC_SETTLE_SECONDS = 2
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+BATCH_RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Location', 'Retry-After')
+DELETION_BATCH_SIZE = 1000
+DELETION_MAX_ATTEMPTS = 5
+# Повтор через 5, 10, 20... минут после ошибки.
+DELETION_RETRY_SECONDS = 300
+# Задача в статусе running без прогресса дольше этого считается брошенной.
+DELETION_LEASE_SECONDS = 600
+USER_SEARCH_LIMIT = 10
+USER_SEARCH_MAX_LIMIT = 50
+USER_SEARCH_CANDIDATES = 200
+USER_SEARCH_MIN_LENGTH = 3
+# Как pg_trgm.word_similarity_threshold по умолчанию.
+USER_SEARCH_SIMILARITY = 0.6
+MINHASH_PERMUTATIONS = 64
+MINHASH_SEED = 20240601
+# 16 полос по 4 строки: пара с похожестью 0.8 попадает в кандидаты
+# с вероятностью 1 - (1 - 0.8 ** 4) ** 16, то есть почти всегда.
+LSH_BANDS = 16
+NAME_SHINGLE_SIZE = 3
+DEDUP_MAX_RESULTS = 5
+DEDUP_MAX_BUCKET_SIZE = 500
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_QUEUE_SIZE = 100
+EVENTS_RETRY_MS = 3000
+EVENTS_TICKET_SECONDS = 30
+MEAL_PLAN_LIST_TIMEOUT = 3600
+PRINTABLE_CLEANUP_INTERVAL = 600
+METRICS_OVERHEAD_BUDGET_US = 50
@@ -0,0 +1,149 @@
+import hashlib
+import random
+import re
+import struct
+
+from django.conf import settings
+from django.db import transaction
+
+from .constants import (DEDUP_MAX_RESULTS, LSH_BANDS, MINHASH_PERMUTATIONS,
+                        MINHASH_SEED, NAME_SHINGLE_SIZE)
+from .invalidation import RECIPE
+from .models import ListIngredients, RecipeBand, Recipes, RecipeSignature
+
+MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(MINHASH_SEED)
+# Коэффициенты хеш-функций (a * x + b) mod p вместо перестановок.
+PERMUTATIONS = tuple(
+    (_random.randrange(1, MERSENNE_PRIME), _random.randrange(MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+)
+ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+SIGNATURE_FORMAT = f'<{MINHASH_PERMUTATIONS}Q'
+
+
+def features(name, ingredient_ids):
+    """Множество признаков: id ингредиентов и шинглы названия."""
+    name = ' '.join(re.findall(r'\w+', name.lower()))
+    result = {f'i:{ingredient_id}' for ingredient_id in ingredient_ids}
+    result.update(
+        'n:' + name[i:i + NAME_SHINGLE_SIZE]
+        for i in range(max(len(name) - NAME_SHINGLE_SIZE + 1, 1))
+    )
+    return result
+
+
+def stable_hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little'
+    )
+
+
+def minhash(items):
+    hashes = [stable_hash(item) for item in items]
+    return tuple(
+        min((a * value + b) % MERSENNE_PRIME for value in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+
+def buckets(signature):
+    """Корзины LSH: хеш номера полосы и её значений, знаковый BIGINT."""
+    return [
+        int.from_bytes(hashlib.blake2b(struct.pack(
+            f'<H{ROWS_PER_BAND}Q', band,
+            *signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        ), digest_size=8).digest(), 'little', signed=True)
+        for band in range(LSH_BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по совпавшим позициям подписей."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def pack(signature):
+    return struct.pack(SIGNATURE_FORMAT, *signature)
+
+
+def unpack(data):
+    return struct.unpack(SIGNATURE_FORMAT, bytes(data))
+
+
+def compute(row):
+    """(id, название, id ингредиентов) -> (id, подпись, корзины).
+
+    Без обращений к базе: команда выполняет это в дочерних процессах.
+    """
+    recipe_id, name, ingredient_ids = row
+    signature = minhash(features(name, ingredient_ids))
+    return recipe_id, signature, buckets(signature)
+
+
+def signature_rows(recipe_ids):
+    """Названия и ингредиенты видимых рецептов для compute()."""
+    ingredients = {}
+    for recipe_id, ingredient_id in ListIngredients.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients.setdefault(recipe_id, []).append(ingredient_id)
+    return [
+        (recipe_id, name, ingredients.get(recipe_id, []))
+        for recipe_id, name in Recipes.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', 'name')
+    ]
+
+
+@transaction.atomic
+def store_signatures(results):
+    recipe_ids = [recipe_id for recipe_id, _, _ in results]
+    RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeBand.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSignature.objects.bulk_create(
+        RecipeSignature(recipe_id=recipe_id, minhash=pack(signature))
+        for recipe_id, signature, _ in results
+    )
+    RecipeBand.objects.bulk_create(
+        RecipeBand(recipe_id=recipe_id, bucket=bucket)
+        for recipe_id, _, recipe_buckets in results
+        for bucket in recipe_buckets
+    )
+
+
+def update_signatures(keys):
+    """Подписчик шины: пересчёт подписей изменённых рецептов.
+
+    Подписи удалённых и скрытых рецептов убираются.
+    """
+    recipe_ids = {key.pk for key in keys if key.kind == RECIPE}
+    rows = signature_rows(recipe_ids)
+    gone = recipe_ids - {row[0] for row in rows}
+    RecipeSignature.objects.filter(recipe_id__in=gone).delete()
+    RecipeBand.objects.filter(recipe_id__in=gone).delete()
+    store_signatures([compute(row) for row in rows])
+
+
+def find_duplicates(name, ingredient_ids, exclude_id=None, threshold=None):
+    """Похожие видимые рецепты: [(id, похожесть)] по убыванию.
+
+    Кандидаты - рецепты хотя бы с одной общей корзиной LSH, поэтому
+    просматривается не весь каталог.
+    """
+    if threshold is None:
+        threshold = settings.RECIPE_DEDUP['THRESHOLD']
+    _, signature, recipe_buckets = compute((None, name, ingredient_ids))
+    candidates = RecipeSignature.objects.filter(
+        recipe__in=RecipeBand.objects.filter(
+            bucket__in=recipe_buckets
+        ).values('recipe_id'),
+        recipe__is_hidden=False,
+    ).exclude(recipe_id=exclude_id).values_list('recipe_id', 'minhash')
+    found = [
+        (recipe_id, similarity(signature, unpack(data)))
+        for recipe_id, data in candidates
+    ]
+    found = [row for row in found if row[1] >= threshold]
+    found.sort(key=lambda row: (-row[1], row[0]))
+    return found[:DEDUP_MAX_RESULTS]
@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from users.models import ListSubscriptions, User
+
+from .constants import (DELETION_BATCH_SIZE, DELETION_LEASE_SECONDS,
+                        DELETION_MAX_ATTEMPTS, DELETION_RETRY_SECONDS,
+                        RANKING_WATERMARK_NAME)
+from .invalidation import RECIPE, DirtyKey, bus
+from .jobs import DONE, FAILED, QUEUED, RUNNING
+from .models import (ChangeLog, DeletionJob, ListFavorite, ListIngredients,
+                     MealPlan, MealPlanEntry, RankingWatermark, RecipeBand,
+                     Recipes, RecipeSignature, ShoppingCartIngredients)
+from .rankings import INTERACTIONS, recount_popularity, trending_weight
+
+RecipeTags = Recipes.tags.through
+
+
+def recipe_steps(recipe_id):
+    """Шаги удаления рецепта: (модель, фильтр), зависимые раньше."""
+    return (
+        (ListFavorite, {'recipe_id': recipe_id}),
+        (ShoppingCartIngredients, {'recipe_id': recipe_id}),
+        (MealPlanEntry, {'recipe_id': recipe_id}),
+        (ListIngredients, {'recipe_id': recipe_id}),
+        (RecipeTags, {'recipes_id': recipe_id}),
+        (RecipeBand, {'recipe_id': recipe_id}),
+        (RecipeSignature, {'recipe_id': recipe_id}),
+        (Recipes, {'pk': recipe_id}),
+    )
+
+
+def user_steps(user_id):
+    """Шаги удаления пользователя вместе с его рецептами."""
+    return (
+        (ListFavorite, {'recipe__author_id': user_id}),
+        (ShoppingCartIngredients, {'recipe__author_id': user_id}),
+        (MealPlanEntry, {'recipe__author_id': user_id}),
+        (ListIngredients, {'recipe__author_id': user_id}),
+        (RecipeTags, {'recipes__author_id': user_id}),
+        (RecipeBand, {'recipe__author_id': user_id}),
+        (RecipeSignature, {'recipe__author_id': user_id}),
+        (Recipes, {'author_id': user_id}),
+        (ListFavorite, {'user_id': user_id}),
+        (ShoppingCartIngredients, {'user_id': user_id}),
+        (MealPlanEntry, {'plan__user_id': user_id}),
+        (MealPlan, {'user_id': user_id}),
+        (ListSubscriptions, {'author_id': user_id}),
+        (ListSubscriptions, {'subscription_on_id': user_id}),
+        (ChangeLog, {'user_id': user_id}),
+        (User, {'pk': user_id}),
+    )
+
+
+STEPS = {
+    DeletionJob.RECIPE: recipe_steps,
+    DeletionJob.USER: user_steps,
+}
+
+
+def hide_recipes(queryset):
+    """Скрывает рецепты одним UPDATE и сообщает о них как об удалённых."""
+    recipe_ids = list(queryset.values_list('pk', flat=True))
+    Recipes.all_objects.filter(pk__in=recipe_ids).update(
+        is_hidden=True, updated_at=timezone.now()
+    )
+    bus.publish(*(DirtyKey(RECIPE, pk) for pk in recipe_ids))
+
+
+@transaction.atomic
+def schedule_deletion(instance):
+    """Скрывает рецепт или пользователя и ставит очистку в очередь.
+
+    Пользователь ещё и деактивируется: его токены перестают работать, а
+    сохранение сбрасывает кеши профиля. Рецепты автора скрываются сразу.
+    """
+    if isinstance(instance, Recipes):
+        kind = DeletionJob.RECIPE
+        hide_recipes(Recipes.objects.filter(pk=instance.pk))
+    else:
+        kind = DeletionJob.USER
+        instance.is_active = False
+        instance.is_hidden = True
+        instance.save(update_fields=('is_active', 'is_hidden'))
+        hide_recipes(Recipes.objects.filter(author_id=instance.pk))
+    return DeletionJob.objects.create(kind=kind, object_id=instance.pk)
+
+
+def recount_interactions(recipe_ids):
+    """Пересчитывает популярность рецептов удалённых записей.
+
+    Записи журнала удаляемого пользователя стираются вместе с ним, и
+    пересчёт рейтингов их не увидит, поэтому считаем здесь же.
+    """
+    watermark = RankingWatermark.objects.filter(
+        name=RANKING_WATERMARK_NAME
+    ).first()
+    if watermark is None:
+        return
+    recount_popularity(
+        recipe_ids, trending_weight(watermark, timezone.now())
+    )
+
+
+def delete_batch(model, filters, batch_size):
+    """Удаляет не больше batch_size строк, возвращает их число.
+
+    Удаление идёт через QuerySet.delete(): сигналы post_delete сбрасывают
+    списки покупок и пишут журнал изменений, а в памяти только одна пачка.
+    """
+    manager = getattr(model, 'all_objects', model._base_manager)
+    ids = list(
+        manager.filter(**filters).order_by('pk').values_list('pk', flat=True)[
+            :batch_size
+        ]
+    )
+    if not ids:
+        return 0
+    with transaction.atomic():
+        recipe_ids = []
+        if model in INTERACTIONS:
+            recipe_ids = sorted(set(manager.filter(pk__in=ids).values_list(
+                'recipe_id', flat=True
+            )))
+        manager.filter(pk__in=ids).delete()
+        if recipe_ids:
+            recount_interactions(recipe_ids)
+    return len(ids)
+
+
+def claimable(now):
+    """Задачи, которые можно взять: новые, брошенные и упавшие к повтору."""
+    return (
+        Q(status=QUEUED)
+        | Q(status=RUNNING, updated_at__lt=now - timedelta(
+            seconds=DELETION_LEASE_SECONDS
+        ))
+        | Q(
+            status=FAILED, attempts__lt=DELETION_MAX_ATTEMPTS,
+            retry_at__lte=now,
+        )
+    )
+
+
+def claim(job):
+    """Переводит задачу в running, если её не взял другой запуск.
+
+    Проверка и запись - один UPDATE, поэтому из двух одновременных
+    запусков задачу получает только один, и популярность рецептов не
+    уменьшается дважды.
+    """
+    now = timezone.now()
+    claimed = DeletionJob.objects.filter(claimable(now), pk=job.pk).update(
+        status=RUNNING, updated_at=now
+    )
+    if claimed:
+        job.status = RUNNING
+        job.updated_at = now
+    return bool(claimed)
+
+
+def run_deletion(job, batch_size=DELETION_BATCH_SIZE, max_batches=None):
+    """Продолжает удаление с сохранённого шага, обновляя прогресс.
+
+    Задачу нужно сначала получить через ``claim``. Возвращает True, когда
+    удаление завершено. ``max_batches`` ограничивает работу за один
+    вызов, чтобы воркер успевал заняться другими задачами. При ошибке
+    задача помечается failed с отложенным повтором, а ошибка
+    пробрасывается дальше.
+    """
+    steps = STEPS[job.kind](job.object_id)
+    batches = 0
+    try:
+        while job.step < len(steps):
+            if max_batches is not None and batches >= max_batches:
+                job.status = QUEUED
+                job.save(update_fields=('status', 'updated_at'))
+                return False
+            model, filters = steps[job.step]
+            deleted = delete_batch(model, filters, batch_size)
+            batches += 1
+            if deleted:
+                job.deleted += deleted
+            else:
+                job.step += 1
+            job.save(update_fields=('step', 'deleted', 'updated_at'))
+    except Exception as error:
+        job.status = FAILED
+        job.error = str(error)
+        job.attempts += 1
+        job.retry_at = timezone.now() + timedelta(
+            seconds=DELETION_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        )
+        job.save(update_fields=(
+            'status', 'error', 'attempts', 'retry_at', 'updated_at'
+        ))
+        raise
+    job.status = DONE
+    job.save(update_fields=('status', 'updated_at'))
+    return True
+
+
+def pending_jobs():
+    return DeletionJob.objects.filter(
+        claimable(timezone.now())
+    ).order_by('created_at')
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import secrets
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .changelog import USER_LISTS
+from .constants import (EVENTS_HEARTBEAT_SECONDS, EVENTS_QUEUE_SIZE,
+                        EVENTS_RETRY_MS, EVENTS_TICKET_SECONDS)
+from .invalidation import bus
+from .models import EventTicket
+
+EVENTS_PATH = '/api/events/'
+# Очередь соединения переполнена: клиент пропустил события и должен
+# сверить состояние через /api/recipes/sync/.
+RESYNC = {'type': 'resync'}
+
+
+class LocalEventTransport:
+    """Доставка событий соединениям внутри текущего процесса."""
+
+    def __init__(self, hub, **options):
+        self.hub = hub
+
+    def send(self, user_id, event):
+        self.hub.deliver(user_id, event)
+
+    def listen(self):
+        """Начинает приём событий других процессов; локально не нужно."""
+
+
+class PostgresEventTransport(LocalEventTransport):
+    """Межпроцессная доставка через LISTEN/NOTIFY PostgreSQL.
+
+    NOTIFY отправляется соединением Django того процесса, где изменились
+    данные. Процесс с SSE-соединениями слушает канал в отдельном потоке
+    с собственным соединением и передаёт события в свой EventHub.
+    """
+
+    def __init__(self, hub, channel='foodgram_events', alias='default',
+                 **options):
+        super().__init__(hub)
+        self.channel = channel
+        self.alias = alias
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def send(self, user_id, event):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                self.channel, json.dumps({'user': user_id, 'event': event}),
+            ])
+
+    def listen(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.run, name='foodgram-events', daemon=True
+                )
+                self.listener.start()
+
+    def run(self):
+        while True:
+            try:
+                self.receive()
+            except Exception:
+                time.sleep(1)
+
+    def receive(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        connection = psycopg2.connect(
+            **connections[self.alias].get_connection_params()
+        )
+        try:
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if not select.select([connection], [], [], 5)[0]:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    data = json.loads(connection.notifies.pop(0).payload)
+                    self.hub.deliver(data['user'], data['event'])
+        finally:
+            connection.close()
+
+
+class EventConnection:
+    """Очередь событий одного SSE-соединения в его цикле asyncio.
+
+    Очередь ограничена: если клиент не успевает читать, накопленное
+    отбрасывается и вместо него приходит одно событие resync.
+    """
+
+    def __init__(self, user_id, loop, size=EVENTS_QUEUE_SIZE):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def push(self, event):
+        self.loop.call_soon_threadsafe(self.put, event)
+
+    def put(self, event):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    """Pub/sub событий списков пользователя для SSE-соединений.
+
+    Транспорт берётся из EVENTS['TRANSPORT'], как у шины инвалидации.
+    """
+
+    def __init__(self):
+        self.connections = defaultdict(set)
+        self.lock = threading.Lock()
+        self._transport = None
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            options = dict(getattr(settings, 'EVENTS', {}))
+            transport_class = import_string(options.pop(
+                'TRANSPORT', 'api.events.LocalEventTransport'
+            ))
+            self._transport = transport_class(self, **{
+                name.lower(): value for name, value in options.items()
+            })
+        return self._transport
+
+    def publish(self, user_id, event):
+        self.transport.send(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self.lock:
+            targets = list(self.connections.get(user_id, ()))
+        for connection in targets:
+            connection.push(event)
+
+    def connect(self, user_id, loop):
+        self.transport.listen()
+        connection = EventConnection(user_id, loop)
+        with self.lock:
+            self.connections[user_id].add(connection)
+        return connection
+
+    def disconnect(self, connection):
+        with self.lock:
+            user_connections = self.connections.get(connection.user_id)
+            if user_connections is not None:
+                user_connections.discard(connection)
+                if not user_connections:
+                    del self.connections[connection.user_id]
+
+
+hub = EventHub()
+
+
+def publish_user_list_change(sender, instance, using, **kwargs):
+    """post_save/post_delete списков пользователя: событие после коммита."""
+    kind, user_field, object_field = USER_LISTS[sender]
+    transaction.on_commit(partial(hub.publish, getattr(instance, user_field), {
+        'type': kind,
+        'object_id': getattr(instance, object_field),
+        'action': 'added' if 'created' in kwargs else 'removed',
+    }), using=using)
+
+
+def issue_ticket(user):
+    """Новый билет на поток событий; просроченные билеты удаляются."""
+    now = timezone.now()
+    EventTicket.objects.filter(expires_at__lte=now).delete()
+    return EventTicket.objects.create(
+        key=secrets.token_urlsafe(32),
+        user=user,
+        expires_at=now + timedelta(seconds=EVENTS_TICKET_SECONDS),
+    )
+
+
+def redeem_ticket(key):
+    """Пользователь по билету; билет действует на одно подключение.
+
+    Билет удаляется одним DELETE: из двух подключений с одним билетом
+    пройдёт только то, чей DELETE удалил строку.
+    """
+    ticket = EventTicket.objects.select_related('user').filter(
+        key=key, expires_at__gt=timezone.now()
+    ).first()
+    if ticket is None or not EventTicket.objects.filter(
+        pk=ticket.pk
+    ).delete()[0]:
+        raise AuthenticationFailed('Билет недействителен или уже использован.')
+    if not ticket.user.is_active:
+        raise AuthenticationFailed('Пользователь неактивен или удален.')
+    return ticket.user
+
+
+def authenticate(scope):
+    """Пользователь по токену из заголовка или билету из ``?ticket=``.
+
+    EventSource в браузере не умеет передавать заголовки, поэтому он
+    подключается с одноразовым билетом из POST /api/events/ticket/.
+    """
+    headers = dict(scope.get('headers', ()))
+    header = headers.get(b'authorization', b'').decode().split()
+    if len(header) == 2 and header[0].lower() == 'token':
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            header[1]
+        )
+        return user
+    ticket = parse_qs(scope.get('query_string', b'').decode()).get(
+        'ticket', [None]
+    )[0]
+    if not ticket:
+        raise AuthenticationFailed('Учетные данные не были предоставлены.')
+    return redeem_ticket(ticket)
+
+
+def format_event(event):
+    return (
+        f'event: {event["type"]}\n'
+        f'data: {json.dumps(event, ensure_ascii=False)}\n\n'
+    ).encode()
+
+
+async def sse_application(scope, receive, send):
+    """ASGI-приложение /api/events/: поток изменений списков пользователя.
+
+    События: favorite, shopping_cart, subscription с полями object_id и
+    action (added/removed), а также resync. В паузах отправляется
+    комментарий-heartbeat, чтобы прокси не закрывали соединение.
+    """
+    # Кеш токенов этого процесса сбрасывается событиями шины из воркеров
+    # API, как и в InvalidationMiddleware.
+    bus.listen()
+    try:
+        user = await sync_to_async(authenticate)(scope)
+    except AuthenticationFailed as error:
+        await send({
+            'type': 'http.response.start', 'status': 401,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': json.dumps({'detail': str(error.detail)}).encode(),
+        })
+        return
+    connection = hub.connect(user.pk, asyncio.get_running_loop())
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {EVENTS_RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+        while not disconnected.done():
+            getter = asyncio.ensure_future(connection.queue.get())
+            await asyncio.wait(
+                (getter, disconnected), timeout=EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if getter.done():
+                body = format_event(getter.result())
+            else:
+                getter.cancel()
+                if disconnected.done():
+                    break
+                body = b': heartbeat\n\n'
+            await send({
+                'type': 'http.response.body', 'body': body, 'more_body': True,
+            })
+    finally:
+        hub.disconnect(connection)
+        disconnected.cancel()
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,135 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, Max, Q
+
+from .cache import record_lookups
+from .constants import (COOKING_TIME_BUCKETS, FACET_AUTHORS_LIMIT,
+                        FACETS_CACHE_TIMEOUT, FACETS_TIMEOUT_MS)
+from .models import ChangeLog, Tags
+from .tag_masks import tag_facet_expressions
+
+IGNORED_PARAMS = ('limit', 'offset', 'facets')
+VIEWER_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def bucket_label(low, high):
+    return f'{low}+' if high is None else f'{low}-{high}'
+
+
+def data_versions(request):
+    """Состояние данных, от которых зависят фасеты, по данным из БД.
+
+    Счётчики шины свои у каждого процесса и для общего кеша не годятся.
+    Любое изменение рецепта (в том числе скрытие и правка автора, тега на
+    рецепте или ингредиента), избранного и списка покупок пишется в
+    журнал изменений, поэтому его последний id - одно чтение по
+    первичному ключу. Теги невелики и входят целиком: переименование
+    тега без рецептов в журнал не попадает. С фильтрами по спискам
+    зрителя в ключ входит его id.
+    """
+    versions = [
+        ChangeLog.objects.aggregate(cursor=Max('id'))['cursor'],
+        list(Tags.objects.order_by('id').values_list('id', 'name', 'slug')),
+    ]
+    if request.user.is_authenticated and any(
+        name in request.query_params for name in VIEWER_PARAMS
+    ):
+        versions.append(request.user.pk)
+    return versions
+
+
+def filter_signature(request):
+    """Ключ кеша для набора фильтров с учётом версий данных."""
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        if name not in IGNORED_PARAMS
+        for value in values
+    )
+    digest = hashlib.sha1(
+        repr((params, data_versions(request))).encode()
+    ).hexdigest()
+    return f'facets:{digest}'
+
+
+@contextmanager
+def statement_timeout(queryset, milliseconds):
+    """Ограничивает время запросов в блоке (только для PostgreSQL)."""
+    with transaction.atomic(using=queryset.db):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s', [milliseconds]
+                )
+        yield
+
+
+def compute_facets(queryset):
+    """Счётчики по тегам, авторам и времени приготовления.
+
+    Теги и интервалы времени считаются одним агрегатом по маскам тегов,
+    авторы - одним запросом с группировкой.
+    """
+    queryset = queryset.order_by()
+    tags = list(Tags.objects.all())
+    annotations, aggregates = tag_facet_expressions(tags)
+    for low, high in COOKING_TIME_BUCKETS:
+        condition = Q(cooking_time__gt=low)
+        if high is not None:
+            condition &= Q(cooking_time__lte=high)
+        aggregates[bucket_label(low, high)] = Count('id', filter=condition)
+    counts = queryset.annotate(**annotations).aggregate(**aggregates)
+    authors = (
+        queryset.values('author_id', 'author__username')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'author_id')[:FACET_AUTHORS_LIMIT]
+    )
+    return {
+        'tags': [
+            {
+                'id': tag.id,
+                'name': tag.name,
+                'slug': tag.slug,
+                'count': counts[f'tag_{tag.id}'],
+            }
+            for tag in tags
+        ],
+        'authors': [
+            {
+                'id': author['author_id'],
+                'username': author['author__username'],
+                'count': author['count'],
+            }
+            for author in authors
+        ],
+        'cooking_time': [
+            {
+                'bucket': bucket_label(low, high),
+                'count': counts[bucket_label(low, high)],
+            }
+            for low, high in COOKING_TIME_BUCKETS
+        ],
+    }
+
+
+def get_facets(queryset, request):
+    """Фасеты из кеша или с подсчётом в пределах FACETS_TIMEOUT_MS.
+
+    Если запрос не уложился в бюджет, возвращается None и ответ
+    отдаётся без фасетов.
+    """
+    key = filter_signature(request)
+    facets = cache.get(key)
+    record_lookups('facets', facets is not None, facets is None)
+    if facets is None:
+        try:
+            with statement_timeout(queryset, FACETS_TIMEOUT_MS):
+                facets = compute_facets(queryset)
+        except DatabaseError:
+            return None
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
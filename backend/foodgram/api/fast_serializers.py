@@ -0,0 +1,219 @@
+from collections import defaultdict
+from operator import itemgetter
+
+from users.models import ListSubscriptions
+
+from .author_cards import author_cards, render_card
+from .models import (ListFavorite, ListIngredients, Recipes,
+                     ShoppingCartIngredients)
+from .profiling import profiled
+from .sparse import sparse_params
+from .viewer_state import marked_ids
+
+RECIPE_VALUES = ('id', 'name', 'image', 'text', 'cooking_time', 'author_id')
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+)
+# Колонка строки для поля ответа; остальные поля читаются отдельно.
+FIELD_VALUES = {
+    'author': 'author_id',
+    'name': 'name',
+    'image': 'image',
+    'text': 'text',
+    'cooking_time': 'cooking_time',
+}
+
+
+def recipe_rows(queryset, fields=None):
+    """Queryset рецептов в виде строк для RecipesFastSerializer.
+
+    ``fields`` из ``sparse_params`` оставляет только нужные колонки.
+    """
+    if fields is None:
+        return queryset.values(*RECIPE_VALUES)
+    return queryset.values('id', *(
+        column for name, column in FIELD_VALUES.items() if name in fields
+    ))
+
+
+class RecipesFastSerializer:
+    """Быстрая сериализация рецептов только для чтения.
+
+    Принимает строки из ``recipe_rows`` и собирает те же словари, что и
+    RecipesSerializerGet, но без полей DRF: связанные данные для всей
+    страницы читаются через ``.values()`` одним запросом на связь.
+    """
+
+    def __init__(self, instance, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        recipes = self.to_representation(rows)
+        return recipes if self.many else recipes[0]
+
+    def build_url(self, field, name):
+        if not name:
+            return None
+        url = field.storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_marked(self, model, recipe_ids):
+        """Рецепты из избранного или списка покупок зрителя."""
+        return marked_ids(self.context.get('request'), model, recipe_ids)
+
+    def get_subscribed(self, author_ids):
+        return marked_ids(
+            self.context.get('request'), ListSubscriptions, author_ids
+        )
+
+    @profiled('RecipesFastSerializer.get_viewer_sets')
+    def get_viewer_sets(self, recipe_ids, author_ids):
+        return (
+            self.get_marked(ListFavorite, recipe_ids),
+            self.get_marked(ShoppingCartIngredients, recipe_ids),
+            self.get_subscribed(author_ids),
+        )
+
+    @profiled('RecipesFastSerializer.get_tags')
+    def get_tags(self, recipe_ids):
+        tags = defaultdict(list)
+        rows = Recipes.tags.through.objects.filter(
+            recipes_id__in=recipe_ids
+        ).order_by('tags__name', 'tags_id').values_list(
+            'recipes_id', 'tags_id', 'tags__name', 'tags__slug'
+        )
+        for recipe_id, tag_id, name, slug in rows:
+            tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+        return tags
+
+    def get_tag_ids(self, recipe_ids):
+        tags = defaultdict(list)
+        for recipe_id, tag_id in Recipes.tags.through.objects.filter(
+            recipes_id__in=recipe_ids
+        ).order_by('tags_id').values_list('recipes_id', 'tags_id'):
+            tags[recipe_id].append(tag_id)
+        return tags
+
+    @profiled('RecipesFastSerializer.get_ingredients')
+    def get_ingredients(self, recipe_ids):
+        ingredients = defaultdict(list)
+        rows = ListIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list(
+            'recipe_id', 'ingredient_id',
+            'ingredient__measurement_unit__name', 'amount', 'ingredient__name'
+        )
+        for recipe_id, ingredient_id, unit, amount, name in rows:
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'measurement_unit': unit,
+                'amount': amount,
+                'name': name,
+            })
+        return ingredients
+
+    def get_ingredient_amounts(self, recipe_ids):
+        """Ингредиенты без названий и единиц: без JOIN по справочникам."""
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id, amount in ListIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list('recipe_id', 'ingredient_id', 'amount'):
+            ingredients[recipe_id].append(
+                {'id': ingredient_id, 'amount': amount}
+            )
+        return ingredients
+
+    @profiled('RecipesFastSerializer.get_authors')
+    def get_authors(self, author_ids, subscribed):
+        request = self.context.get('request')
+        return {
+            author_id: render_card(card, request, author_id in subscribed)
+            for author_id, card in author_cards.get_cards(author_ids).items()
+        }
+
+    def to_representation(self, rows):
+        if not rows:
+            return []
+        fields, expand = sparse_params(self.context.get('request'))
+        if fields is not None:
+            return self.to_sparse_representation(rows, fields, expand)
+        recipe_ids = [row['id'] for row in rows]
+        author_ids = {row['author_id'] for row in rows}
+        favorited, in_cart, subscribed = self.get_viewer_sets(
+            recipe_ids, author_ids
+        )
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        authors = self.get_authors(author_ids, subscribed)
+        image_field = Recipes._meta.get_field('image')
+        return [
+            {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': authors[row['author_id']],
+                'ingredients': ingredients[row['id']],
+                'is_favorited': row['id'] in favorited,
+                'is_in_shopping_cart': row['id'] in in_cart,
+                'name': row['name'],
+                'image': self.build_url(image_field, row['image']),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+            for row in rows
+        ]
+
+    def to_sparse_representation(self, rows, fields, expand):
+        """Только запрошенные поля; связи читаются, только если нужны.
+
+        Не раскрытые через ``expand`` автор, теги и ингредиенты отдаются
+        как id (для ингредиентов - id и количество).
+        """
+        names = [name for name in RECIPE_FIELDS if name in fields]
+        recipe_ids = [row['id'] for row in rows]
+        getters = {
+            name: itemgetter(name)
+            for name in ('id', 'name', 'text', 'cooking_time')
+        }
+        if 'image' in fields:
+            image_field = Recipes._meta.get_field('image')
+            getters['image'] = lambda row: self.build_url(
+                image_field, row['image']
+            )
+        if 'tags' in fields:
+            tags = (
+                self.get_tags(recipe_ids) if 'tags' in expand
+                else self.get_tag_ids(recipe_ids)
+            )
+            getters['tags'] = lambda row: tags[row['id']]
+        if 'ingredients' in fields:
+            ingredients = (
+                self.get_ingredients(recipe_ids) if 'ingredients' in expand
+                else self.get_ingredient_amounts(recipe_ids)
+            )
+            getters['ingredients'] = lambda row: ingredients[row['id']]
+        if 'author' in fields and 'author' in expand:
+            author_ids = {row['author_id'] for row in rows}
+            authors = self.get_authors(
+                author_ids, self.get_subscribed(author_ids)
+            )
+            getters['author'] = lambda row: authors[row['author_id']]
+        elif 'author' in fields:
+            getters['author'] = itemgetter('author_id')
+        for name, model in (
+            ('is_favorited', ListFavorite),
+            ('is_in_shopping_cart', ShoppingCartIngredients),
+        ):
+            if name in fields:
+                marked = self.get_marked(model, recipe_ids)
+                getters[name] = (
+                    lambda row, marked=marked: row['id'] in marked
+                )
+        return [{name: getters[name](row) for name in names} for row in rows]
@@ -0,0 +1,62 @@
+import base64
+import binascii
+import hashlib
+import os
+import time
+
+from django.utils.functional import cached_property
+from rest_framework.fields import ImageField, SkipField
+
+from .metrics import histogram
+
+image_processing = histogram(
+    'foodgram_image_processing_seconds',
+    'Разбор и проверка присланных картинок.',
+)
+
+
+class ContentHashImageField(ImageField):
+    """Картинка в base64, которая не разбирает уже сохранённое изображение.
+
+    Файлы лежат в ContentAddressedStorage под именем SHA-256 содержимого.
+    Если хеш присланных данных совпадает с именем текущего файла (или
+    клиент прислал URL текущего файла), поле пропускается: нет проверки
+    через PIL, записи файла и изменения поля в ``validated_data``.
+    Новые данные разбирает Base64ImageField из drf_extra_fields.
+    """
+
+    @cached_property
+    def decoder(self):
+        # drf_extra_fields при импорте тянет filetype и поля PostgreSQL,
+        # а нужен только при записи картинки: не замедляем старт воркера.
+        from drf_extra_fields.fields import Base64ImageField
+
+        return Base64ImageField()
+
+    def get_current_file(self):
+        instance = getattr(self.parent, 'instance', None)
+        if instance is None or isinstance(instance, (list, tuple)):
+            return None
+        return getattr(instance, self.source, None) or None
+
+    def to_internal_value(self, data):
+        current = self.get_current_file()
+        if current is not None and isinstance(data, str):
+            if data.endswith(current.url):
+                raise SkipField()
+            try:
+                decoded = base64.b64decode(data.split(';base64,')[-1])
+            except (TypeError, binascii.Error, ValueError):
+                decoded = None
+            if decoded is not None:
+                digest = hashlib.sha256(decoded).hexdigest()
+                basename = os.path.basename(current.name)
+                if os.path.splitext(basename)[0] == digest:
+                    raise SkipField()
+        start = time.perf_counter()
+        try:
+            return self.decoder.to_internal_value(data)
+        finally:
+            image_processing.observe(
+                time.perf_counter() - start, field=self.field_name
+            )
@@ -1,9 +1,22 @@
 from django_filters.rest_framework import FilterSet, filters
 
 from .models import Ingredients, Recipes, Tags
+from .profiling import ProfiledFilterSetMixin
+from .rankings import RANKING_ORDERINGS
+from .tag_masks import filter_by_mask, tags_mask
 
+TAG_FILTER_MODES = {
+    'tags': 'any',
+    'tags_all': 'all',
+    'exclude_tags': 'none',
+}
+ORDERING_CHOICES = (
+    ('popular', 'Популярные'),
+    ('trending', 'В тренде'),
+)
 
-class NameFilter(FilterSet):
+
+class NameFilter(ProfiledFilterSetMixin, FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='startswith')
 
     class Meta:
@@ -11,20 +24,40 @@ class NameFilter(FilterSet):
         fields = ['name', ]
 
 
-class RecipeFilter(FilterSet):
+class RecipeFilter(ProfiledFilterSetMixin, FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug', to_field_name='slug',
-        lookup_expr='istartswith',
-        queryset=Tags.objects.all()
+        to_field_name='slug', queryset=Tags.objects.all(),
+        method='filter_tags'
+    )
+    tags_all = filters.ModelMultipleChoiceFilter(
+        to_field_name='slug', queryset=Tags.objects.all(),
+        method='filter_tags'
+    )
+    exclude_tags = filters.ModelMultipleChoiceFilter(
+        to_field_name='slug', queryset=Tags.objects.all(),
+        method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES, method='filter_ordering'
+    )
 
     class Meta:
         model = Recipes
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'tags', 'tags_all', 'exclude_tags', 'author',
+            'is_favorited', 'is_in_shopping_cart', 'ordering',
+        ]
+
+    def filter_tags(self, queryset, name, tags):
+        if not tags:
+            return queryset
+        return filter_by_mask(
+            queryset, tags_mask(tags), TAG_FILTER_MODES[name]
+        )
 
     def filter_is_favorited(self, queryset, name, values):
         user = self.request.user
@@ -37,3 +70,6 @@ class RecipeFilter(FilterSet):
         if values and not user.is_anonymous:
             return queryset.filter(recipe_download__user_id=user.id)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RANKING_ORDERINGS[value])
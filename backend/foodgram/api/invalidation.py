@@ -0,0 +1,273 @@
+import json
+import os
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+RECIPE = 'recipe'
+TAG = 'tag'
+INGREDIENT = 'ingredient'
+FAVORITE = 'favorite'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTION = 'subscription'
+USER = 'user'
+TOKEN = 'token'
+
+DirtyKey = namedtuple('DirtyKey', ('kind', 'pk'))
+DirtyKey.__doc__ = """Изменившиеся данные: вид сущности и её ключ.
+
+Для рецептов, тегов, ингредиентов и пользователей ``pk`` - id объекта,
+для избранного, списка покупок и подписок - id пользователя, чей список
+изменился, для токенов - ключ удалённого токена.
+"""
+
+_pending = ContextVar('invalidation_pending', default=None)
+
+
+class LocalTransport:
+    """Доставка событий подписчикам внутри текущего процесса.
+
+    Версия ключа - номер последнего события с ним. Словарь версий
+    ограничен ``max_versions`` записями по LRU; для вытесненных ключей
+    возвращается наибольшая вытесненная версия, поэтому версия ключа не
+    уменьшается и не совпадает со старой после его изменения.
+    """
+
+    def __init__(self, bus, max_versions=10000, **options):
+        self.bus = bus
+        self.max_versions = max_versions
+        self.versions = OrderedDict()
+        self.sequence = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def bump(self, keys):
+        with self.lock:
+            for key in keys:
+                self.sequence += 1
+                for name in (key, key.kind):
+                    self.versions[name] = self.sequence
+                    self.versions.move_to_end(name)
+            while len(self.versions) > self.max_versions:
+                _, version = self.versions.popitem(last=False)
+                self.evicted = max(self.evicted, version)
+
+    def send(self, keys):
+        self.bump(keys)
+        self.bus.dispatch(keys)
+
+    def listen(self):
+        """Начинает приём событий других процессов; локально не нужно."""
+
+    def version(self, kind, pk=None):
+        key = kind if pk is None else DirtyKey(kind, pk)
+        return self.versions.get(key, self.evicted)
+
+
+class CacheTransport(LocalTransport):
+    """Общие версии ключей через кеш Django, без доставки событий.
+
+    Версии ключей хранятся в кеше (Redis, Memcached), поэтому кеши,
+    завязанные на ``bus.version``, устаревают сразу во всех процессах.
+    Подписчики других процессов событий не получают: для них нужен
+    PostgresTransport.
+    """
+
+    def __init__(self, bus, alias='default', prefix='dirty', **options):
+        super().__init__(bus)
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def make_key(self, kind, pk=None):
+        if pk is None:
+            return f'{self.prefix}:{kind}'
+        return f'{self.prefix}:{kind}:{pk}'
+
+    def bump(self, keys):
+        names = {self.make_key(key.kind) for key in keys}
+        names.update(self.make_key(*key) for key in keys)
+        for name in names:
+            if not self.cache.add(name, 1, timeout=None):
+                self.cache.incr(name)
+
+    def version(self, kind, pk=None):
+        return self.cache.get(self.make_key(kind, pk), 0)
+
+
+class PostgresTransport(LocalTransport):
+    """Межпроцессная доставка через LISTEN/NOTIFY PostgreSQL.
+
+    Процесс, где изменились данные, вызывает всех своих подписчиков и
+    отправляет ключи в канал. Остальные процессы слушают канал в
+    отдельном потоке и вызывают только подписчиков с ``broadcast=True``
+    (сброс кешей в памяти процесса); подписчики, пишущие в базу, так
+    срабатывают один раз на изменение. Пока поток переподключается,
+    события теряются, поэтому у локальных кешей должен быть TTL.
+    """
+
+    # Предел payload у NOTIFY - 8000 байт.
+    CHUNK_SIZE = 200
+
+    def __init__(self, bus, channel='foodgram_invalidation',
+                 alias='default', **options):
+        super().__init__(bus, **options)
+        self.channel = channel
+        self.alias = alias
+        self.origin = uuid.uuid4().hex
+        self.listener = None
+        self.listener_pid = None
+        self.listen_lock = threading.Lock()
+
+    def send(self, keys):
+        super().send(keys)
+        keys = sorted(keys, key=str)
+        with connections[self.alias].cursor() as cursor:
+            for start in range(0, len(keys), self.CHUNK_SIZE):
+                cursor.execute('SELECT pg_notify(%s, %s)', [
+                    self.channel, json.dumps({
+                        'origin': self.origin,
+                        'keys': keys[start:start + self.CHUNK_SIZE],
+                    }),
+                ])
+
+    def listen(self):
+        if self.listener_pid == os.getpid():
+            return
+        with self.listen_lock:
+            # После fork поток мастер-процесса в воркере не работает.
+            if self.listener_pid != os.getpid():
+                self.origin = uuid.uuid4().hex
+                self.listener_pid = os.getpid()
+                self.listener = threading.Thread(
+                    target=self.run, name='foodgram-invalidation',
+                    daemon=True,
+                )
+                self.listener.start()
+
+    def run(self):
+        while True:
+            try:
+                self.receive()
+            except Exception:
+                time.sleep(1)
+
+    def receive(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        connection = psycopg2.connect(
+            **connections[self.alias].get_connection_params()
+        )
+        try:
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if not select.select([connection], [], [], 5)[0]:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self.deliver(json.loads(
+                        connection.notifies.pop(0).payload
+                    ))
+        finally:
+            connection.close()
+
+    def deliver(self, data):
+        if data['origin'] == self.origin:
+            return
+        keys = frozenset(DirtyKey(*key) for key in data['keys'])
+        self.bump(keys)
+        self.bus.dispatch(keys, remote=True)
+
+
+class InvalidationBus:
+    """Шина событий об изменении данных для кешей и счётчиков.
+
+    События публикуются только после коммита транзакции. Внутри
+    ``batch()`` (его открывает InvalidationMiddleware на время запроса)
+    они копятся в множестве и уходят подписчикам одной пачкой.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self._transport = None
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            options = dict(getattr(settings, 'INVALIDATION', {}))
+            transport_class = import_string(options.pop(
+                'TRANSPORT', 'api.invalidation.LocalTransport'
+            ))
+            self._transport = transport_class(self, **{
+                name.lower(): value for name, value in options.items()
+            })
+        return self._transport
+
+    def subscribe(self, callback, kinds=None, broadcast=False):
+        """Подписывает callback(keys) на события указанных видов.
+
+        С ``broadcast`` callback получает и события других процессов,
+        если транспорт их доставляет; так подписываются сбросы кешей в
+        памяти процесса. Без него callback вызывается только в процессе,
+        где изменились данные.
+        """
+        self.subscribers.append(
+            (callback, frozenset(kinds or ()), broadcast)
+        )
+        return callback
+
+    def publish(self, *keys, using=None):
+        keys = frozenset(keys)
+        if keys:
+            transaction.on_commit(partial(self._collect, keys), using=using)
+
+    def _collect(self, keys):
+        pending = _pending.get()
+        if pending is None:
+            self.transport.send(keys)
+        else:
+            pending.update(keys)
+
+    @contextmanager
+    def batch(self):
+        token = _pending.set(set())
+        try:
+            yield
+        finally:
+            keys = _pending.get()
+            _pending.reset(token)
+            if keys:
+                self.transport.send(frozenset(keys))
+
+    def listen(self):
+        """Запускает приём событий других процессов (после fork)."""
+        self.transport.listen()
+
+    def dispatch(self, keys, remote=False):
+        for callback, kinds, broadcast in self.subscribers:
+            if remote and not broadcast:
+                continue
+            selected = keys if not kinds else frozenset(
+                key for key in keys if key.kind in kinds
+            )
+            if selected:
+                callback(selected)
+
+    def version(self, kind, pk=None):
+        """Счётчик изменений вида или конкретного ключа для ключей кеша."""
+        return self.transport.version(kind, pk)
+
+
+bus = InvalidationBus()
@@ -0,0 +1,102 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import gauge, histogram
+from .models import BackgroundJob
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+job_duration = histogram(
+    'foodgram_job_duration_seconds', 'Время выполнения фоновых задач.'
+)
+queue_depth = gauge(
+    'foodgram_job_queue_depth', 'Задачи, ожидающие свободного воркера.'
+)
+JOB_FIELDS = ('id', 'kind', 'owner_id', 'status', 'result', 'error')
+
+
+class LocalJobQueue:
+    """Очередь фоновых задач на пуле потоков текущего процесса.
+
+    Заменяет внешний брокер: статусы хранятся в модели BackgroundJob,
+    поэтому их можно опрашивать из любого процесса. Задача получает
+    id и строки, а не объекты моделей, и сама читает нужное из БД в
+    потоке пула.
+    """
+
+    def __init__(self):
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_WORKERS', 2),
+                thread_name_prefix='foodgram-job',
+            )
+        return self._executor
+
+    def get(self, job_id):
+        return BackgroundJob.objects.filter(
+            id=job_id, expires_at__gt=timezone.now()
+        ).values(*JOB_FIELDS).first()
+
+    def save(self, job):
+        BackgroundJob.objects.filter(id=job['id']).update(
+            status=job['status'], result=job['result'], error=job['error'],
+        )
+        return job
+
+    def create(self, kind, owner_id, status=QUEUED, result=None):
+        """Новая задача; задачи с истёкшим сроком хранения удаляются."""
+        now = timezone.now()
+        BackgroundJob.objects.filter(expires_at__lte=now).delete()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'owner_id': owner_id,
+            'status': status,
+            'result': result,
+            'error': None,
+        }
+        BackgroundJob.objects.create(**job, expires_at=now + timedelta(
+            seconds=getattr(settings, 'JOBS_RESULT_TIMEOUT', 3600)
+        ))
+        return job
+
+    def submit(self, kind, owner_id, func, *args):
+        """Ставит func(*args) в очередь, возвращает описание задачи."""
+        job = self.create(kind, owner_id)
+        queue_depth.inc(kind=kind)
+        self.executor.submit(self.run, job, func, *args)
+        return job
+
+    def run(self, job, func, *args):
+        queue_depth.dec(kind=job['kind'])
+        # Поток пула живёт дольше запроса: соединение с БД закрывается
+        # по CONN_MAX_AGE, как у обработчика запросов.
+        close_old_connections()
+        self.save({**job, 'status': RUNNING})
+        started = time.perf_counter()
+        try:
+            job = {**job, 'status': DONE, 'result': func(*args)}
+        except Exception as error:
+            job = {**job, 'status': FAILED, 'error': str(error)}
+        finally:
+            job_duration.observe(
+                time.perf_counter() - started, kind=job['kind']
+            )
+        self.save(job)
+        close_old_connections()
+
+
+job_queue = LocalJobQueue()
@@ -0,0 +1,76 @@
+from timeit import repeat
+
+from api.constants import METRICS_OVERHEAD_BUDGET_US
+from api.metrics import collector
+from api.middleware import MetricsMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет накладные расходы MetricsMiddleware на запрос. '
+        'Завершается с ошибкой, если превышен бюджет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--number', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--queries', type=int, default=0,
+            help='SQL-запросов SELECT 1 на каждый ответ.',
+        )
+        parser.add_argument(
+            '--max-overhead-us', type=float,
+            default=METRICS_OVERHEAD_BUDGET_US,
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get(options['path'])
+        view = resolve(options['path']).func
+        response = HttpResponse()
+        queries = options['queries']
+
+        def get_response(request):
+            if queries:
+                with connection.cursor() as cursor:
+                    for _ in range(queries):
+                        cursor.execute('SELECT 1')
+            return response
+
+        middleware = MetricsMiddleware(get_response)
+
+        def plain():
+            get_response(request)
+
+        def measured():
+            middleware.process_view(request, view, (), {})
+            middleware(request)
+
+        # Без записи снимков: замер не должен попасть в метрики сервиса.
+        collector.started = True
+        try:
+            timings = {
+                func: min(repeat(
+                    func, number=options['number'], repeat=options['repeat']
+                )) / options['number'] * 1e6
+                for func in (plain, measured)
+            }
+        finally:
+            collector.reset()
+        overhead = timings[measured] - timings[plain]
+        self.stdout.write(
+            f'Ответ без метрик: {timings[plain]:.2f} мкс, с метриками: '
+            f'{timings[measured]:.2f} мкс, накладные расходы '
+            f'{overhead:.2f} мкс (SQL-запросов на ответ: {queries})'
+        )
+        if overhead > options['max_overhead_us']:
+            raise CommandError(
+                f'Накладные расходы {overhead:.2f} мкс > '
+                f'{options["max_overhead_us"]} мкс'
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет метрик соблюдён.'))
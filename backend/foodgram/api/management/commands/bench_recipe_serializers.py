@@ -0,0 +1,60 @@
+from timeit import timeit
+
+from api.fast_serializers import RecipesFastSerializer, recipe_rows
+from api.models import Recipes, User
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipesSerializerGet
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает вывод RecipesSerializerGet и RecipesFastSerializer '
+        'побайтово и замеряет время сериализации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого запрос.'
+        )
+
+    def get_request(self, email):
+        django_request = APIRequestFactory().get('/api/recipes/')
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'Пользователь {email} не найден.')
+            force_authenticate(django_request, user=user)
+        return Request(django_request)
+
+    def handle(self, *args, **options):
+        request = self.get_request(options['user'])
+        context = {'request': request}
+        queryset = Recipes.objects.all()[:options['limit']]
+
+        def render_drf():
+            data = RecipesSerializerGet(
+                queryset.all(), many=True, context=context
+            ).data
+            return JSONRenderer().render(data)
+
+        def render_fast():
+            data = RecipesFastSerializer(
+                recipe_rows(queryset.all()), many=True, context=context
+            ).data
+            return FastJSONRenderer().render(data)
+
+        if render_drf() != render_fast():
+            raise CommandError('Вывод быстрого сериализатора отличается.')
+        self.stdout.write(self.style.SUCCESS('Вывод совпадает побайтово.'))
+        for name, func in (('DRF', render_drf), ('fast', render_fast)):
+            seconds = timeit(func, number=options['repeat'])
+            self.stdout.write(
+                f'{name}: {seconds / options["repeat"] * 1000:.3f} мс '
+                f'на страницу из {options["limit"]} рецептов'
+            )
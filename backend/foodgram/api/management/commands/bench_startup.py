@@ -0,0 +1,151 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from api.constants import (STARTUP_FIRST_REQUEST_BUDGET_MS,
+                           STARTUP_IMPORT_BUDGET_MS)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном интерпретаторе: загружает WSGI-приложение и
+# отправляет в него один GET-запрос, как первый запрос нового воркера.
+FIRST_REQUEST_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from foodgram.wsgi import application
+loaded = time.perf_counter()
+path, host = sys.argv[1:3]
+environ = {'PATH_INFO': path, 'HTTP_HOST': host, 'SERVER_NAME': host}
+setup_testing_defaults(environ)
+statuses = []
+body = b''.join(application(
+    environ, lambda status, headers, *args: statuses.append(status)
+))
+done = time.perf_counter()
+print(json.dumps({
+    'load_ms': (loaded - start) * 1000,
+    'first_request_ms': (done - start) * 1000,
+    'status': statuses[0],
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод ``-X importtime``: [(модуль, собственное, общее)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip()[1:], int(own), int(cumulative)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время импорта (-X importtime) и время до первого ответа '
+        'нового воркера. Завершается с ошибкой, если превышен бюджет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module',
+            default=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'foodgram.settings'
+            ),
+            help='Модуль настроек воркера, например foodgram.settings_api.'
+        )
+        parser.add_argument('--path', default='/api/')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument(
+            '--max-import-ms', type=float, default=STARTUP_IMPORT_BUDGET_MS
+        )
+        parser.add_argument(
+            '--max-first-request-ms', type=float,
+            default=STARTUP_FIRST_REQUEST_BUDGET_MS,
+        )
+
+    def run_python(self, options, *args):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': options['settings_module'],
+        }
+        result = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        return result
+
+    def measure_imports(self, options):
+        result = self.run_python(
+            options, '-X', 'importtime', '-c', FIRST_REQUEST_SCRIPT,
+            options['path'], self.get_host(),
+        )
+        return parse_importtime(result.stderr)
+
+    def measure_first_request(self, options):
+        result = self.run_python(
+            options, '-c', FIRST_REQUEST_SCRIPT,
+            options['path'], self.get_host(),
+        )
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def get_host(self):
+        hosts = [
+            host for host in settings.ALLOWED_HOSTS if '*' not in host
+        ] or ['localhost']
+        return hosts[0].lstrip('.')
+
+    def handle(self, *args, **options):
+        rows = self.measure_imports(options)
+        # Модули верхнего уровня записаны без отступа, их общее время
+        # в сумме и есть время всех импортов процесса.
+        import_ms = sum(
+            cumulative for name, _, cumulative in rows
+            if not name.startswith(' ')
+        ) / 1000
+        self.stdout.write(
+            f'{options["settings_module"]}: импорт {import_ms:.1f} мс, '
+            f'модулей {len(rows)}'
+        )
+        for name, own, cumulative in sorted(
+            rows, key=lambda row: -row[1]
+        )[:options['top']]:
+            self.stdout.write(
+                f'  {name.strip()}: {own / 1000:.1f} мс '
+                f'(с зависимостями {cumulative / 1000:.1f} мс)'
+            )
+
+        runs = [
+            self.measure_first_request(options)
+            for _ in range(options['repeat'])
+        ]
+        load_ms = statistics.median(run['load_ms'] for run in runs)
+        first_request_ms = statistics.median(
+            run['first_request_ms'] for run in runs
+        )
+        self.stdout.write(
+            f'Загрузка приложения: {load_ms:.1f} мс, первый ответ '
+            f'{options["path"]} ({runs[0]["status"]}): '
+            f'{first_request_ms:.1f} мс (медиана {options["repeat"]} запусков)'
+        )
+
+        errors = []
+        if import_ms > options['max_import_ms']:
+            errors.append(
+                f'импорт {import_ms:.1f} мс > {options["max_import_ms"]} мс'
+            )
+        if first_request_ms > options['max_first_request_ms']:
+            errors.append(
+                f'первый ответ {first_request_ms:.1f} мс > '
+                f'{options["max_first_request_ms"]} мс'
+            )
+        if errors:
+            raise CommandError('Бюджет старта превышен: ' + '; '.join(errors))
+        self.stdout.write(self.style.SUCCESS('Бюджет старта соблюдён.'))
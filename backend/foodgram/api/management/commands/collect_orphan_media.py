@@ -0,0 +1,57 @@
+import os
+import time
+from collections import Counter
+
+from api.models import Recipes, User
+from django.core.management.base import BaseCommand
+
+from foodgram.storage import content_storage
+
+MEDIA_FIELDS = ((Recipes, 'image'), (User, 'avatar'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из контентно-адресуемого хранилища файлы, на которые не '
+        'ссылается ни один рецепт или пользователь.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать файлы моложе стольких часов.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def walk(self, path):
+        directories, files = content_storage.listdir(path)
+        for name in files:
+            yield os.path.join(path, name)
+        for directory in directories:
+            yield from self.walk(os.path.join(path, directory))
+
+    def handle(self, *args, **options):
+        references = Counter()
+        for model, field in MEDIA_FIELDS:
+            references.update(
+                model.objects.exclude(**{field: ''}).exclude(
+                    **{f'{field}__isnull': True}
+                ).values_list(field, flat=True).iterator()
+            )
+        deadline = time.time() - options['min_age'] * 3600
+        removed = 0
+        for model, field in MEDIA_FIELDS:
+            upload_to = model._meta.get_field(field).upload_to.rstrip('/')
+            if not content_storage.exists(upload_to):
+                continue
+            for name in self.walk(upload_to):
+                if references[name] or os.path.getmtime(
+                    content_storage.path(name)
+                ) > deadline:
+                    continue
+                removed += 1
+                if not options['dry_run']:
+                    content_storage.purge(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов без ссылок: {removed}.'
+        ))
@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+import shutil
+from collections import defaultdict
+
+from api.bundles import (BUNDLE_VERSION, IMAGES_DIR, MANIFEST_NAME, Checkpoint,
+                         chunk_name, copy_files, write_json)
+from api.models import ListIngredients, Recipes
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+RECIPE_VALUES = (
+    'id', 'name', 'text', 'cooking_time', 'pub_date', 'image',
+    'author__email', 'author__username',
+    'author__first_name', 'author__last_name',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с ингредиентами, тегами и фото в каталог-архив: '
+        'сжатые NDJSON-чанки и файлы изображений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог для архива.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        os.makedirs(os.path.join(path, IMAGES_DIR), exist_ok=True)
+        checkpoint = Checkpoint(
+            os.path.join(path, '.export-checkpoint.json'),
+            last_id=0, chunks=[],
+        )
+        if checkpoint['last_id']:
+            self.stdout.write(
+                f'Продолжаем выгрузку после рецепта {checkpoint["last_id"]}.'
+            )
+        rows = Recipes.objects.filter(
+            id__gt=checkpoint['last_id']
+        ).order_by('id').values(*RECIPE_VALUES).iterator(
+            chunk_size=options['chunk_size']
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == options['chunk_size']:
+                self.write_chunk(path, chunk, checkpoint, options['workers'])
+                chunk = []
+        if chunk:
+            self.write_chunk(path, chunk, checkpoint, options['workers'])
+        write_json(os.path.join(path, MANIFEST_NAME), {
+            'version': BUNDLE_VERSION,
+            'chunks': checkpoint['chunks'],
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено чанков: {len(checkpoint["chunks"])}.'
+        ))
+
+    def write_chunk(self, path, rows, checkpoint, workers):
+        recipe_ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for recipe_id, name, slug in Recipes.tags.through.objects.filter(
+            recipes_id__in=recipe_ids
+        ).values_list('recipes_id', 'tags__name', 'tags__slug'):
+            tags[recipe_id].append({'name': name, 'slug': slug})
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in ListIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list(
+            'recipe_id', 'ingredient__name',
+            'ingredient__measurement_unit__name', 'amount',
+        ):
+            ingredients[recipe_id].append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+            )
+        name = chunk_name(len(checkpoint['chunks']) + 1)
+        tmp_path = os.path.join(path, f'{name}.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf8') as file:
+            for row in rows:
+                file.write(json.dumps({
+                    'id': row['id'],
+                    'name': row['name'],
+                    'text': row['text'],
+                    'cooking_time': row['cooking_time'],
+                    'pub_date': row['pub_date'].isoformat(),
+                    'image': row['image'],
+                    'author': {
+                        'email': row['author__email'],
+                        'username': row['author__username'],
+                        'first_name': row['author__first_name'],
+                        'last_name': row['author__last_name'],
+                    },
+                    'tags': tags[row['id']],
+                    'ingredients': ingredients[row['id']],
+                }, ensure_ascii=False) + '\n')
+        copied = copy_files(
+            [
+                (row['image'], os.path.join(path, IMAGES_DIR, row['image']))
+                for row in rows if row['image']
+            ],
+            self.copy_image, workers,
+        )
+        os.replace(tmp_path, os.path.join(path, name))
+        checkpoint.save(
+            last_id=rows[-1]['id'], chunks=checkpoint['chunks'] + [name]
+        )
+        self.stdout.write(
+            f'{name}: рецептов {len(rows)}, изображений {copied}.'
+        )
+
+    def copy_image(self, name, target):
+        if os.path.exists(target):
+            return 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            with default_storage.open(name) as source, open(
+                f'{target}.part', 'wb'
+            ) as destination:
+                shutil.copyfileobj(source, destination)
+        except FileNotFoundError:
+            self.stderr.write(f'Нет файла изображения: {name}')
+            return 0
+        os.replace(f'{target}.part', target)
+        return 1
@@ -0,0 +1,144 @@
+import os
+from itertools import combinations, islice
+from multiprocessing import Pool
+
+from api.constants import DEDUP_MAX_BUCKET_SIZE
+from api.dedup import (compute, signature_rows, similarity, store_signatures,
+                       unpack)
+from api.models import RecipeBand, Recipes, RecipeSignature
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# Подписи для дочерних процессов: передаются один раз через initializer.
+_signatures = {}
+
+
+def init_worker(signatures):
+    _signatures.update(signatures)
+
+
+def check_pairs(args):
+    pairs, threshold = args
+    return [
+        (first, second) for first, second in pairs
+        if similarity(_signatures[first], _signatures[second]) >= threshold
+    ]
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def find(parents, item):
+    while parents.setdefault(item, item) != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+class Command(BaseCommand):
+    help = (
+        'Ищет почти одинаковые рецепты во всём каталоге: кандидаты из '
+        'общих корзин LSH проверяются по MinHash-подписям в нескольких '
+        'процессах и объединяются в кластеры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1
+        )
+        parser.add_argument(
+            '--threshold', type=float,
+            default=settings.RECIPE_DEDUP['THRESHOLD'],
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать подписи всех рецептов перед поиском.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Сколько самых больших кластеров вывести.',
+        )
+
+    def rebuild(self, pool, chunk_size):
+        recipe_ids = Recipes.objects.values_list('pk', flat=True).order_by(
+            'pk'
+        ).iterator()
+        total = 0
+        for chunk in chunks(recipe_ids, chunk_size):
+            store_signatures(pool.map(compute, signature_rows(chunk)))
+            total += len(chunk)
+        self.stdout.write(f'Пересчитано подписей: {total}.')
+
+    def candidate_pairs(self):
+        """Пары из общих корзин; переполненные корзины пропускаются."""
+        bucket, members = None, []
+        rows = RecipeBand.objects.filter(recipe__is_hidden=False).order_by(
+            'bucket', 'recipe_id'
+        ).values_list('bucket', 'recipe_id').iterator()
+        pairs = set()
+        for row_bucket, recipe_id in rows:
+            if row_bucket != bucket:
+                if len(members) <= DEDUP_MAX_BUCKET_SIZE:
+                    pairs.update(combinations(members, 2))
+                bucket, members = row_bucket, []
+            members.append(recipe_id)
+        if len(members) <= DEDUP_MAX_BUCKET_SIZE:
+            pairs.update(combinations(members, 2))
+        return pairs
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            # Дочерним процессам не нужны соединения родителя.
+            connections.close_all()
+            with Pool(options['processes']) as pool:
+                self.rebuild(pool, options['chunk_size'])
+        pairs = self.candidate_pairs()
+        signatures = {
+            recipe_id: unpack(data)
+            for recipe_id, data in RecipeSignature.objects.filter(
+                recipe_id__in={item for pair in pairs for item in pair}
+            ).values_list('recipe_id', 'minhash').iterator()
+        }
+        pairs = [
+            pair for pair in pairs
+            if pair[0] in signatures and pair[1] in signatures
+        ]
+        connections.close_all()
+        with Pool(
+            options['processes'], initializer=init_worker,
+            initargs=(signatures,),
+        ) as pool:
+            results = pool.map(check_pairs, (
+                (chunk, options['threshold'])
+                for chunk in chunks(pairs, options['chunk_size'])
+            ))
+        parents = {}
+        for duplicates in results:
+            for first, second in duplicates:
+                parents[find(parents, first)] = find(parents, second)
+        clusters = {}
+        for recipe_id in parents:
+            clusters.setdefault(find(parents, recipe_id), []).append(
+                recipe_id
+            )
+        clusters = sorted(clusters.values(), key=len, reverse=True)
+        names = dict(Recipes.objects.filter(pk__in=[
+            recipe_id for cluster in clusters[:options['limit']]
+            for recipe_id in cluster
+        ]).values_list('pk', 'name'))
+        for cluster in clusters[:options['limit']]:
+            self.stdout.write(f'Кластер из {len(cluster)}: ' + ', '.join(
+                f'{recipe_id} «{names.get(recipe_id, "")}»'
+                for recipe_id in sorted(cluster)
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Кандидатов: {len(pairs)}, кластеров дублей: {len(clusters)}.'
+        ))
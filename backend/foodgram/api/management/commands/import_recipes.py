@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+
+from api.bundles import IMAGES_DIR, MANIFEST_NAME, Checkpoint, copy_files
+from api.invalidation import RECIPE, DirtyKey, bus
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units, User
+from api.tag_masks import assign_tag_bits, rebuild_tags_masks
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из каталога-архива export_recipes пачками '
+        'bulk_create с переназначением id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог с архивом.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise CommandError(f'В каталоге {path} нет {MANIFEST_NAME}')
+        with open(manifest_path, encoding='utf8') as file:
+            manifest = json.load(file)
+        checkpoint = Checkpoint(
+            os.path.join(path, '.import-checkpoint.json'), chunks=[]
+        )
+        self.batch_size = options['batch_size']
+        for name in manifest['chunks']:
+            if name in checkpoint['chunks']:
+                continue
+            with gzip.open(os.path.join(path, name), 'rt',
+                           encoding='utf8') as file:
+                records = [json.loads(line) for line in file]
+            copied = copy_files(
+                [
+                    (os.path.join(path, IMAGES_DIR, record['image']),
+                     record['image'])
+                    for record in records if record['image']
+                ],
+                self.copy_image, options['workers'],
+            )
+            with transaction.atomic():
+                created = self.import_records(records)
+            checkpoint.save(chunks=checkpoint['chunks'] + [name])
+            self.stdout.write(
+                f'{name}: рецептов {created}, изображений {copied}.'
+            )
+        self.stdout.write(self.style.SUCCESS('Загрузка данных окончена.'))
+
+    def copy_image(self, source, name):
+        if default_storage.exists(name):
+            return 0
+        with open(source, 'rb') as file:
+            default_storage.save(name, File(file))
+        return 1
+
+    def get_or_create_many(self, model, field, objects, prepare=None):
+        """Id объектов по натуральному ключу, недостающие создаются.
+
+        ``prepare`` заполняет у новых объектов то, что обычно делает их
+        save(): bulk_create его не вызывает.
+        """
+        known = dict(model.objects.filter(
+            **{f'{field}__in': objects.keys()}
+        ).values_list(field, 'id'))
+        missing = [obj for key, obj in objects.items() if key not in known]
+        if missing:
+            if prepare is not None:
+                prepare(missing)
+            model.objects.bulk_create(
+                missing, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            known = dict(model.objects.filter(
+                **{f'{field}__in': objects.keys()}
+            ).values_list(field, 'id'))
+        return known
+
+    def import_records(self, records):
+        authors = self.get_or_create_many(User, 'email', {
+            record['author']['email']: User(
+                password=make_password(None), **record['author']
+            )
+            for record in records
+        })
+        tags = self.get_or_create_many(Tags, 'slug', {
+            tag['slug']: Tags(**tag)
+            for record in records for tag in record['tags']
+        }, prepare=assign_tag_bits)
+        units = self.get_or_create_many(Units, 'name', {
+            item['measurement_unit']: Units(name=item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        })
+        ingredients = self.get_or_create_many(Ingredients, 'name', {
+            item['name']: Ingredients(
+                name=item['name'],
+                measurement_unit_id=units[item['measurement_unit']],
+            )
+            for record in records for item in record['ingredients']
+        })
+        records = [
+            record for record in records
+            if record['author']['email'] in authors
+        ]
+        recipes = [
+            Recipes(
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                author_id=authors[record['author']['email']],
+            )
+            for record in records
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipes.objects.bulk_create(recipes, batch_size=self.batch_size)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        for recipe, record in zip(recipes, records):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        Recipes.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.batch_size
+        )
+        ListIngredients.objects.bulk_create(
+            [
+                ListIngredients(
+                    recipe=recipe,
+                    ingredient_id=ingredients[item['name']],
+                    amount=item['amount'],
+                )
+                for recipe, record in zip(recipes, records)
+                for item in record['ingredients']
+            ],
+            batch_size=self.batch_size,
+        )
+        Recipes.tags.through.objects.bulk_create(
+            [
+                Recipes.tags.through(
+                    recipes_id=recipe.id, tags_id=tags[tag['slug']]
+                )
+                for recipe, record in zip(recipes, records)
+                for tag in record['tags']
+            ],
+            batch_size=self.batch_size,
+        )
+        rebuild_tags_masks(
+            Recipes.objects.filter(id__in=[recipe.id for recipe in recipes])
+        )
+        bus.publish(*(DirtyKey(RECIPE, recipe.id) for recipe in recipes))
+        return len(recipes)
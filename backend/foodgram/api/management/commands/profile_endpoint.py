@@ -0,0 +1,195 @@
+import cProfile
+import random
+import time
+
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units, User
+from api.profiling import (StackSampler, collect_timings, cprofile_report,
+                           get_pyinstrument)
+from api.tag_masks import tags_mask
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import NoReverseMatch, reverse
+from rest_framework.test import APIClient
+
+FORMATS = ('pstats', 'collapsed', 'pyinstrument')
+SEED_PREFIX = 'profile-seed'
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми данными после профилирования."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Профилирует эндпоинт API и сохраняет результат: pstats для '
+        'snakeviz/flameprof, свёрнутые стеки для flamegraph.pl/speedscope '
+        'или HTML-отчёт pyinstrument.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'endpoint',
+            help='Имя URL (api:recipes-list) или путь (/api/recipes/).'
+        )
+        parser.add_argument(
+            '--kwargs', nargs='*', default=[],
+            help='Аргументы URL в виде pk=1.'
+        )
+        parser.add_argument(
+            '--query', default='', help='Строка запроса: limit=6&tags=x.'
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого запрос.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--format', choices=FORMATS, default='pstats')
+        parser.add_argument('--output', help='Файл для результата.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Создать столько тестовых рецептов на время профилирования.'
+        )
+
+    def get_path(self, endpoint, kwargs):
+        if endpoint.startswith('/'):
+            return endpoint
+        try:
+            return reverse(endpoint, kwargs=dict(
+                item.split('=', 1) for item in kwargs
+            ))
+        except NoReverseMatch as error:
+            raise CommandError(error)
+
+    def get_client(self, email):
+        hosts = [
+            host for host in settings.ALLOWED_HOSTS if '*' not in host
+        ] or ['localhost']
+        client = APIClient(HTTP_HOST=hosts[0].lstrip('.'))
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'Пользователь {email} не найден.')
+            client.force_authenticate(user)
+        return client
+
+    def seed(self, count):
+        """Создаёт рецепты с тегами и ингредиентами без файлов картинок."""
+        unit = Units.objects.create(name=SEED_PREFIX)
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'{SEED_PREFIX}-{index}', measurement_unit=unit
+            )
+            for index in range(20)
+        ]
+        tags = [
+            Tags.objects.create(
+                name=f'{SEED_PREFIX}-{index}', slug=f'{SEED_PREFIX}-{index}'
+            )
+            for index in range(3)
+        ]
+        authors = [
+            User.objects.create_user(
+                f'{SEED_PREFIX}-{index}@example.com',
+                f'{SEED_PREFIX}-{index}', 'Profile', 'Seed', None
+            )
+            for index in range(10)
+        ]
+        recipes_tags = {}
+        recipes = []
+        for index in range(count):
+            recipe_tags = random.sample(tags, 2)
+            recipe = Recipes(
+                name=f'{SEED_PREFIX}-{index}', text=SEED_PREFIX,
+                cooking_time=index % 120 + 1, author=authors[index % 10],
+                image=f'recipes/images/{SEED_PREFIX}.png',
+                tags_mask=tags_mask(recipe_tags),
+            )
+            recipe.save()
+            recipes.append(recipe)
+            recipes_tags[recipe.pk] = recipe_tags
+        Recipes.tags.through.objects.bulk_create(
+            Recipes.tags.through(recipes_id=recipe_id, tags_id=tag.pk)
+            for recipe_id, recipe_tags in recipes_tags.items()
+            for tag in recipe_tags
+        )
+        ListIngredients.objects.bulk_create(
+            ListIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, 5)
+        )
+
+    def profile(self, request, repeat, output_format):
+        if output_format == 'collapsed':
+            profiler = StackSampler()
+            profiler.start()
+        elif output_format == 'pyinstrument':
+            profiler = get_pyinstrument().Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            for _ in range(repeat):
+                response = request()
+        duration = time.perf_counter() - started
+        if output_format == 'pstats':
+            profiler.disable()
+        else:
+            profiler.stop()
+        return profiler, timings, response, duration
+
+    def write(self, profiler, output_format, output):
+        if output_format == 'pstats':
+            self.stdout.write(cprofile_report(profiler))
+            if output:
+                profiler.dump_stats(output)
+            return
+        if output_format == 'collapsed':
+            report = profiler.collapsed()
+        else:
+            report = profiler.output_html()
+        if output:
+            with open(output, 'w', encoding='utf8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def handle(self, *args, **options):
+        if options['format'] == 'pyinstrument' and not get_pyinstrument():
+            raise CommandError('pyinstrument не установлен.')
+        path = self.get_path(options['endpoint'], options['kwargs'])
+        if options['query']:
+            path = f'{path}?{options["query"]}'
+        client = self.get_client(options['user'])
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                client.get(path)
+                profiler, timings, response, duration = self.profile(
+                    lambda: client.get(path),
+                    options['repeat'], options['format'],
+                )
+                raise Rollback
+        except Rollback:
+            pass
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{path} вернул {response.status_code}: '
+                f'{response.content[:200]!r}'
+            )
+        self.write(profiler, options['format'], options['output'])
+        self.stdout.write(
+            f'{path}: {duration / options["repeat"] * 1000:.3f} мс '
+            f'на запрос, {options["repeat"]} повторов'
+        )
+        for row in timings.report():
+            self.stdout.write(
+                f'{row["name"]}: {row["total_ms"]} мс, '
+                f'вызовов {row["calls"]}'
+            )
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Результат записан в {options["output"]}.'
+            ))
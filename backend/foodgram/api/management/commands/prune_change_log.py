@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from api.models import ChangeLog
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет старые записи журнала изменений. Клиенты с курсором '
+        'старше оставшихся записей получат reset и загрузят данные заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Хранить записи не старше стольких дней.',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        # Последнюю запись оставляем всегда: по ней видно, до какого
+        # номера журнал очищен.
+        last_id = ChangeLog.objects.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return
+        old = ChangeLog.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=options['days']),
+            id__lt=last_id,
+        )
+        deleted = 0
+        while True:
+            ids = list(old.values_list('id', flat=True)[
+                :options['batch_size']
+            ])
+            if not ids:
+                break
+            deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {deleted}.'
+        ))
@@ -0,0 +1,21 @@
+from api.models import Recipes, Tags
+from api.tag_masks import assign_tag_bits, rebuild_tags_masks
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Назначает биты тегам и пересчитывает маски тегов всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tags = list(Tags.objects.filter(bit=None))
+        assign_tag_bits(tags)
+        Tags.objects.bulk_update(tags, ['bit'])
+        updated = rebuild_tags_masks(
+            Recipes.objects.all(), batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны маски рецептов: {updated} шт.'
+        ))
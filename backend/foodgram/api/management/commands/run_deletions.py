@@ -0,0 +1,38 @@
+from api.constants import DELETION_BATCH_SIZE
+from api.deletion import claim, pending_jobs, run_deletion
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пачками строки, зависящие от скрытых рецептов и '
+        'пользователей, и сами объекты. Запускается по cron или воркером; '
+        'прерванное удаление продолжается с сохранённого шага.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Не больше стольких пачек на одно удаление за запуск.',
+        )
+
+    def handle(self, *args, **options):
+        for job in pending_jobs():
+            if not claim(job):
+                continue
+            try:
+                done = run_deletion(
+                    job, options['batch_size'], options['max_batches']
+                )
+            except Exception as error:
+                # Упавшая задача не мешает остальным: она повторится
+                # позже, см. DeletionJob.retry_at.
+                self.stderr.write(f'{job}: ошибка {error!r}.')
+                continue
+            self.stdout.write(
+                f'{job}: шаг {job.step}, удалено строк {job.deleted}'
+                + (', готово.' if done else '.')
+            )
@@ -0,0 +1,24 @@
+from api.user_search import INDEX_SQL
+from django.core.management.base import BaseCommand
+from django.db import connection
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт в PostgreSQL расширение pg_trgm и индексы для поиска '
+        'пользователей. Индексы строятся CONCURRENTLY, без блокировки '
+        'записи. На других базах поиск идёт по индексу в памяти.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(
+                f'{connection.vendor}: индексы не нужны, поиск использует '
+                'n-граммный индекс в памяти процесса.'
+            )
+            return
+        with connection.cursor() as cursor:
+            for sql in INDEX_SQL:
+                cursor.execute(sql.format(table=User._meta.db_table))
+        self.stdout.write(self.style.SUCCESS('Индексы поиска созданы.'))
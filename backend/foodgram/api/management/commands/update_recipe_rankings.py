@@ -0,0 +1,21 @@
+from api.rankings import update_recipe_rankings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярность и рейтинг трендов рецептов, у которых '
+        'менялось избранное или списки покупок. Запускается по cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только изменившиеся.',
+        )
+
+    def handle(self, *args, **options):
+        changed = update_recipe_rankings(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Изменение популярности: {changed}.'
+        ))
@@ -0,0 +1,362 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+REGISTRY = {}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def merge_values(target, values):
+    """Добавляет значения шарда: числа или списки корзин гистограммы."""
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for index, item in enumerate(value):
+                    current[index] += item
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class ThreadShards:
+    """Значения метрики по потокам.
+
+    В свой шард пишет только поток-владелец, поэтому запись идёт без
+    блокировок. Блокировка нужна при появлении нового потока и при
+    сборе; шарды завершившихся потоков сливаются в общий итог, чтобы пулы
+    потоков не копили их.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.local = threading.local()
+        self.shards = []
+        self.retired = {}
+        self.lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = self.factory()
+            with self.lock:
+                self.shards.append((threading.current_thread(), values))
+            return values
+
+    def collect(self):
+        total = {}
+        with self.lock:
+            alive = []
+            for thread, values in self.shards:
+                if thread.is_alive():
+                    alive.append((thread, values))
+                else:
+                    merge_values(self.retired, values)
+            self.shards = alive
+            merge_values(total, self.retired)
+            for _, values in alive:
+                # copy() словаря атомарна под GIL, поэтому владелец может
+                # писать в шард во время сбора.
+                merge_values(total, values.copy())
+        return total
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.retired = {}
+        for _, values in self.shards:
+            values.clear()
+
+
+class Counter:
+    """Счётчик событий с метками внутри процесса."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.shards = ThreadShards(lambda: defaultdict(int))
+
+    def inc(self, amount=1, **labels):
+        self.shards.get()[label_key(labels)] += amount
+
+    def get(self, **labels):
+        return self.collect().get(label_key(labels), 0)
+
+    def collect(self):
+        return self.shards.collect()
+
+    def reset(self):
+        self.shards.reset()
+
+
+def counter(name, documentation):
+    """Возвращает счётчик из реестра, создавая его при первом обращении."""
+    if name not in REGISTRY:
+        REGISTRY[name] = Counter(name, documentation)
+    return REGISTRY[name]
+
+
+class Gauge:
+    """Текущее значение величины, например длины очереди.
+
+    ``set`` заменяет значение, поэтому шарды по потокам здесь не подходят:
+    значения меняются редко и защищены блокировкой.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        return self.values.get(label_key(labels), 0)
+
+    def collect(self):
+        with self.lock:
+            return dict(self.values)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+
+class Histogram:
+    """Распределение наблюдений по корзинам (в секундах).
+
+    Значение по меткам - список: число наблюдений в каждой корзине,
+    затем в корзине +Inf, последним - сумма наблюдений.
+    """
+
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.shards = ThreadShards(dict)
+
+    def observe(self, value, **labels):
+        values = self.shards.get()
+        key = label_key(labels)
+        counts = values.get(key)
+        if counts is None:
+            counts = values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self):
+        return self.shards.collect()
+
+    def reset(self):
+        self.shards.reset()
+
+
+def gauge(name, documentation):
+    if name not in REGISTRY:
+        REGISTRY[name] = Gauge(name, documentation)
+    return REGISTRY[name]
+
+
+def histogram(name, documentation, **kwargs):
+    if name not in REGISTRY:
+        REGISTRY[name] = Histogram(name, documentation, **kwargs)
+    return REGISTRY[name]
+
+
+def get_config():
+    return {
+        'MULTIPROCESS_DIR': None,
+        'FLUSH_INTERVAL': 5,
+        **getattr(settings, 'METRICS', {}),
+    }
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiprocessCollector:
+    """Сбор метрик всех воркеров gunicorn через файлы.
+
+    Каждый процесс раз в FLUSH_INTERVAL секунд и при выходе записывает
+    снимок своих метрик в MULTIPROCESS_DIR/<pid>-<время старта>.json:
+    процесс с тем же pid после перезапуска пишет в новый файл. Воркер,
+    которому достался запрос /metrics, складывает свои значения со
+    снимками остальных. Счётчики и гистограммы завершившихся воркеров
+    остаются в сумме, а их gauge не учитываются: живым считается процесс,
+    чей снимок обновлялся за последние три FLUSH_INTERVAL. Каталог
+    очищает CMD образа перед запуском gunicorn. Без MULTIPROCESS_DIR
+    отдаются метрики текущего процесса.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.name = None
+        self.lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return get_config()['MULTIPROCESS_DIR']
+
+    def start(self):
+        """Запускает запись снимков в текущем процессе (после fork)."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            self.name = f'{os.getpid()}-{time.time_ns()}.json'
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(
+                target=self.flush_forever, name='metrics-flush', daemon=True
+            ).start()
+
+    def flush_forever(self):
+        interval = get_config()['FLUSH_INTERVAL']
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        if not self.started or not self.directory:
+            return
+        path = os.path.join(self.directory, self.name)
+        data = {
+            name: [
+                [list(key), value]
+                for key, value in metric.collect().items()
+            ]
+            for name, metric in REGISTRY.items()
+        }
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(f'{path}.tmp', path)
+
+    def read_snapshots(self):
+        fresh = time.time() - 3 * get_config()['FLUSH_INTERVAL']
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            name = os.path.basename(path)
+            if name == self.name:
+                continue
+            try:
+                pid = int(name.split('-')[0])
+                alive = os.path.getmtime(path) > fresh and is_alive(pid)
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            yield alive, data
+
+    def collect(self):
+        """Значения всех метрик по именам, сложенные по процессам."""
+        values = {name: metric.collect() for name, metric in REGISTRY.items()}
+        if not self.directory:
+            return values
+        for alive, data in self.read_snapshots():
+            for name, rows in data.items():
+                metric = REGISTRY.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                merge_values(values[name], {
+                    tuple(map(tuple, key)): value for key, value in rows
+                })
+        return values
+
+    def reset(self):
+        """Сброс значений, унаследованных от мастер-процесса при fork."""
+        self.started = False
+        self.lock = threading.Lock()
+        for metric in REGISTRY.values():
+            metric.reset()
+
+
+collector = MultiprocessCollector()
+atexit.register(collector.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=collector.reset)
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+def format_number(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render_metrics():
+    """Все метрики в текстовом формате Prometheus."""
+    values = collector.collect()
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {escape(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(values[name].items()):
+            if metric.type != 'histogram':
+                lines.append(
+                    f'{name}{format_labels(key)} {format_number(value)}'
+                )
+                continue
+            cumulative = 0
+            bounds = [*map(format_number, metric.buckets), '+Inf']
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{format_labels(key, [("le", bound)])} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{name}_sum{format_labels(key)} {format_number(value[-1])}'
+            )
+            lines.append(f'{name}_count{format_labels(key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
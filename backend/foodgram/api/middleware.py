@@ -0,0 +1,88 @@
+import time
+from functools import lru_cache
+
+from django.db import connection
+
+from .invalidation import bus
+from .metrics import collector, counter, histogram
+
+request_duration = histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время ответа по действиям views.',
+)
+db_queries = counter(
+    'foodgram_db_queries_total', 'SQL-запросы, выполненные при ответе.'
+)
+db_query_seconds = counter(
+    'foodgram_db_query_seconds_total', 'Суммарное время SQL-запросов.'
+)
+
+
+class InvalidationMiddleware:
+    """Копит события об изменениях за запрос и отправляет их одной пачкой."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        bus.listen()
+        with bus.batch():
+            return self.get_response(request)
+
+
+@lru_cache(maxsize=1024)
+def handler_name(view, method):
+    """Имя действия для меток: ``RecipesViewSet.list``, ``BatchView.post``."""
+    cls = getattr(view, 'cls', None)
+    if cls is None:
+        return getattr(view, '__name__', 'view')
+    method = method.lower()
+    actions = getattr(view, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+class QueryTimer:
+    """execute_wrapper: число и время SQL-запросов за один ответ."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Время ответа по действиям views, число и время SQL-запросов.
+
+    Стоит первым в MIDDLEWARE, чтобы в замер попала вся цепочка.
+    Накладные расходы проверяет команда bench_metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not collector.started:
+            collector.start()
+        queries = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        handler = getattr(request, 'metrics_handler', 'unmatched')
+        request_duration.observe(
+            time.perf_counter() - start, handler=handler,
+            method=request.method, status=f'{response.status_code // 100}xx',
+        )
+        if queries.count:
+            db_queries.inc(queries.count, handler=handler)
+            db_query_seconds.inc(queries.seconds, handler=handler)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_handler = handler_name(view_func, request.method)
@@ -1,9 +1,13 @@
-from django.core.validators import MinValueValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from users.models import User
 
-from .constants import (INGREDIENTS_LIMIT_LENGHT, MEASUREMENT_UNIT_LENGHT,
-                        SMALL_LIMIT_LENGHT, TEXT_LIMIT_LENGHT)
+from foodgram.storage import content_storage
+
+from .constants import (INGREDIENTS_LIMIT_LENGHT, MAX_TAG_BITS,
+                        MEASUREMENT_UNIT_LENGHT, SMALL_LIMIT_LENGHT,
+                        TEXT_LIMIT_LENGHT)
 
 
 class Tags(models.Model):
@@ -16,6 +20,12 @@ class Tags(models.Model):
         max_length=SMALL_LIMIT_LENGHT,
         unique=True,
     )
+    bit = models.PositiveSmallIntegerField(
+        'Номер бита в маске тегов рецепта',
+        unique=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta():
         verbose_name = 'Тег'
@@ -25,6 +35,20 @@ class Tags(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = free_tag_bits(1)[0]
+        super().save(*args, **kwargs)
+
+
+def free_tag_bits(count):
+    """Первые ``count`` свободных битов маски тегов."""
+    taken = set(Tags.objects.exclude(bit=None).values_list('bit', flat=True))
+    free = [bit for bit in range(MAX_TAG_BITS) if bit not in taken]
+    if len(free) < count:
+        raise ValidationError(f'Нельзя создать больше {MAX_TAG_BITS} тегов.')
+    return free[:count]
+
 
 class Units(models.Model):
     name = models.CharField(
@@ -63,6 +87,13 @@ class Ingredients(models.Model):
         return self.name
 
 
+class VisibleManager(models.Manager):
+    """Объекты без скрытых: удалённые ждут фоновой очистки."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
 class Recipes(models.Model):
     ingredients = models.ManyToManyField(
         Ingredients,
@@ -77,6 +108,7 @@ class Recipes(models.Model):
     image = models.ImageField(
         'Фото рецепта',
         upload_to='recipes/images/',
+        storage=content_storage,
     )
     name = models.CharField(
         'Название рецепта',
@@ -102,11 +134,53 @@ class Recipes(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    popularity = models.PositiveIntegerField(
+        'Популярность',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        'Рейтинг в трендах',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        'Маска тегов',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+    is_hidden = models.BooleanField(
+        'Скрыт до удаления',
+        default=False,
+        editable=False,
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-popularity', '-pub_date'),
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-pub_date'),
+                name='recipe_trending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -175,7 +249,336 @@ class ShoppingCartIngredients(models.Model):
         verbose_name='Рецепт',
         related_name='recipe_download',
     )
+    servings = models.PositiveSmallIntegerField(
+        'Порции',
+        default=1,
+        validators=[MinValueValidator(
+            1,
+            message='Количество порций не может быть меньше 1.'
+        )]
+    )
 
     class Meta():
         verbose_name = 'Добавлен в список покупок'
         verbose_name_plural = 'Добавленые в списки покупок'
+
+
+class RankingWatermark(models.Model):
+    """Отметка последнего пересчёта рейтингов рецептов."""
+
+    name = models.CharField(
+        'Название',
+        max_length=SMALL_LIMIT_LENGHT,
+        unique=True,
+    )
+    last_change_id = models.BigIntegerField(
+        'Последняя учтённая запись журнала изменений',
+        default=0,
+    )
+    epoch = models.DateTimeField(
+        'Точка отсчёта затухания',
+    )
+    updated_at = models.DateTimeField(
+        'Время пересчёта',
+        auto_now=True,
+    )
+
+    class Meta():
+        verbose_name = 'Отметка пересчёта рейтингов'
+        verbose_name_plural = 'Отметки пересчёта рейтингов'
+
+    def __str__(self):
+        return self.name
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений для дельта-синхронизации клиентов.
+
+    ``id`` - монотонная последовательность, по ней клиент запоминает курсор.
+    Записи рецептов общие (``user`` пуст), записи избранного, списка
+    покупок и подписок относятся к своему пользователю. Что именно
+    произошло, журнал не хранит: синхронизация сверяет текущее состояние.
+    """
+
+    kind = models.CharField(
+        'Вид объекта',
+        max_length=SMALL_LIMIT_LENGHT,
+    )
+    object_id = models.BigIntegerField(
+        'Id объекта',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        verbose_name='Пользователь',
+        related_name='change_log',
+    )
+    created_at = models.DateTimeField(
+        'Время изменения',
+        auto_now_add=True,
+    )
+
+    class Meta():
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('user', 'id'),
+                name='change_log_user_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}'
+
+
+class DeletionJob(models.Model):
+    """Фоновое удаление рецепта или пользователя со всеми зависимыми.
+
+    Объект скрывается сразу, а связанные строки удаляются пачками командой
+    run_deletions. ``step`` - номер текущего шага, с него удаление
+    продолжается после перезапуска. Упавшее удаление повторяется не
+    раньше ``retry_at``, не больше DELETION_MAX_ATTEMPTS раз.
+    """
+
+    RECIPE = 'recipe'
+    USER = 'user'
+    KINDS = ((RECIPE, 'Рецепт'), (USER, 'Пользователь'))
+
+    kind = models.CharField(
+        'Что удаляется',
+        max_length=SMALL_LIMIT_LENGHT,
+        choices=KINDS,
+    )
+    object_id = models.BigIntegerField(
+        'Id объекта',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=SMALL_LIMIT_LENGHT,
+        default='queued',
+    )
+    step = models.PositiveSmallIntegerField(
+        'Текущий шаг',
+        default=0,
+    )
+    deleted = models.PositiveIntegerField(
+        'Удалено строк',
+        default=0,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Неудачных попыток',
+        default=0,
+    )
+    retry_at = models.DateTimeField(
+        'Повторить после',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'Создано',
+        auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        'Обновлено',
+        auto_now=True,
+    )
+
+    class Meta():
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash-подпись рецепта по ингредиентам и названию."""
+
+    recipe = models.OneToOneField(
+        Recipes,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='signature',
+    )
+    minhash = models.BinaryField(
+        'MinHash-подпись',
+    )
+
+    class Meta():
+        verbose_name = 'Подпись рецепта'
+        verbose_name_plural = 'Подписи рецептов'
+
+
+class RecipeBand(models.Model):
+    """Корзина LSH: рецепты с одинаковой полосой подписи - кандидаты."""
+
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='bands',
+    )
+    bucket = models.BigIntegerField(
+        'Корзина',
+        db_index=True,
+    )
+
+    class Meta():
+        verbose_name = 'Полоса подписи рецепта'
+        verbose_name_plural = 'Полосы подписей рецептов'
+
+
+class MealPlan(models.Model):
+    """План питания пользователя на неделю."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='meal_plans',
+    )
+    name = models.CharField(
+        'Название',
+        max_length=TEXT_LIMIT_LENGHT,
+    )
+    week_start = models.DateField(
+        'Начало недели',
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+
+    class Meta():
+        verbose_name = 'План питания'
+        verbose_name_plural = 'Планы питания'
+        ordering = ('-week_start', 'id')
+
+    def __str__(self):
+        return self.name
+
+
+class MealPlanEntry(models.Model):
+    """Рецепт в плане: день недели и число порций."""
+
+    plan = models.ForeignKey(
+        MealPlan,
+        on_delete=models.CASCADE,
+        verbose_name='План питания',
+        related_name='entries',
+    )
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='meal_plan_entries',
+    )
+    day = models.PositiveSmallIntegerField(
+        'День недели',
+        validators=[MaxValueValidator(
+            6,
+            message='День недели - число от 0 (понедельник) до 6.'
+        )]
+    )
+    servings = models.PositiveSmallIntegerField(
+        'Порции',
+        default=1,
+        validators=[MinValueValidator(
+            1,
+            message='Количество порций не может быть меньше 1.'
+        )]
+    )
+
+    class Meta():
+        verbose_name = 'Рецепт в плане питания'
+        verbose_name_plural = 'Рецепты в планах питания'
+        ordering = ('day', 'id')
+
+
+class EventTicket(models.Model):
+    """Одноразовый билет на подключение к /api/events/.
+
+    EventSource не умеет передавать заголовки, а постоянный токен в
+    строке запроса попал бы в логи nginx. Билет живёт
+    EVENTS_TICKET_SECONDS и удаляется при первом подключении.
+    """
+
+    key = models.CharField(
+        'Ключ',
+        max_length=64,
+        unique=True,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='event_tickets',
+    )
+    expires_at = models.DateTimeField(
+        'Действует до',
+        db_index=True,
+    )
+
+    class Meta():
+        verbose_name = 'Билет на поток событий'
+        verbose_name_plural = 'Билеты на поток событий'
+
+
+class BackgroundJob(models.Model):
+    """Статус фоновой задачи LocalJobQueue.
+
+    Задача выполняется в потоке одного процесса, а опрос статуса может
+    прийти в любой другой, поэтому статус хранится в базе, а не в кеше
+    процесса. Записи живут JOBS_RESULT_TIMEOUT секунд.
+    """
+
+    id = models.CharField(
+        'Id',
+        max_length=SMALL_LIMIT_LENGHT,
+        primary_key=True,
+    )
+    kind = models.CharField(
+        'Вид задачи',
+        max_length=SMALL_LIMIT_LENGHT,
+    )
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Владелец',
+        related_name='background_jobs',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=SMALL_LIMIT_LENGHT,
+    )
+    result = models.TextField(
+        'Результат',
+        null=True,
+        blank=True,
+    )
+    error = models.TextField(
+        'Ошибка',
+        null=True,
+        blank=True,
+    )
+    expires_at = models.DateTimeField(
+        'Хранится до',
+        db_index=True,
+    )
+
+    class Meta():
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return f'{self.kind}:{self.id}'
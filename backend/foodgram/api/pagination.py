@@ -1,8 +1,13 @@
 from rest_framework.pagination import LimitOffsetPagination
 
 from .constants import PAGE_SIZE_PAGINATION
+from .profiling import profiled
 
 
 class LimitNumber(LimitOffsetPagination):
     page_size = PAGE_SIZE_PAGINATION
     page_size_query_param = 'limit'
+
+    @profiled('LimitNumber.paginate_queryset')
+    def paginate_queryset(self, queryset, request, view=None):
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,285 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connection
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+from .constants import PROFILE_STATS_LIMIT
+
+_timings = ContextVar('profiling_timings', default=None)
+
+
+def get_pyinstrument():
+    """pyinstrument, если он установлен: импортируется при первом профиле."""
+    try:
+        import pyinstrument
+    except ImportError:
+        return None
+    return pyinstrument
+
+
+class Timings:
+    """Суммарное время и число вызовов по участкам кода."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, name, seconds):
+        self.totals[name] += seconds
+        self.calls[name] += 1
+
+    def report(self):
+        return [
+            {
+                'name': name,
+                'calls': self.calls[name],
+                'total_ms': round(total * 1000, 3),
+            }
+            for name, total in sorted(
+                self.totals.items(), key=lambda item: -item[1]
+            )
+        ]
+
+
+@contextmanager
+def collect_timings():
+    """Включает замеры ``timed``, полей и фильтров в текущем контексте."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def timed(name):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def profiled(name=None):
+    """Декоратор: замеряет функцию, пока включён сбор замеров."""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class ProfiledSerializerMixin:
+    """Замеряет каждое поле сериализатора, в том числе SerializerMethodField.
+
+    Без включённого сбора замеров работает обычный to_representation.
+    Время вложенных сериализаторов входит во время поля-родителя.
+    """
+
+    def to_representation(self, instance):
+        timings = _timings.get()
+        if timings is None:
+            return super().to_representation(instance)
+        prefix = type(self).__name__
+        ret = OrderedDict()
+        for field in self._readable_fields:
+            start = time.perf_counter()
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = (
+                attribute.pk if isinstance(attribute, PKOnlyObject)
+                else attribute
+            )
+            if check_for_none is None:
+                ret[field.field_name] = None
+            else:
+                ret[field.field_name] = field.to_representation(attribute)
+            timings.add(
+                f'{prefix}.{field.field_name}', time.perf_counter() - start
+            )
+        return ret
+
+
+class ProfiledFilterSetMixin:
+    """Замеряет каждый фильтр FilterSet, включая методы filter_*."""
+
+    def filter_queryset(self, queryset):
+        timings = _timings.get()
+        if timings is None:
+            return super().filter_queryset(queryset)
+        prefix = type(self).__name__
+        for name, value in self.form.cleaned_data.items():
+            start = time.perf_counter()
+            queryset = self.filters[name].filter(queryset, value)
+            timings.add(f'{prefix}.{name}', time.perf_counter() - start)
+        return queryset
+
+
+class QueryTimer:
+    """execute_wrapper, считающий SQL-запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    def report(self):
+        return {'count': self.count, 'total_ms': round(self.seconds * 1000, 3)}
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик для флеймграфов.
+
+    Фоновый поток раз в ``interval`` секунд снимает стек потока, в котором
+    создан сэмплер. ``collapsed()`` возвращает стеки в формате
+    ``a;b;c <число>``, который понимают flamegraph.pl, inferno и speedscope.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} '
+                    f'({code.co_filename}:{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+def cprofile_report(profiler, limit=PROFILE_STATS_LIMIT):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(
+        'cumulative'
+    ).print_stats(limit)
+    return stream.getvalue()
+
+
+class RequestProfile:
+    """Профиль одного запроса: замеры полей, SQL и отчёт профилировщика."""
+
+    def __init__(self, mode):
+        self.pyinstrument = (
+            get_pyinstrument() if mode == 'pyinstrument' else None
+        )
+        self.use_pyinstrument = self.pyinstrument is not None
+        self.stack = ExitStack()
+        self.queries = QueryTimer()
+
+    def start(self):
+        self.timings = self.stack.enter_context(collect_timings())
+        self.stack.enter_context(connection.execute_wrapper(self.queries))
+        self.started = time.perf_counter()
+        if self.use_pyinstrument:
+            self.profiler = self.pyinstrument.Profiler()
+            self.profiler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.use_pyinstrument:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.stack.close()
+
+    def report(self, status_code):
+        if self.use_pyinstrument:
+            profile = self.profiler.output_text(unicode=True)
+        else:
+            profile = cprofile_report(self.profiler)
+        return {
+            'profiler': (
+                'pyinstrument' if self.use_pyinstrument else 'cProfile'
+            ),
+            'status_code': status_code,
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql': self.queries.report(),
+            'timings': self.timings.report(),
+            'profile': profile,
+        }
+
+
+class ProfilingMixin:
+    """Профилирование запроса по ``?profile=1`` для персонала.
+
+    ``?profile=pyinstrument`` включает pyinstrument, если он установлен,
+    иначе используется cProfile. Вместо ответа возвращается отчёт: время
+    запроса, число и время SQL-запросов, замеры полей и фильтров.
+    """
+
+    profile_param = 'profile'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        mode = request.query_params.get(self.profile_param)
+        if mode and request.user.is_staff:
+            self.request_profile = RequestProfile(mode)
+            self.request_profile.start()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        request_profile = getattr(self, 'request_profile', None)
+        if request_profile is not None:
+            self.request_profile = None
+            request_profile.stop()
+            response = Response(request_profile.report(response.status_code))
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,119 @@
+import math
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .changelog import is_expired, latest_cursor
+from .constants import (RANKING_BATCH_SIZE, RANKING_WATERMARK_NAME,
+                        TRENDING_HALF_LIFE_HOURS, TRENDING_MAX_EXPONENT)
+from .invalidation import FAVORITE, SHOPPING_CART
+from .models import (ChangeLog, ListFavorite, RankingWatermark, Recipes,
+                     ShoppingCartIngredients)
+
+RANKING_ORDERINGS = {
+    'popular': ('-popularity', '-pub_date'),
+    'trending': ('-trending_score', '-pub_date'),
+}
+DECAY_SECONDS = TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+INTERACTIONS = (ListFavorite, ShoppingCartIngredients)
+
+
+def trending_weight(watermark, now):
+    return math.exp((now - watermark.epoch).total_seconds() / DECAY_SECONDS)
+
+
+def count_interactions(recipe_ids):
+    """Текущее число записей в избранном и списках покупок по рецептам."""
+    counts = Counter()
+    for model in INTERACTIONS:
+        counts.update(dict(
+            model.objects.filter(recipe_id__in=recipe_ids)
+            .values_list('recipe_id')
+            .annotate(count=Count('id'))
+            .order_by()
+        ))
+    return counts
+
+
+def recount_popularity(recipe_ids, weight):
+    """Пересчитывает популярность рецептов по текущим записям.
+
+    Популярность - число строк сейчас, а не сумма добавлений, поэтому
+    повторные добавления и удаления её не раздувают. Рейтинг трендов
+    растёт на прирост популярности с весом прямого затухания. Удаления
+    его не уменьшают: вес удалённой записи - вес на момент её
+    добавления, а время добавления не хранится, и вычитание по текущему
+    весу стёрло бы свежие взаимодействия. Старый вклад уходит за счёт
+    затухания. Возвращает сумму изменений.
+    """
+    counts = count_interactions(recipe_ids)
+    changes = {}
+    for recipe_id, popularity in Recipes.all_objects.select_for_update(
+    ).filter(id__in=recipe_ids).values_list('id', 'popularity'):
+        count = counts[recipe_id]
+        if count != popularity:
+            changes.setdefault(
+                (count, count - popularity), []
+            ).append(recipe_id)
+    for (count, delta), ids in changes.items():
+        Recipes.all_objects.filter(id__in=ids).update(
+            popularity=count,
+            trending_score=F('trending_score') + max(delta, 0) * weight,
+        )
+    return sum(abs(delta) * len(ids) for (_, delta), ids in changes.items())
+
+
+def changed_recipes(since, cursor):
+    """Рецепты, у которых с курсора менялось избранное или списки."""
+    return sorted(set(ChangeLog.objects.filter(
+        kind__in=(FAVORITE, SHOPPING_CART), id__gt=since, id__lte=cursor,
+    ).values_list('object_id', flat=True)))
+
+
+def update_recipe_rankings(now=None, full=False):
+    """Пересчитывает рейтинги рецептов, изменившихся с прошлого запуска.
+
+    Изменившиеся рецепты берутся из журнала изменений до курсора
+    latest_cursor: записи моложе SYNC_SETTLE_SECONDS ждут следующего
+    запуска, поэтому запись, получившая id раньше, а закоммиченная
+    позже соседей, не пропускается. При первом запуске, если журнал
+    очищен дальше отметки или передан ``full``, пересчитываются все
+    рецепты.
+
+    Рейтинг трендов считается с прямым затуханием (forward decay): новое
+    взаимодействие весит exp((now - epoch) / tau), так что старые оценки
+    не нужно пересчитывать. Когда вес становится слишком большим, все
+    оценки нормируются одним UPDATE и epoch переносится на now.
+    Возвращает сумму изменений популярности.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        watermark, created = (
+            RankingWatermark.objects.select_for_update().get_or_create(
+                name=RANKING_WATERMARK_NAME, defaults={'epoch': now}
+            )
+        )
+        cursor = latest_cursor()
+        if full or created or is_expired(watermark.last_change_id):
+            recipe_ids = list(
+                Recipes.all_objects.order_by('id').values_list('id', flat=True)
+            )
+        else:
+            recipe_ids = changed_recipes(watermark.last_change_id, cursor)
+        exponent = (now - watermark.epoch).total_seconds() / DECAY_SECONDS
+        if exponent > TRENDING_MAX_EXPONENT:
+            Recipes.all_objects.filter(trending_score__gt=0).update(
+                trending_score=F('trending_score') * math.exp(-exponent)
+            )
+            watermark.epoch = now
+        weight = trending_weight(watermark, now)
+        changed = 0
+        for start in range(0, len(recipe_ids), RANKING_BATCH_SIZE):
+            changed += recount_popularity(
+                recipe_ids[start:start + RANKING_BATCH_SIZE], weight
+            )
+        watermark.last_change_id = max(cursor, watermark.last_change_id)
+        watermark.save()
+    return changed
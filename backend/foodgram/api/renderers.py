@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson с тем же байтовым выводом, что у DRF.
+
+    orjson используется только для компактного вывода в UTF-8, который
+    совпадает с настройками DRF по умолчанию. Для отступов, ASCII-вывода
+    и при отсутствии orjson работает стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if (
+            orjson is None or indent is not None
+            or self.ensure_ascii or not self.compact
+            or self.encoder_class is not JSONEncoder
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=(
+                orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ),
+        )
+        # Как и DRF, экранируем разделители строк для встраивания в JS.
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(
+            PARAGRAPH_SEPARATOR, b'\\u2029'
+        )
@@ -1,14 +1,27 @@
+from django.conf import settings
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
+from django.db.models import F
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import ListSubscriptions, User
 
-from .models import (Ingredients, ListFavorite, ListIngredients, Recipes,
-                     ShoppingCartIngredients, Tags)
-
-
-class UserSerializer(serializers.ModelSerializer):
+from .author_cards import author_cards, render_card
+from .constants import (BATCH_MAX_REQUESTS, USER_SEARCH_LIMIT,
+                        USER_SEARCH_MAX_LIMIT, USER_SEARCH_MIN_LENGTH)
+from .dedup import find_duplicates
+from .fields import ContentHashImageField
+from .invalidation import RECIPE, DirtyKey, bus
+from .models import (Ingredients, ListFavorite, ListIngredients, MealPlan,
+                     MealPlanEntry, Recipes, ShoppingCartIngredients, Tags)
+from .profiling import ProfiledSerializerMixin
+from .sparse import SparseFieldsMixin
+from .tag_masks import sync_tags_mask
+from .viewer_state import marked_ids
+
+
+class UserSerializer(
+    SparseFieldsMixin, ProfiledSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для юзера."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -26,25 +39,48 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request')
-        if not user or user.user.is_anonymous:
-            return False
-        return ListSubscriptions.objects.filter(
-            author=user.user, subscription_on=obj
-        ).exists()
+        return obj.pk in marked_ids(
+            self.context.get('request'), ListSubscriptions, (obj.pk,)
+        )
+
+    def to_representation(self, instance):
+        """Поля профиля берутся из кеша карточек авторов.
+
+        Из кеша приходит всё, кроме ``is_subscribed``; остальные поля
+        наследников (recipes, recipes_count) считаются как обычно. Поля,
+        отброшенные ``?fields=``, не считаются вовсе.
+        """
+        card_fields = UserSerializer.Meta.fields
+        if self.Meta.fields[:len(card_fields)] != card_fields:
+            return super().to_representation(instance)
+        fields = list(self._readable_fields)
+        names = {field.field_name for field in fields}
+        card = render_card(
+            author_cards.get_card(instance), self.context.get('request'),
+            'is_subscribed' in names and self.get_is_subscribed(instance),
+        )
+        ret = {}
+        for field in fields:
+            if field.field_name in card:
+                ret[field.field_name] = card[field.field_name]
+            else:
+                ret[field.field_name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+        return ret
 
 
 class UserAvatarSerializer(UserSerializer):
     """Сериализатор для аватара юзера."""
 
-    avatar = Base64ImageField()
+    avatar = ContentHashImageField()
 
     class Meta:
         model = User
         fields = ('avatar',)
 
 
-class TagsSerializer(serializers.ModelSerializer):
+class TagsSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Сериализатор тегов."""
 
     class Meta:
@@ -53,7 +89,9 @@ class TagsSerializer(serializers.ModelSerializer):
         lookup_field = 'id'
 
 
-class IngredientsSerializer(serializers.ModelSerializer):
+class IngredientsSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор ингредиентов."""
 
     class Meta:
@@ -67,7 +105,9 @@ class IngredientsSerializer(serializers.ModelSerializer):
         return data
 
 
-class ListIngredientsSerializer(serializers.ModelSerializer):
+class ListIngredientsSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     """Класс сериалайзер, который принимает информации по рецептам."""
 
     id = serializers.ReadOnlyField(source='ingredient.id')
@@ -81,7 +121,9 @@ class ListIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'measurement_unit', 'amount', 'name')
 
 
-class RecipesSerializerGet(serializers.ModelSerializer):
+class RecipesSerializerGet(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     """Класс сериализаторов рецептов для метода GET."""
 
     tags = TagsSerializer(many=True, read_only=True)
@@ -91,7 +133,7 @@ class RecipesSerializerGet(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = serializers.ImageField()
 
     class Meta:
         model = Recipes
@@ -109,22 +151,14 @@ class RecipesSerializerGet(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, data):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return ListFavorite.objects.filter(
-            user=request.user,
-            recipe_id=data.id
-        ).exists()
+        return data.id in marked_ids(
+            self.context.get('request'), ListFavorite, (data.id,)
+        )
 
     def get_is_in_shopping_cart(self, data):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return ShoppingCartIngredients.objects.filter(
-            user=request.user,
-            recipe_id=data.id
-        ).exists()
+        return data.id in marked_ids(
+            self.context.get('request'), ShoppingCartIngredients, (data.id,)
+        )
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
@@ -148,7 +182,7 @@ class AddIngredientSerializer(serializers.ModelSerializer):
 class RecipesSerializer(serializers.ModelSerializer):
     """Класс сериализаторов рецептов."""
 
-    image = Base64ImageField()
+    image = ContentHashImageField()
     ingredients = AddIngredientSerializer(many=True)
     tags = serializers.SlugRelatedField(
         slug_field='id', queryset=Tags.objects.all(), many=True, required=True
@@ -163,52 +197,86 @@ class RecipesSerializer(serializers.ModelSerializer):
         extra_kwargs = {'image': {'required': True}}
 
     def to_representation(self, instance):
-        return RecipesSerializerGet(instance, context=self.context).data
+        data = RecipesSerializerGet(instance, context=self.context).data
+        duplicates = getattr(instance, 'possible_duplicates', None)
+        if duplicates:
+            data['possible_duplicates'] = duplicates
+        return data
 
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        duplicates = self.check_duplicates(validated_data['name'], ingredients)
         recipe = Recipes.objects.create(
             author=self.context['request'].user, **validated_data
         )
         self.list_ingredients_create(ingredients, recipe)
         recipe.tags.set(tags)
+        sync_tags_mask(recipe, tags)
+        recipe.possible_duplicates = duplicates
         return recipe
 
+    def check_duplicates(self, name, ingredients):
+        """Похожие рецепты по MinHash; в режиме block - ошибка."""
+        mode = settings.RECIPE_DEDUP['MODE']
+        if mode == 'off':
+            return []
+        duplicates = [
+            recipe_id for recipe_id, _ in find_duplicates(
+                name, [ingredient['id'].pk for ingredient in ingredients]
+            )
+        ]
+        if duplicates and mode == 'block':
+            raise serializers.ValidationError({
+                'detail': 'Похожий рецепт уже опубликован.',
+                'possible_duplicates': duplicates,
+            })
+        return duplicates
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        recipe = super().update(instance, validated_data)
-        if ingredients:
-            recipe.ingredients.clear()
-            self.list_ingredients_create(ingredients, recipe)
-        if tags:
-            recipe.tags.clear()
-            recipe.tags.set(tags)
-        return recipe
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        changed = [
+            name for name, value in validated_data.items()
+            if getattr(instance, name) != value
+        ]
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        if changed:
+            instance.save(update_fields=changed)
+        if ingredients is not None:
+            self.list_ingredients_update(ingredients, instance)
+        if tags is not None:
+            instance.tags.set(tags)
+            sync_tags_mask(instance, tags)
+        return instance
 
     def validate(self, value):
-        if not value.get('image'):
+        if not value.get('image') and (
+            self.instance is None or 'image' in value
+        ):
             raise serializers.ValidationError(
                 'Не забудьте прикрепить фотографию.'
             )
         tags = value.get('tags')
         ingredients = value.get('ingredients')
-        if not tags:
+        if not tags and (not self.partial or 'tags' in value):
             raise serializers.ValidationError(
                 'Вы не указали теги в рецепте.'
             )
-        if not ingredients:
+        if not ingredients and (not self.partial or 'ingredients' in value):
             raise serializers.ValidationError(
                 'Пустой список ингредиентов.'
             )
-        if len(set(tags)) != len(tags):
+        if tags and len(set(tags)) != len(tags):
             raise serializers.ValidationError(
                 'Нельзя добавлять одинаковые теги в рецепт.'
             )
-        list_id_ingredients = [ingredient['id'] for ingredient in ingredients]
+        list_id_ingredients = [
+            ingredient['id'] for ingredient in ingredients or []
+        ]
         if len(list_id_ingredients) != len(set(list_id_ingredients)):
             raise serializers.ValidationError(
                 'Нельзя добавлять одинаковые ингредиенты в рецепт.'
@@ -226,9 +294,44 @@ class RecipesSerializer(serializers.ModelSerializer):
                 for ingredient in ingredients
             ]
         )
-
-
-class ShortRecipeSerializer(serializers.ModelSerializer):
+        # bulk_create не отправляет post_save.
+        bus.publish(DirtyKey(RECIPE, recipe.pk))
+
+    def list_ingredients_update(self, ingredients, recipe):
+        """Записывает только разницу со списком ингредиентов рецепта."""
+        current = {
+            item.ingredient_id: item for item in recipe.recipeingredient.all()
+        }
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.recipeingredient.filter(
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            ListIngredients.objects.bulk_update(changed, ['amount'])
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'].id not in current
+        ]
+        if added:
+            self.list_ingredients_create(added, recipe)
+        elif changed:
+            bus.publish(DirtyKey(RECIPE, recipe.pk))
+
+
+class ShortRecipeSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     """Класс сериалайзер для вывода сокращенной информации по рецептам."""
 
     class Meta:
@@ -240,7 +343,7 @@ class ShoppingCartIngredientsSerializer(serializers.ModelSerializer):
     """Сериализатор для сохранения рецепта в список покупок."""
 
     class Meta:
-        fields = ('user', 'recipe')
+        fields = ('user', 'recipe', 'servings')
         model = ShoppingCartIngredients
         validators = (
             UniqueTogetherValidator(
@@ -299,11 +402,14 @@ class ListSubscriptionsSerialaizerGet(UserSerializer):
         return data.user.count()
 
     def get_recipes(self, data):
+        """С ``?fields=`` без ``?expand=recipes`` - только id рецептов."""
         request = self.context.get('request')
         recipes = data.user.all()
         recipes_limit = request.GET.get('recipes_limit')
         if recipes_limit:
             recipes = recipes[:int(recipes_limit)]
+        if not self.is_expanded('recipes'):
+            return list(recipes.values_list('id', flat=True))
         serializer = ShortRecipeSerializer(recipes, many=True)
         return serializer.data
 
@@ -343,3 +449,96 @@ class DownloadShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('user', 'recipe', 'shopping_cart')
         model = ShoppingCartIngredients
+
+
+class SyncSerializer(serializers.Serializer):
+    """Параметры дельта-синхронизации."""
+
+    since = serializers.IntegerField(min_value=0, required=False)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Под-запрос пакета."""
+
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE'), default='GET'
+    )
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(), required=False
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет под-запросов к API."""
+
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не больше {BATCH_MAX_REQUESTS} запросов в пакете.'
+            )
+        return value
+
+
+class UserSearchSerializer(serializers.Serializer):
+    """Параметры поиска пользователей."""
+
+    q = serializers.CharField(min_length=USER_SEARCH_MIN_LENGTH)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=USER_SEARCH_MAX_LIMIT,
+        default=USER_SEARCH_LIMIT,
+    )
+
+
+class MealPlanEntrySerializer(serializers.ModelSerializer):
+    """Рецепт в плане питания."""
+
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipes.objects.all()
+    )
+
+    class Meta:
+        model = MealPlanEntry
+        fields = ('id', 'recipe', 'day', 'servings')
+
+
+class MealPlanSerializer(serializers.ModelSerializer):
+    """План питания на неделю."""
+
+    entries = MealPlanEntrySerializer(many=True)
+
+    class Meta:
+        model = MealPlan
+        fields = ('id', 'name', 'week_start', 'version', 'entries')
+        read_only_fields = ('version',)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        entries = validated_data.pop('entries')
+        plan = MealPlan.objects.create(
+            user=self.context['request'].user, **validated_data
+        )
+        self.entries_create(entries, plan)
+        return plan
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Любая правка повышает версию: по ней кешируется список покупок."""
+        entries = validated_data.pop('entries', None)
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.version = F('version') + 1
+        instance.save()
+        instance.refresh_from_db(fields=('version',))
+        if entries is not None:
+            instance.entries.all().delete()
+            self.entries_create(entries, instance)
+        return instance
+
+    def entries_create(self, entries, plan):
+        MealPlanEntry.objects.bulk_create(
+            MealPlanEntry(plan=plan, **entry) for entry in entries
+        )
@@ -0,0 +1,148 @@
+import hashlib
+import json
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .cache import record_lookups
+from .constants import MEAL_PLAN_LIST_TIMEOUT, PRINTABLE_CLEANUP_INTERVAL
+from .models import (BackgroundJob, MealPlanEntry, Recipes,
+                     ShoppingCartIngredients)
+
+PRINTABLE_DIR = 'shopping_lists'
+SHOPPING_LIST_JOB = 'shopping_list'
+
+
+def shopping_list_items(entries):
+    """Суммы ингредиентов одним GROUP BY: SUM(amount * servings).
+
+    ``entries`` - записи корзины или плана питания: у них есть рецепт и
+    число порций.
+    """
+    ingredient = 'recipe__recipeingredient__'
+    return list(
+        entries.filter(recipe__is_hidden=False)
+        .values(
+            measurement_unit=F(
+                ingredient + 'ingredient__measurement_unit__name'
+            ),
+            name=F(ingredient + 'ingredient__name'),
+        )
+        .annotate(amount=Sum(F(ingredient + 'amount') * F('servings')))
+        .order_by('measurement_unit', 'name')
+    )
+
+
+def entries_data(entries):
+    """Список покупок и названия рецептов для корзины или плана."""
+    return {
+        'items': shopping_list_items(entries),
+        'recipes': list(
+            Recipes.objects.filter(pk__in=entries.values('recipe_id'))
+            .order_by('name').values_list('name', flat=True)
+        ),
+    }
+
+
+def shopping_list_data(user):
+    """Суммы ингредиентов и названия рецептов из списка покупок."""
+    return entries_data(ShoppingCartIngredients.objects.filter(user=user))
+
+
+def meal_plan_data(plan):
+    """Список покупок плана питания, закешированный по его версии.
+
+    В ключ входят и версии видимых рецептов плана: правка ингредиентов
+    рецепта тоже меняет список. Берётся хеш пар (id, версия), а не сумма
+    версий: скрытие одного рецепта и правка другого могли бы вернуть
+    сумму к старому значению и старому списку.
+    """
+    entries = MealPlanEntry.objects.filter(plan=plan)
+    recipes = sorted(set(entries.filter(recipe__is_hidden=False).values_list(
+        'recipe_id', 'recipe__version'
+    )))
+    digest = hashlib.sha1(repr(recipes).encode()).hexdigest()
+    key = f'meal-plan-list:{plan.pk}:{plan.version}:{digest}'
+    data = cache.get(key)
+    record_lookups('meal-plan-list', data is not None, data is None)
+    if data is None:
+        data = entries_data(entries)
+        cache.set(key, data, MEAL_PLAN_LIST_TIMEOUT)
+    return data
+
+
+def printable_name(data):
+    """Имя файла по хешу содержимого списка покупок."""
+    digest = hashlib.sha256(
+        json.dumps(data, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+    return f'{PRINTABLE_DIR}/{digest}.html'
+
+
+def render_printable(data, name):
+    """Собирает печатную версию списка и сохраняет её в хранилище."""
+    groups = [
+        (unit, [
+            {'name': item['name'], 'amount': item['amount']}
+            for item in items
+        ])
+        for unit, items in groupby(
+            data['items'], key=lambda item: item['measurement_unit']
+        )
+    ]
+    content = render_to_string('api/shopping_list.html', {
+        'groups': groups, 'recipes': data['recipes'],
+    })
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content.encode()))
+    return default_storage.url(name)
+
+
+def build_printable(user_id):
+    """Фоновая задача: список покупок пользователя и его печатная версия.
+
+    Суммы ингредиентов считаются здесь, а не в запросе: запрос только
+    ставит задачу в очередь.
+    """
+    data = shopping_list_data(user_id)
+    if not data['items']:
+        raise ValueError('Список покупок пуст.')
+    url = render_printable(data, printable_name(data))
+    if cache.add('printables-cleanup', 1, PRINTABLE_CLEANUP_INTERVAL):
+        remove_stale_printables()
+    return url
+
+
+def remove_stale_printables(max_age=None):
+    """Удаляет печатные списки, на которые не ссылаются живые задачи.
+
+    Один файл служит всем одинаковым спискам, поэтому удаляется только
+    файл старше ``max_age`` секунд (по умолчанию JOBS_RESULT_TIMEOUT),
+    чей адрес не указан ни в одной неистёкшей задаче.
+    """
+    now = timezone.now()
+    max_age = timedelta(seconds=max_age or getattr(
+        settings, 'JOBS_RESULT_TIMEOUT', 3600
+    ))
+    live = set(BackgroundJob.objects.filter(
+        kind=SHOPPING_LIST_JOB, expires_at__gt=now
+    ).exclude(result=None).values_list('result', flat=True))
+    if not default_storage.exists(PRINTABLE_DIR):
+        return []
+    removed = []
+    for file_name in default_storage.listdir(PRINTABLE_DIR)[1]:
+        name = f'{PRINTABLE_DIR}/{file_name}'
+        if (
+            default_storage.url(name) not in live
+            and now - default_storage.get_modified_time(name) > max_age
+        ):
+            default_storage.delete(name)
+            removed.append(name)
+    return removed
@@ -0,0 +1,116 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from users.models import ListSubscriptions, User
+
+from .authentication import token_cache
+from .author_cards import author_cards
+from .changelog import USER_LISTS, log_user_list_change, record_recipe_changes
+from .conditional import VERSION_FILTERS
+from .dedup import update_signatures
+from .events import publish_user_list_change
+from .invalidation import (FAVORITE, INGREDIENT, RECIPE, SHOPPING_CART,
+                           SUBSCRIPTION, TAG, TOKEN, USER, DirtyKey, bus)
+from .models import (Ingredients, ListFavorite, ListIngredients, Recipes,
+                     ShoppingCartIngredients, Tags)
+from .tag_masks import clear_tag_bit
+from .user_search import ngram_index
+
+MODEL_KEYS = {
+    Recipes: lambda obj: (DirtyKey(RECIPE, obj.pk),),
+    Tags: lambda obj: (DirtyKey(TAG, obj.pk),),
+    Ingredients: lambda obj: (DirtyKey(INGREDIENT, obj.pk),),
+    ListIngredients: lambda obj: (DirtyKey(RECIPE, obj.recipe_id),),
+    ListFavorite: lambda obj: (DirtyKey(FAVORITE, obj.user_id),),
+    ShoppingCartIngredients: lambda obj: (
+        DirtyKey(SHOPPING_CART, obj.user_id),
+    ),
+    ListSubscriptions: lambda obj: (DirtyKey(SUBSCRIPTION, obj.author_id),),
+}
+M2M_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+def publish_model_change(sender, instance, using, **kwargs):
+    bus.publish(*MODEL_KEYS[sender](instance), using=using)
+
+
+# Подключаем по моделям: общий приёмник без sender отключил бы быстрое
+# удаление (fast delete) у всех моделей проекта.
+for model in MODEL_KEYS:
+    post_save.connect(publish_model_change, sender=model)
+    post_delete.connect(publish_model_change, sender=model)
+
+for model in USER_LISTS:
+    post_save.connect(log_user_list_change, sender=model)
+    post_delete.connect(log_user_list_change, sender=model)
+    post_save.connect(publish_user_list_change, sender=model)
+    post_delete.connect(publish_user_list_change, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+@receiver(m2m_changed, sender=Recipes.ingredients.through)
+def publish_recipe_relations_change(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        bus.publish(DirtyKey(RECIPE, instance.pk), using=using)
+    elif pk_set:
+        bus.publish(
+            *(DirtyKey(RECIPE, pk) for pk in pk_set), using=using
+        )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    token_cache.invalidate(instance.key)
+    bus.publish(DirtyKey(TOKEN, instance.key), using=using)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_token(sender, request, user, **kwargs):
+    token = getattr(request, 'auth', None)
+    if token is not None:
+        key = getattr(token, 'key', token)
+        token_cache.invalidate(key)
+        bus.publish(DirtyKey(TOKEN, key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(
+    sender, instance, using, update_fields=None, **kwargs
+):
+    """Смена пароля, деактивация и правка профиля сбрасывают кеш."""
+    token_cache.invalidate_user(instance.pk)
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        # Вход пользователя не меняет его карточку и рецепты.
+        return
+    # Сразу, чтобы ответ на этот же запрос собрал свежую карточку; после
+    # коммита карточку ещё раз сбросит подписка на шину.
+    author_cards.invalidate((instance.pk,))
+    bus.publish(DirtyKey(USER, instance.pk), using=using)
+
+
+def invalidate_author_cards(keys):
+    author_cards.invalidate(key.pk for key in keys)
+
+
+def reindex_users(keys):
+    ngram_index.invalidate(key.pk for key in keys)
+
+
+bus.subscribe(
+    token_cache.invalidate_keys, kinds=(TOKEN, USER), broadcast=True
+)
+bus.subscribe(invalidate_author_cards, kinds=(USER,), broadcast=True)
+bus.subscribe(reindex_users, kinds=(USER,), broadcast=True)
+bus.subscribe(update_signatures, kinds=(RECIPE,))
+bus.subscribe(record_recipe_changes, kinds=tuple(VERSION_FILTERS))
+
+
+@receiver(post_delete, sender=Tags)
+def clear_deleted_tag_bit(sender, instance, **kwargs):
+    if instance.bit is not None:
+        clear_tag_bit(instance.bit)
@@ -0,0 +1,54 @@
+from rest_framework.fields import BooleanField
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def query_list(request, name):
+    """Значения через запятую из параметра запроса или None без него."""
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return frozenset(
+        item.strip() for item in value.split(',') if item.strip()
+    )
+
+
+def query_flag(request, name):
+    """Флаг из параметра запроса: ``?facets=1`` или ``true``, но не ``0``."""
+    return request.query_params.get(name) in BooleanField.TRUE_VALUES
+
+
+def sparse_params(request):
+    """Запрошенные поля и раскрываемые вложенные объекты.
+
+    Без ``?fields=`` возвращает (None, None): все поля, вложенные объекты
+    целиком, как раньше. С ``?fields=`` вложенный объект раскрывается
+    только если он указан в ``?expand=``, иначе вместо него - id. Для
+    запросов на запись набор полей не меняется.
+    """
+    if request is None or request.method != 'GET':
+        return None, None
+    fields = query_list(request, FIELDS_PARAM)
+    if fields is None:
+        return None, None
+    return fields, query_list(request, EXPAND_PARAM) or frozenset()
+
+
+class SparseFieldsMixin:
+    """``?fields=`` и ``?expand=`` для корневого сериализатора DRF.
+
+    Лишние поля удаляются при создании сериализатора, поэтому их
+    SerializerMethodField и запросы не выполняются. Вложенные
+    сериализаторы создаются без запроса в контексте и не затрагиваются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, self.expand = sparse_params(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    def is_expanded(self, name):
+        return self.expand is None or name in self.expand
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q
+
+from .constants import MAX_TAG_BITS
+from .models import Recipes, Tags, free_tag_bits
+
+ALL_BITS = (1 << MAX_TAG_BITS) - 1
+
+
+def tag_bit(bit):
+    """Бит тега; тег без бита - ошибка, а не пустая маска."""
+    if bit is None:
+        raise ValueError(
+            'У тега нет бита маски: выполните manage.py rebuild_tag_masks.'
+        )
+    return 1 << bit
+
+
+def tags_mask(tags):
+    """Маска рецепта по объектам тегов: по биту на тег."""
+    return reduce(or_, (tag_bit(tag.bit) for tag in tags), 0)
+
+
+def assign_tag_bits(tags):
+    """Назначает биты новым тегам до bulk_create, который не зовёт save()."""
+    tags = [tag for tag in tags if tag.bit is None]
+    for tag, bit in zip(tags, free_tag_bits(len(tags))):
+        tag.bit = bit
+
+
+def backfill_tag_bits():
+    """Биты тегам, созданным в обход save(), и маски их рецептов."""
+    tags = list(Tags.objects.filter(bit=None))
+    if not tags:
+        return 0
+    assign_tag_bits(tags)
+    Tags.objects.bulk_update(tags, ['bit'])
+    return rebuild_tags_masks(Recipes.objects.filter(tags__in=tags).distinct())
+
+
+def sync_tags_mask(recipe, tags=None):
+    """Обновляет маску после recipe.tags.set()."""
+    if tags is None:
+        tags = recipe.tags.all()
+    mask = tags_mask(tags)
+    if mask != recipe.tags_mask:
+        recipe.tags_mask = mask
+        Recipes.objects.filter(pk=recipe.pk).update(tags_mask=mask)
+
+
+def rebuild_tags_masks(recipes, batch_size=1000):
+    """Пересчитывает маски рецептов queryset по связям из БД."""
+    masks = defaultdict(int)
+    for recipe_id, bit in Recipes.tags.through.objects.filter(
+        recipes__in=recipes
+    ).values_list('recipes_id', 'tags__bit').iterator():
+        masks[recipe_id] |= tag_bit(bit)
+    objs = [
+        Recipes(id=recipe_id, tags_mask=masks[recipe_id])
+        for recipe_id in recipes.values_list('id', flat=True)
+    ]
+    Recipes.objects.bulk_update(objs, ['tags_mask'], batch_size=batch_size)
+    return len(objs)
+
+
+def clear_tag_bit(bit):
+    """Снимает бит удалённого тега со всех рецептов."""
+    Recipes.objects.filter(tags_mask__gt=0).update(
+        tags_mask=F('tags_mask').bitand(ALL_BITS ^ (1 << bit))
+    )
+
+
+def filter_by_mask(queryset, mask, mode):
+    """Отбор по тегам: any - хотя бы один, all - все, none - ни одного."""
+    alias = f'tags_{mode}_bits'
+    queryset = queryset.annotate(**{alias: F('tags_mask').bitand(mask)})
+    if mode == 'any':
+        return queryset.filter(**{f'{alias}__gt': 0})
+    if mode == 'all':
+        return queryset.filter(**{alias: mask})
+    return queryset.filter(**{alias: 0})
+
+
+def tag_facet_expressions(tags):
+    """Аннотации и агрегаты для подсчёта рецептов по тегам."""
+    annotations = {
+        f'tag_bit_{tag.bit}': F('tags_mask').bitand(tag_bit(tag.bit))
+        for tag in tags
+    }
+    aggregates = {
+        f'tag_{tag.id}': Count(
+            'id', filter=Q(**{f'tag_bit_{tag.bit}__gt': 0})
+        )
+        for tag in tags
+    }
+    return annotations, aggregates
+
+
+def tag_facets(queryset, tags=None):
+    """Число рецептов queryset по каждому тегу за один запрос."""
+    tags = list(Tags.objects.all() if tags is None else tags)
+    if not tags:
+        return {}
+    annotations, aggregates = tag_facet_expressions(tags)
+    counts = queryset.order_by().annotate(**annotations).aggregate(
+        **aggregates
+    )
+    return {tag.id: counts[f'tag_{tag.id}'] for tag in tags}
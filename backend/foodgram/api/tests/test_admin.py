@@ -0,0 +1,75 @@
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units
+from api.tag_masks import sync_tags_mask
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from users.models import User
+
+# Запросы на страницу списка, включая сессию и пользователя. Число не
+# должно зависеть от количества строк.
+RECIPES_CHANGELIST_QUERIES = 7
+USERS_CHANGELIST_QUERIES = 4
+INGREDIENTS_CHANGELIST_QUERIES = 5
+
+
+class ChangelistQueriesTest(TestCase):
+    """Бюджет SQL-запросов на страницах списков админки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin@example.com', 'admin', 'Admin', 'Admin', 'password'
+        )
+        cls.unit = Units.objects.create(name='г')
+        cls.tags = [
+            Tags.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = Ingredients.objects.count()
+        for index in range(count):
+            ingredient = Ingredients.objects.create(
+                name=f'Ингредиент {start + index}', measurement_unit=self.unit
+            )
+            author = User.objects.create_user(
+                f'user{start + index}@example.com', f'user{start + index}',
+                'Имя', 'Фамилия', 'password',
+            )
+            recipe = Recipes.objects.create(
+                name=f'Рецепт {start + index}', text='Текст',
+                cooking_time=10, author=author, image='recipes/image.png',
+            )
+            recipe.tags.set(self.tags[:2])
+            sync_tags_mask(recipe)
+            ListIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+
+    def assert_changelist_queries(self, model, queries):
+        url = reverse(f'admin:{model._meta.app_label}_'
+                      f'{model._meta.model_name}_changelist')
+        for count in (1, 20):
+            with self.subTest(rows=count):
+                self.add_rows(count)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_recipes_changelist(self):
+        self.assert_changelist_queries(Recipes, RECIPES_CHANGELIST_QUERIES)
+
+    def test_users_changelist(self):
+        self.assert_changelist_queries(User, USERS_CHANGELIST_QUERIES)
+
+    def test_ingredients_changelist(self):
+        # Без фильтров на PostgreSQL пагинатор берёт оценку из pg_class.
+        self.assert_changelist_queries(
+            Ingredients,
+            INGREDIENTS_CHANGELIST_QUERIES + (
+                connection.vendor == 'postgresql'
+            ),
+        )
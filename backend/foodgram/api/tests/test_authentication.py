@@ -0,0 +1,63 @@
+from api.authentication import TokenCache, token_cache
+from api.invalidation import TOKEN, USER, PostgresTransport, bus
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class TokenCacheInvalidationTest(TestCase):
+    """Кеш токенов другого процесса сбрасывается через шину."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+
+    def setUp(self):
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Кеш второго процесса: подписан на шину так же, как token_cache.
+        self.other = TokenCache()
+        bus.subscribe(
+            self.other.invalidate_keys, kinds=(TOKEN, USER), broadcast=True
+        )
+        self.addCleanup(bus.subscribers.pop)
+        self.addCleanup(token_cache.invalidate, self.token.key)
+
+    def warm(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        entry = token_cache.get(self.token.key)
+        self.assertIsNotNone(entry)
+        self.other.set(self.token.key, entry)
+
+    def test_logout(self):
+        self.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(self.other.get(self.token.key))
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_password_change(self):
+        self.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new-password')
+            self.user.save()
+        self.assertIsNone(self.other.get(self.token.key))
+
+    def test_last_login_keeps_cache(self):
+        self.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+        self.assertIsNotNone(self.other.get(self.token.key))
+
+    def test_remote_event(self):
+        """Событие из другого процесса (LISTEN/NOTIFY) сбрасывает токен."""
+        self.warm()
+        PostgresTransport(bus).deliver(
+            {'origin': 'other', 'keys': [[TOKEN, self.token.key]]}
+        )
+        self.assertIsNone(self.other.get(self.token.key))
@@ -0,0 +1,71 @@
+from api.author_cards import AuthorCardCache, author_cards
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import ListSubscriptions, User
+
+
+class AuthorCardCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password',
+            avatar='users/images/avatar.png',
+        )
+        cls.viewer = User.objects.create_user(
+            'viewer@example.com', 'viewer', 'Имя', 'Фамилия', 'password'
+        )
+        ListSubscriptions.objects.create(
+            author=cls.viewer, subscription_on=cls.author
+        )
+
+    def setUp(self):
+        author_cards.local.clear()
+        self.addCleanup(author_cards.local.clear)
+
+    def test_cards_loaded_once(self):
+        ids = [self.author.id, self.viewer.id]
+        with self.assertNumQueries(1):
+            cards = author_cards.get_cards(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(author_cards.get_cards(ids), cards)
+        self.assertEqual(
+            cards[self.author.id]['avatar'], '/media/users/images/avatar.png'
+        )
+
+    def test_profile_change_resets_card(self):
+        author_cards.get_cards([self.author.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Новое'
+            self.author.save()
+        card = author_cards.get_cards([self.author.id])[self.author.id]
+        self.assertEqual(card['first_name'], 'Новое')
+
+    def test_login_keeps_card(self):
+        author_cards.get_cards([self.author.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            author_cards.get_cards([self.author.id])
+
+    def test_is_subscribed_is_per_viewer(self):
+        path = f'/api/users/{self.author.id}/'
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        self.assertTrue(client.get(path).data['is_subscribed'])
+        client.force_authenticate(self.author)
+        data = client.get(path).data
+        self.assertFalse(data['is_subscribed'])
+        self.assertEqual(
+            data['avatar'], 'http://testserver/media/users/images/avatar.png'
+        )
+
+    @override_settings(AUTHOR_CARDS={'SHARED_CACHE': 'default'})
+    def test_shared_tier(self):
+        self.addCleanup(cache.clear)
+        first, second = AuthorCardCache(), AuthorCardCache()
+        first.get_cards([self.author.id])
+        with self.assertNumQueries(0):
+            cards = second.get_cards([self.author.id])
+        self.assertEqual(cards[self.author.id]['username'], 'author')
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from api.constants import BATCH_MAX_REQUESTS
+from api.models import Recipes
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def echo(request, item, *args):
+    return {'path': item['path']}
+
+
+class BatchViewTest(TestCase):
+    """POST /api/batch/: несколько под-запросов за один round-trip."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        cls.recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.user,
+            image='recipes/image.png',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *requests, status=200):
+        response = self.client.post(
+            '/api/batch/', {'requests': list(requests)}, format='json'
+        )
+        self.assertEqual(response.status_code, status)
+        return response.data.get('responses')
+
+    def test_read_after_write(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        responses = self.batch(
+            {'method': 'POST', 'path': f'{path}favorite/'},
+            {'path': path},
+        )
+        self.assertEqual(
+            [response['status'] for response in responses], [201, 200]
+        )
+        self.assertTrue(responses[1]['body']['is_favorited'])
+        self.assertIn('ETag', responses[1]['headers'])
+
+    def test_sub_requests_use_batch_user(self):
+        responses = self.batch({'path': '/api/users/me/'})
+        self.assertEqual(responses[0]['body']['id'], self.user.id)
+
+    def test_sub_request_errors(self):
+        responses = self.batch(
+            {'path': '/admin/'},
+            {'path': '/api/unknown/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {}},
+            {'path': '/api/recipes/0/'},
+        )
+        self.assertEqual(
+            [response['status'] for response in responses],
+            [400, 404, 400, 404],
+        )
+
+    def test_reads_in_parallel_keep_order(self):
+        paths = [f'/api/unknown{index}/' for index in range(5)]
+        with mock.patch('api.batch.run_item', side_effect=echo) as run_item:
+            responses = self.batch(*({'path': path} for path in paths))
+        self.assertEqual([response['path'] for response in responses], paths)
+        self.assertEqual(run_item.call_count, len(paths))
+
+    def test_limits(self):
+        self.batch(status=400)
+        self.batch(
+            *[{'path': '/api/tags/'}] * (BATCH_MAX_REQUESTS + 1), status=400
+        )
+        self.batch({'method': 'TRACE', 'path': '/api/tags/'}, status=400)
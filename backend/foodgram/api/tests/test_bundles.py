@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units, User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+
+class RecipeBundleTest(TestCase):
+    """export_recipes и import_recipes."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.path = tempfile.mkdtemp()
+        for directory in (media_root, self.path):
+            self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        flour = Ingredients.objects.create(
+            name='Мука', measurement_unit=Units.objects.create(name='г')
+        )
+        for name in ('Блины', 'Оладьи'):
+            recipe = Recipes.objects.create(
+                name=name, text='Текст', cooking_time=10, author=author,
+                image=default_storage.save(
+                    'recipes/images/image.png', ContentFile(b'png')
+                ),
+            )
+            recipe.tags.set([tag])
+            ListIngredients.objects.create(
+                recipe=recipe, ingredient=flour, amount=100
+            )
+
+    def call(self, name, *args):
+        call_command(name, self.path, *args, stdout=StringIO())
+
+    def test_round_trip(self):
+        self.call('export_recipes', '--chunk-size', '1')
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.path)
+                   if name.endswith('.gz')),
+            ['recipes-00001.ndjson.gz', 'recipes-00002.ndjson.gz'],
+        )
+        images = list(Recipes.objects.values_list('image', flat=True))
+        Recipes.objects.all().delete()
+        for model in (User, Tags, Ingredients, Units):
+            model.objects.all().delete()
+        for image in images:
+            default_storage.delete(image)
+        self.call('import_recipes', '--batch-size', '1')
+        self.assertEqual(
+            sorted(Recipes.objects.values_list('name', flat=True)),
+            ['Блины', 'Оладьи'],
+        )
+        recipe = Recipes.objects.get(name='Блины')
+        self.assertEqual(recipe.author.username, 'author')
+        self.assertFalse(recipe.author.has_usable_password())
+        self.assertEqual(
+            list(recipe.tags.values_list('slug', flat=True)), ['breakfast']
+        )
+        self.assertEqual(
+            list(recipe.recipeingredient.values_list(
+                'ingredient__name', 'amount'
+            )),
+            [('Мука', 100)],
+        )
+        for image in images:
+            self.assertTrue(default_storage.exists(image))
+
+    def test_checkpoints(self):
+        self.call('export_recipes')
+        self.call('export_recipes')
+        self.assertEqual(
+            len([name for name in os.listdir(self.path)
+                 if name.endswith('.gz')]),
+            1,
+        )
+        Recipes.objects.all().delete()
+        self.call('import_recipes')
+        self.call('import_recipes')
+        self.assertEqual(Recipes.objects.count(), 2)
+
+    def test_import_without_manifest(self):
+        with self.assertRaises(CommandError):
+            self.call('import_recipes')
@@ -0,0 +1,77 @@
+from api.models import ListFavorite, Recipes, Tags
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class ConditionalGetTest(TestCase):
+    """ETag и Last-Modified по версиям рецептов, ответ 304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.viewer = User.objects.create_user(
+            'viewer@example.com', 'viewer', 'Имя', 'Фамилия', 'password'
+        )
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.author,
+            image='recipes/image.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, path, **headers):
+        return self.client.get(path, **headers)
+
+    def assert_not_modified(self, path):
+        etag = self.get(path)['ETag']
+        response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_list(self):
+        self.assert_not_modified('/api/recipes/')
+
+    def test_retrieve(self):
+        self.assert_not_modified(f'/api/recipes/{self.recipe.id}/')
+
+    def test_last_modified_for_anonymous(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        last_modified = self.get(path)['Last-Modified']
+        response = self.get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.client.force_authenticate(self.viewer)
+        self.assertFalse(self.get(path).has_header('Last-Modified'))
+
+    def test_changes_produce_new_etag(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        for change in (self.recipe.save, self.author.save, self.tag.save):
+            etag = self.get(path)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_viewer_flags_in_etag(self):
+        self.client.force_authenticate(self.viewer)
+        etag = self.get('/api/recipes/')['ETag']
+        ListFavorite.objects.create(user=self.viewer, recipe=self.recipe)
+        response = self.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+    def test_etag_depends_on_query(self):
+        self.assertNotEqual(
+            self.get('/api/recipes/')['ETag'],
+            self.get('/api/recipes/?limit=1')['ETag'],
+        )
+
+    def test_missing_recipe(self):
+        self.assertEqual(self.get('/api/recipes/0/').status_code, 404)
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+
+from api.dedup import features, find_duplicates, minhash, similarity
+from api.models import (Ingredients, ListIngredients, Recipes, RecipeSignature,
+                        Tags, Units)
+from api.tests.test_recipe_updates import image_data
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class MinHashTest(TestCase):
+
+    def test_similarity_estimates_jaccard(self):
+        first = {f'i:{index}' for index in range(100)}
+        second = {f'i:{index}' for index in range(50, 150)}
+        estimate = similarity(minhash(first), minhash(second))
+        # Точный коэффициент Жаккара - 50 / 150.
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.15)
+        self.assertEqual(similarity(minhash(first), minhash(first)), 1)
+
+    def test_features_ignore_case_and_punctuation(self):
+        self.assertEqual(
+            features('Блины, с мёдом!', [1]), features('блины с мёдом', [1])
+        )
+
+
+class DuplicateDetectionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {index}', measurement_unit=unit
+            )
+            for index in range(6)
+        ]
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.recipe = self.create_recipe('Блины на молоке')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create_recipe(self, name, ingredients=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipes.objects.create(
+                name=name, text='Текст', cooking_time=10,
+                author=self.author, image='recipes/image.png',
+            )
+            for ingredient in ingredients or self.ingredients[:5]:
+                ListIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+        return recipe
+
+    def ids(self, ingredients=None):
+        return [
+            ingredient.id for ingredient in ingredients or self.ingredients[:5]
+        ]
+
+    def post(self, name):
+        return self.client.post('/api/recipes/', {
+            'name': name, 'text': 'Текст', 'cooking_time': 10,
+            'image': image_data('red'), 'tags': [self.tag.id],
+            'ingredients': [
+                {'id': pk, 'amount': 1} for pk in self.ids()
+            ],
+        }, format='json')
+
+    def test_signature_kept_in_sync(self):
+        self.assertTrue(
+            RecipeSignature.objects.filter(recipe=self.recipe).exists()
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertFalse(RecipeSignature.objects.exists())
+
+    def test_finds_near_duplicate(self):
+        found = find_duplicates('Блины на молоке!', self.ids())
+        self.assertEqual([row[0] for row in found], [self.recipe.id])
+        self.assertEqual(
+            find_duplicates('Салат', self.ids(self.ingredients[5:])), []
+        )
+        self.assertEqual(
+            find_duplicates(
+                'Блины на молоке', self.ids(), exclude_id=self.recipe.id
+            ),
+            [],
+        )
+
+    def test_hidden_recipes_are_skipped(self):
+        Recipes.objects.filter(pk=self.recipe.pk).update(is_hidden=True)
+        self.assertEqual(find_duplicates('Блины на молоке', self.ids()), [])
+
+    @override_settings(RECIPE_DEDUP={'MODE': 'warn', 'THRESHOLD': 0.8})
+    def test_warn_mode(self):
+        response = self.post('Блины на молоке')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data['possible_duplicates'], [self.recipe.id]
+        )
+
+    @override_settings(RECIPE_DEDUP={'MODE': 'block', 'THRESHOLD': 0.8})
+    def test_block_mode(self):
+        response = self.post('Блины на молоке')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['possible_duplicates'], [str(self.recipe.id)]
+        )
+        self.assertEqual(Recipes.objects.count(), 1)
+
+    @override_settings(RECIPE_DEDUP={'MODE': 'off', 'THRESHOLD': 0.8})
+    def test_off_mode(self):
+        response = self.post('Блины на молоке')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('possible_duplicates', response.data)
@@ -0,0 +1,179 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from api.constants import DELETION_LEASE_SECONDS, DELETION_MAX_ATTEMPTS
+from api.deletion import claim, pending_jobs, run_deletion, schedule_deletion
+from api.models import (DeletionJob, Ingredients, ListFavorite,
+                        ListIngredients, Recipes, Units)
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import ListSubscriptions, User
+
+
+class UserDeletionTest(TestCase):
+    """DELETE /api/users/{id}/ ставит удаление в очередь, а не каскадит."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        ingredient = Ingredients.objects.create(
+            name='Соль', measurement_unit=unit
+        )
+        for index in range(3):
+            recipe = Recipes.objects.create(
+                name=f'Рецепт {index}', text='Текст', cooking_time=10,
+                author=cls.user, image='recipes/image.png',
+            )
+            ListIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def delete(self, password):
+        return self.client.delete(
+            f'/api/users/{self.user.id}/', {'current_password': password},
+            format='json',
+        )
+
+    def test_schedules_job(self):
+        response = self.delete('password')
+        self.assertEqual(response.status_code, 204)
+        job = DeletionJob.objects.get()
+        self.assertEqual(
+            (job.kind, job.object_id, job.status),
+            (DeletionJob.USER, self.user.id, 'queued'),
+        )
+        user = User.all_objects.get(id=self.user.id)
+        self.assertTrue(user.is_hidden)
+        self.assertFalse(user.is_active)
+        # Зависимые строки удалит run_deletions, пока они только скрыты.
+        self.assertEqual(Recipes.all_objects.filter(
+            author=self.user, is_hidden=True
+        ).count(), 3)
+        self.assertEqual(ListIngredients.objects.count(), 3)
+        self.assertFalse(Recipes.objects.exists())
+
+    def test_wrong_password(self):
+        self.assertEqual(self.delete('wrong').status_code, 400)
+        self.assertFalse(DeletionJob.objects.exists())
+        self.assertTrue(User.objects.filter(id=self.user.id).exists())
+
+
+class RunDeletionTest(TestCase):
+    """Пачечное удаление по DeletionJob: шаги, повторы и захват задачи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.reader = User.objects.create_user(
+            'reader@example.com', 'reader', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {index}', measurement_unit=unit
+            )
+            for index in range(2)
+        ]
+        for index in range(2):
+            recipe = Recipes.objects.create(
+                name=f'Рецепт {index}', text='Текст', cooking_time=10,
+                author=cls.author, image='recipes/image.png',
+            )
+            for ingredient in ingredients:
+                ListIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+            ListFavorite.objects.create(user=cls.reader, recipe=recipe)
+        ListSubscriptions.objects.create(
+            author=cls.reader, subscription_on=cls.author
+        )
+
+    def schedule(self, instance):
+        job = schedule_deletion(instance)
+        self.assertTrue(claim(job))
+        return job
+
+    def test_user_with_recipes(self):
+        job = self.schedule(self.author)
+        self.assertTrue(run_deletion(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(User.all_objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipes.all_objects.exists())
+        self.assertFalse(ListIngredients.objects.exists())
+        self.assertFalse(ListFavorite.objects.exists())
+        self.assertFalse(ListSubscriptions.objects.exists())
+        self.assertTrue(User.objects.filter(pk=self.reader.pk).exists())
+
+    def test_recipe_through_api(self):
+        recipe = Recipes.objects.first()
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Recipes.objects.filter(pk=recipe.pk).exists())
+        call_command('run_deletions', stdout=StringIO())
+        self.assertFalse(Recipes.all_objects.filter(pk=recipe.pk).exists())
+        self.assertEqual(ListIngredients.objects.count(), 2)
+
+    def test_resumes_from_saved_step(self):
+        job = self.schedule(self.author)
+        self.assertFalse(run_deletion(job, batch_size=1, max_batches=3))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.deleted), ('queued', 2))
+        self.assertEqual(ListFavorite.objects.count(), 0)
+        self.assertTrue(claim(job))
+        self.assertTrue(run_deletion(job, batch_size=1))
+        self.assertFalse(User.all_objects.filter(pk=self.author.pk).exists())
+
+    def test_failure_is_retried_later(self):
+        job = self.schedule(self.author)
+        with mock.patch(
+            'api.deletion.delete_batch', side_effect=RuntimeError('сбой')
+        ), self.assertRaises(RuntimeError):
+            run_deletion(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertGreater(job.retry_at, timezone.now())
+        self.assertFalse(claim(job))
+        DeletionJob.objects.filter(pk=job.pk).update(
+            retry_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertTrue(claim(job))
+        self.assertTrue(run_deletion(job))
+
+    def test_attempts_are_limited(self):
+        job = schedule_deletion(self.author)
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status='failed', attempts=DELETION_MAX_ATTEMPTS,
+            retry_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertFalse(pending_jobs().exists())
+        self.assertFalse(claim(job))
+
+    def test_claim_once(self):
+        job = schedule_deletion(self.author)
+        other = DeletionJob.objects.get(pk=job.pk)
+        self.assertTrue(claim(job))
+        self.assertFalse(claim(other))
+        # Задачу упавшего воркера можно взять после истечения аренды.
+        DeletionJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(
+                seconds=DELETION_LEASE_SECONDS + 1
+            )
+        )
+        self.assertTrue(claim(other))
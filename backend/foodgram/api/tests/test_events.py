@@ -0,0 +1,142 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from api.events import (RESYNC, EventConnection, authenticate, format_event,
+                        hub, redeem_ticket, sse_application)
+from api.models import EventTicket, ListFavorite, Recipes
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class EventTicketTest(TestCase):
+    """Одноразовые билеты для EventSource."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+
+    def issue(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/events/ticket/')
+        self.assertEqual(response.status_code, 201)
+        return response.data['ticket']
+
+    def test_anonymous_cannot_get_ticket(self):
+        response = APIClient().post('/api/events/ticket/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_ticket_is_single_use(self):
+        ticket = self.issue()
+        self.assertEqual(redeem_ticket(ticket), self.user)
+        with self.assertRaises(AuthenticationFailed):
+            redeem_ticket(ticket)
+
+    def test_expired_ticket(self):
+        ticket = self.issue()
+        EventTicket.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        with self.assertRaises(AuthenticationFailed):
+            redeem_ticket(ticket)
+        # Просроченные билеты удаляются при выдаче следующего.
+        self.issue()
+        self.assertEqual(EventTicket.objects.count(), 1)
+
+    def test_inactive_user(self):
+        ticket = self.issue()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            redeem_ticket(ticket)
+
+    def test_authenticate_scope(self):
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(authenticate({
+            'headers': [(b'authorization', f'Token {token.key}'.encode())],
+        }), self.user)
+        self.assertEqual(authenticate({
+            'query_string': f'ticket={self.issue()}'.encode(),
+        }), self.user)
+        with self.assertRaises(AuthenticationFailed):
+            authenticate({'query_string': b''})
+
+
+class EventDeliveryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        cls.recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.user,
+            image='recipes/image.png',
+        )
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def drain(self, connection):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not connection.queue.empty():
+            events.append(connection.queue.get_nowait())
+        return events
+
+    def test_list_changes_reach_user_connections(self):
+        connection = hub.connect(self.user.pk, self.loop)
+        self.addCleanup(hub.disconnect, connection)
+        with self.captureOnCommitCallbacks(execute=True):
+            favorite = ListFavorite.objects.create(
+                user=self.user, recipe=self.recipe
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            favorite.delete()
+        self.assertEqual(self.drain(connection), [
+            {
+                'type': 'favorite', 'object_id': self.recipe.id,
+                'action': action,
+            }
+            for action in ('added', 'removed')
+        ])
+
+    def test_overflow_becomes_resync(self):
+        connection = EventConnection(self.user.pk, self.loop, size=2)
+        for index in range(3):
+            connection.push({'type': 'favorite', 'object_id': index})
+        self.assertEqual(self.drain(connection), [RESYNC])
+
+    def test_disconnect(self):
+        connection = hub.connect(self.user.pk, self.loop)
+        hub.disconnect(connection)
+        self.assertNotIn(self.user.pk, hub.connections)
+
+    def test_format(self):
+        self.assertEqual(
+            format_event({'type': 'resync'}),
+            b'event: resync\ndata: {"type": "resync"}\n\n',
+        )
+
+
+class SseApplicationTest(TestCase):
+
+    def test_without_credentials(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(sse_application(
+            {'type': 'http', 'headers': [], 'query_string': b''},
+            None, send,
+        ))
+        self.assertEqual(messages[0]['status'], 401)
+        self.assertIn('detail', json.loads(messages[1]['body']))
@@ -0,0 +1,102 @@
+from api.facets import data_versions
+from api.models import ListFavorite, Recipes, Tags
+from api.tag_masks import sync_tags_mask
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import User
+
+
+class FacetsTest(TestCase):
+    """Фасеты рецептов, их кеш и ключ кеша."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            'viewer@example.com', 'viewer', 'Имя', 'Фамилия', 'password'
+        )
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.breakfast = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.dinner = Tags.objects.create(name='Ужин', slug='dinner')
+        for index, cooking_time in enumerate((10, 20, 90)):
+            cls.add_recipe(index, cooking_time, [cls.breakfast])
+
+    @classmethod
+    def add_recipe(cls, index, cooking_time, tags):
+        recipe = Recipes.objects.create(
+            name=f'Рецепт {index}', text='Текст', cooking_time=cooking_time,
+            author=cls.author, image='recipes/image.png',
+        )
+        recipe.tags.set(tags)
+        sync_tags_mask(recipe)
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def facets(self, query=''):
+        response = self.client.get(f'/api/recipes/?facets=true{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['facets']
+
+    def counts(self, facets, name, field):
+        return {item[field]: item['count'] for item in facets[name]}
+
+    def test_counts(self):
+        facets = self.facets()
+        self.assertEqual(
+            self.counts(facets, 'tags', 'slug'),
+            {'breakfast': 3, 'dinner': 0},
+        )
+        self.assertEqual(
+            self.counts(facets, 'cooking_time', 'bucket'),
+            {'0-15': 1, '15-30': 1, '30-60': 0, '60+': 1},
+        )
+        self.assertEqual(
+            self.counts(facets, 'authors', 'username'), {'author': 3}
+        )
+
+    def test_flag_parsing(self):
+        self.assertNotIn('facets', self.client.get(
+            '/api/recipes/?facets=0'
+        ).data)
+
+    def test_new_recipe_invalidates(self):
+        self.facets()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_recipe(3, 40, [self.dinner])
+        facets = self.facets()
+        self.assertEqual(self.counts(facets, 'tags', 'slug')['dinner'], 1)
+        self.assertEqual(
+            self.counts(facets, 'cooking_time', 'bucket')['30-60'], 1
+        )
+
+    def test_favorites_invalidate_and_are_per_viewer(self):
+        self.assertEqual(
+            self.facets('&is_favorited=true')['authors'], []
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ListFavorite.objects.create(
+                user=self.viewer, recipe=Recipes.objects.first()
+            )
+        self.assertEqual(self.counts(
+            self.facets('&is_favorited=true'), 'authors', 'username'
+        ), {'author': 1})
+        self.client.force_authenticate(self.author)
+        self.assertEqual(
+            self.facets('&is_favorited=true')['authors'], []
+        )
+
+    def test_key_cost_does_not_grow(self):
+        """Ключ кеша - два запроса при любом размере списков зрителя."""
+        for recipe in Recipes.objects.all():
+            ListFavorite.objects.create(user=self.viewer, recipe=recipe)
+        request = APIRequestFactory().get('/', {'is_favorited': 'true'})
+        request.user = self.viewer
+        request.query_params = request.GET
+        with self.assertNumQueries(2):
+            data_versions(request)
@@ -0,0 +1,115 @@
+import json
+from collections import OrderedDict
+from datetime import timedelta
+
+from api.models import (Ingredients, ListFavorite, ListIngredients, Recipes,
+                        ShoppingCartIngredients, Tags, Units)
+from api.serializers import RecipesSerializerGet
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import ListSubscriptions, User
+
+
+class RecipesFastSerializerTest(TestCase):
+    """Быстрый сериализатор отдаёт то же, что RecipesSerializerGet."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            'viewer@example.com', 'viewer', 'Имя', 'Фамилия', 'password'
+        )
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password',
+            avatar='users/avatar.png',
+        )
+        unit = Units.objects.create(name='г')
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {index}', measurement_unit=unit
+            )
+            for index in range(3)
+        ]
+        tags = [
+            Tags.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        for index, author in enumerate((cls.author, cls.viewer, cls.author)):
+            recipe = Recipes.objects.create(
+                name=f'Рецепт {index}', text='Текст', cooking_time=10,
+                author=author, image=f'recipes/image{index}.png',
+            )
+            # Разные даты: порядок списка (-pub_date) не зависит от базы.
+            Recipes.objects.filter(pk=recipe.pk).update(
+                pub_date=timezone.now() - timedelta(minutes=index)
+            )
+            recipe.tags.set(tags[index:])
+            for amount, ingredient in enumerate(ingredients[index:], 1):
+                ListIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+        first, second, _ = Recipes.objects.order_by('id')
+        ListFavorite.objects.create(user=cls.viewer, recipe=first)
+        ShoppingCartIngredients.objects.create(user=cls.viewer, recipe=second)
+        ListSubscriptions.objects.create(
+            author=cls.viewer, subscription_on=cls.author
+        )
+
+    def get(self, user, path):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def expected(self, user, recipes, many=True):
+        """Ответ RecipesSerializerGet, отрисованный JSONRenderer DRF."""
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user or AnonymousUser()
+        data = RecipesSerializerGet(
+            recipes, many=many, context={'request': request}
+        ).data
+        if many:
+            data = OrderedDict([
+                ('count', len(data)), ('next', None), ('previous', None),
+                ('results', data),
+            ])
+        return JSONRenderer().render(data)
+
+    def test_list(self):
+        for user in (None, self.viewer):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.get(user, '/api/recipes/'),
+                    self.expected(user, Recipes.objects.all()),
+                )
+
+    def test_retrieve(self):
+        for user in (None, self.viewer):
+            for recipe in Recipes.objects.all():
+                with self.subTest(user=user, recipe=recipe.id):
+                    self.assertEqual(
+                        self.get(user, f'/api/recipes/{recipe.id}/'),
+                        self.expected(user, recipe, many=False),
+                    )
+
+    def test_viewer_fields(self):
+        """Флаги зрителя и ссылки на изображения действительно заполнены."""
+        results = json.loads(
+            self.get(self.viewer, '/api/recipes/')
+        )['results']
+        self.assertEqual(
+            sum(recipe['is_favorited'] for recipe in results), 1
+        )
+        self.assertEqual(
+            sum(recipe['is_in_shopping_cart'] for recipe in results), 1
+        )
+        self.assertTrue(any(
+            recipe['author']['is_subscribed'] for recipe in results
+        ))
+        for recipe in results:
+            self.assertTrue(recipe['image'].startswith('http://testserver/'))
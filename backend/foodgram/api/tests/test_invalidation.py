@@ -0,0 +1,79 @@
+from api.invalidation import (RECIPE, TAG, DirtyKey, InvalidationBus,
+                              LocalTransport, PostgresTransport, bus)
+from api.models import Tags
+from django.test import TestCase
+
+
+class InvalidationBusTest(TestCase):
+
+    def setUp(self):
+        self.bus = InvalidationBus()
+        self.bus._transport = LocalTransport(self.bus)
+        self.received = []
+
+    def subscribe(self, kinds=None, broadcast=False):
+        return self.bus.subscribe(self.received.append, kinds, broadcast)
+
+    def test_published_after_commit(self):
+        self.subscribe()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.bus.publish(DirtyKey(RECIPE, 1))
+            self.assertEqual(self.received, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.received, [frozenset({DirtyKey(RECIPE, 1)})])
+
+    def test_batch_sends_keys_once(self):
+        self.subscribe()
+        with self.bus.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.bus.publish(DirtyKey(RECIPE, 1))
+                self.bus.publish(DirtyKey(RECIPE, 1), DirtyKey(TAG, 2))
+            self.assertEqual(self.received, [])
+        self.assertEqual(self.received, [
+            frozenset({DirtyKey(RECIPE, 1), DirtyKey(TAG, 2)}),
+        ])
+
+    def test_kinds_filter(self):
+        self.subscribe(kinds=(TAG,))
+        self.bus.dispatch(frozenset({DirtyKey(RECIPE, 1)}))
+        self.bus.dispatch(frozenset({DirtyKey(RECIPE, 1), DirtyKey(TAG, 2)}))
+        self.assertEqual(self.received, [frozenset({DirtyKey(TAG, 2)})])
+
+    def test_remote_events_reach_broadcast_subscribers_only(self):
+        local, remote = [], []
+        self.bus.subscribe(local.append)
+        self.bus.subscribe(remote.append, broadcast=True)
+        transport = PostgresTransport(self.bus)
+        transport.deliver({'origin': transport.origin, 'keys': [[RECIPE, 1]]})
+        transport.deliver({'origin': 'other', 'keys': [[RECIPE, 2]]})
+        self.assertEqual(local, [])
+        self.assertEqual(remote, [frozenset({DirtyKey(RECIPE, 2)})])
+        self.assertEqual(transport.version(RECIPE, 1), 0)
+        self.assertGreater(transport.version(RECIPE, 2), 0)
+
+
+class LocalTransportTest(TestCase):
+
+    def test_versions_grow_after_eviction(self):
+        transport = LocalTransport(InvalidationBus(), max_versions=2)
+        transport.bump([DirtyKey(RECIPE, 1)])
+        before = transport.version(RECIPE, 1)
+        transport.bump([DirtyKey(TAG, 1)])
+        self.assertEqual(len(transport.versions), 2)
+        # Вытесненный ключ не возвращается к нулю.
+        self.assertGreaterEqual(transport.version(RECIPE, 1), before)
+        transport.bump([DirtyKey(RECIPE, 1)])
+        self.assertGreater(transport.version(RECIPE, 1), before)
+        self.assertEqual(transport.version(RECIPE), transport.sequence)
+
+
+class SignalsTest(TestCase):
+
+    def test_model_change_published(self):
+        received = []
+        bus.subscribe(received.append, kinds=(TAG,))
+        self.addCleanup(bus.subscribers.pop)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tags.objects.create(name='Тег', slug='tag')
+        self.assertIn(DirtyKey(TAG, tag.pk), set().union(*received))
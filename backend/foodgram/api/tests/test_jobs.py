@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from api.jobs import DONE, FAILED, LocalJobQueue, job_queue
+from api.models import (BackgroundJob, Ingredients, ListIngredients, Recipes,
+                        ShoppingCartIngredients, Units)
+from api.shopping_list import (SHOPPING_LIST_JOB, build_printable,
+                               remove_stale_printables)
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class ShoppingListJobTest(TestCase):
+    """Печатный список покупок собирается в фоновой задаче."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit=unit
+        )
+        cls.recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.user,
+            image='recipes/image.png',
+        )
+        ListIngredients.objects.create(
+            recipe=cls.recipe, ingredient=ingredient, amount=200
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self):
+        return self.client.post('/api/recipes/download_shopping_cart/jobs/')
+
+    def test_empty_cart_is_rejected(self):
+        with mock.patch.object(job_queue, 'submit') as submit:
+            self.assertEqual(self.post().status_code, 400)
+        submit.assert_not_called()
+
+    def test_request_only_enqueues_the_job(self):
+        ShoppingCartIngredients.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        job = {'id': 'a1', 'status': 'queued', 'result': None, 'error': None}
+        patched = mock.patch.object(job_queue, 'submit', return_value=job)
+        with patched as submit:
+            with self.assertNumQueries(1):
+                response = self.post()
+        self.assertEqual(response.status_code, 202)
+        submit.assert_called_once_with(
+            SHOPPING_LIST_JOB, self.user.id, build_printable, self.user.id
+        )
+
+    def test_build_printable_renders_once(self):
+        ShoppingCartIngredients.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        url = build_printable(self.user.id)
+        name = url.replace(default_storage.base_url, '', 1)
+        with open(default_storage.path(name), encoding='utf-8') as file:
+            self.assertIn('Мука', file.read())
+        self.assertEqual(build_printable(self.user.id), url)
+        self.assertEqual(len(default_storage.listdir('shopping_lists')[1]), 1)
+
+    def test_build_printable_fails_on_empty_cart(self):
+        with self.assertRaises(ValueError):
+            build_printable(self.user.id)
+
+    def test_job_status_is_saved(self):
+        queue = LocalJobQueue()
+        job = queue.create('test', self.user.id)
+        queue.run(job, lambda: '/media/result')
+        self.assertEqual(queue.get(job['id'])['status'], DONE)
+        job = queue.create('test', self.user.id)
+        queue.run(job, mock.Mock(side_effect=ValueError('ошибка')))
+        self.assertEqual(
+            (queue.get(job['id'])['status'], queue.get(job['id'])['error']),
+            (FAILED, 'ошибка'),
+        )
+
+
+class RemoveStalePrintablesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def printable(self, name, age):
+        name = default_storage.save(
+            f'shopping_lists/{name}.html', ContentFile(b'list')
+        )
+        stamp = time.time() - age
+        os.utime(default_storage.path(name), (stamp, stamp))
+        return name
+
+    def job(self, name, expires_in):
+        BackgroundJob.objects.create(
+            id=name, kind=SHOPPING_LIST_JOB, owner=self.user, status=DONE,
+            result=default_storage.url(f'shopping_lists/{name}.html'),
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_removes_only_old_unreferenced_files(self):
+        self.printable('fresh', age=10)
+        self.printable('orphan', age=7200)
+        self.printable('referenced', age=7200)
+        self.printable('expired', age=7200)
+        self.job('referenced', expires_in=60)
+        self.job('expired', expires_in=-60)
+
+        removed = remove_stale_printables(max_age=3600)
+
+        self.assertEqual(sorted(removed), [
+            'shopping_lists/expired.html', 'shopping_lists/orphan.html',
+        ])
+        self.assertEqual(
+            sorted(default_storage.listdir('shopping_lists')[1]),
+            ['fresh.html', 'referenced.html'],
+        )
+
+    def test_missing_directory(self):
+        self.assertEqual(remove_stale_printables(), [])
@@ -0,0 +1,158 @@
+from api.models import (Ingredients, ListIngredients, Recipes,
+                        ShoppingCartIngredients, Units)
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class ServingsTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        cls.flour, cls.milk = (
+            Ingredients.objects.create(name=name, measurement_unit=unit)
+            for name in ('Мука', 'Молоко')
+        )
+        cls.pancakes = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.user,
+            image='recipes/image.png',
+        )
+        cls.bread = Recipes.objects.create(
+            name='Хлеб', text='Текст', cooking_time=60, author=cls.user,
+            image='recipes/image.png',
+        )
+        for recipe, ingredient, amount in (
+            (cls.pancakes, cls.flour, 100),
+            (cls.pancakes, cls.milk, 200),
+            (cls.bread, cls.flour, 500),
+        ):
+            ListIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class ShoppingCartServingsTest(ServingsTestMixin, TestCase):
+
+    def cart(self, method, recipe, **data):
+        return getattr(self.client, method)(
+            f'/api/recipes/{recipe.id}/shopping_cart/', data, format='json'
+        )
+
+    def test_download_scales_by_servings(self):
+        self.assertEqual(
+            self.cart('post', self.pancakes, servings=3).status_code, 201
+        )
+        self.cart('post', self.bread)
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(
+            response.content.decode().splitlines(),
+            ['Молоко - 600 г', 'Мука - 800 г'],
+        )
+
+    def test_change_servings(self):
+        self.cart('post', self.pancakes)
+        response = self.cart('patch', self.pancakes, servings=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            ShoppingCartIngredients.objects.get(user=self.user).servings, 4
+        )
+
+    def test_invalid_servings(self):
+        self.assertEqual(
+            self.cart('post', self.pancakes, servings=0).status_code, 400
+        )
+        self.cart('post', self.pancakes)
+        self.assertEqual(
+            self.cart('patch', self.pancakes, servings=0).status_code, 400
+        )
+        self.assertEqual(
+            self.cart('patch', self.bread, servings=2).status_code, 404
+        )
+
+
+class MealPlanTest(ServingsTestMixin, TestCase):
+
+    def create_plan(self, entries):
+        response = self.client.post('/api/meal-plans/', {
+            'name': 'Неделя', 'week_start': '2026-10-19',
+            'entries': entries,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def shopping_list(self, plan):
+        response = self.client.get(
+            f'/api/meal-plans/{plan["id"]}/shopping_list/'
+        )
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['name']: item['amount'] for item in response.data['items']
+        }
+
+    def test_totals_over_days(self):
+        plan = self.create_plan([
+            {'recipe': self.pancakes.id, 'day': 0, 'servings': 2},
+            {'recipe': self.pancakes.id, 'day': 3, 'servings': 1},
+            {'recipe': self.bread.id, 'day': 5, 'servings': 1},
+        ])
+        self.assertEqual(
+            self.shopping_list(plan), {'Мука': 800, 'Молоко': 600}
+        )
+
+    def test_plan_and_recipe_changes_refresh_list(self):
+        plan = self.create_plan([
+            {'recipe': self.pancakes.id, 'day': 0, 'servings': 1},
+        ])
+        self.assertEqual(self.shopping_list(plan)['Мука'], 100)
+        response = self.client.patch(f'/api/meal-plans/{plan["id"]}/', {
+            'entries': [
+                {'recipe': self.pancakes.id, 'day': 0, 'servings': 2},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopping_list(plan)['Мука'], 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            ListIngredients.objects.filter(
+                recipe=self.pancakes, ingredient=self.flour
+            ).update(amount=150)
+            self.pancakes.save()
+        self.assertEqual(self.shopping_list(plan)['Мука'], 300)
+
+    def test_hidden_recipes_are_left_out(self):
+        plan = self.create_plan([
+            {'recipe': self.pancakes.id, 'day': 0, 'servings': 1},
+            {'recipe': self.bread.id, 'day': 1, 'servings': 1},
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipes.objects.filter(pk=self.bread.pk).update(is_hidden=True)
+            self.pancakes.save()
+        self.assertEqual(
+            self.shopping_list(plan), {'Мука': 100, 'Молоко': 200}
+        )
+
+    def test_validation_and_ownership(self):
+        response = self.client.post('/api/meal-plans/', {
+            'name': 'Неделя', 'week_start': '2026-10-19',
+            'entries': [{'recipe': self.pancakes.id, 'day': 7}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        plan = self.create_plan([{'recipe': self.pancakes.id, 'day': 0}])
+        other = User.objects.create_user(
+            'other@example.com', 'other', 'Имя', 'Фамилия', 'password'
+        )
+        self.client.force_authenticate(other)
+        response = self.client.get(
+            f'/api/meal-plans/{plan["id"]}/shopping_list/'
+        )
+        self.assertEqual(response.status_code, 404)
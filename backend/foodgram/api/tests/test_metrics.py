@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from api.metrics import (CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram,
+                         collector, render_metrics)
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+
+class MetricTypesTest(TestCase):
+
+    def test_counter_sums_thread_shards(self):
+        requests = Counter('requests_total', 'Запросы')
+        requests.inc(method='GET')
+
+        def work():
+            for _ in range(3):
+                requests.inc(method='GET')
+            requests.inc(2, method='POST')
+
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Шарды завершившихся потоков остаются в сумме.
+        self.assertEqual(requests.get(method='GET'), 7)
+        self.assertEqual(requests.get(method='POST'), 4)
+        self.assertEqual(requests.get(method='PUT'), 0)
+        requests.reset()
+        self.assertEqual(requests.get(method='GET'), 0)
+
+    def test_gauge(self):
+        queue = Gauge('queue_length', 'Очередь')
+        queue.set(5)
+        queue.inc()
+        queue.dec(3)
+        self.assertEqual(queue.get(), 3)
+
+    def test_histogram_buckets(self):
+        latency = Histogram('latency_seconds', 'Время', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            latency.observe(value, view='recipes')
+        self.assertEqual(
+            latency.collect(), {(('view', 'recipes'),): [2, 1, 1, 2.65]}
+        )
+
+
+class RenderMetricsTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(REGISTRY, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def register(self, metric):
+        REGISTRY[metric.name] = metric
+        return metric
+
+    def test_text_format(self):
+        self.register(Counter('requests_total', 'Запросы\nк API')).inc(
+            path='/api/"recipes"/'
+        )
+        latency = self.register(
+            Histogram('latency_seconds', 'Время', buckets=(0.1,))
+        )
+        latency.observe(0.05)
+        latency.observe(0.5)
+        self.assertEqual(render_metrics().splitlines(), [
+            '# HELP latency_seconds Время',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="+Inf"} 2',
+            'latency_seconds_sum 0.55',
+            'latency_seconds_count 2',
+            r'# HELP requests_total Запросы\nк API',
+            '# TYPE requests_total counter',
+            r'requests_total{path="/api/\"recipes\"/"} 1',
+        ])
+
+    def test_endpoint(self):
+        self.register(Gauge('queue_length', 'Очередь')).set(2)
+        response = APIClient().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        self.assertIn(b'queue_length 2\n', response.content)
+
+    def test_snapshots_of_other_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.register(Counter('requests_total', 'Запросы')).inc()
+        self.register(Gauge('queue_length', 'Очередь')).set(1)
+        snapshot = {
+            'requests_total': [[[], 2]],
+            'queue_length': [[[], 4]],
+            'unknown_total': [[[], 1]],
+        }
+        # Снимок живого процесса и снимок завершившегося воркера.
+        for name in (f'{os.getppid()}-1.json', f'{2 ** 30}-1.json'):
+            with open(os.path.join(directory, name), 'w') as file:
+                json.dump(snapshot, file)
+        with open(os.path.join(directory, '1-broken.json'), 'w') as file:
+            file.write('{')
+        with override_settings(METRICS={'MULTIPROCESS_DIR': directory}):
+            values = collector.collect()
+        self.assertEqual(values['requests_total'], {(): 5})
+        self.assertEqual(values['queue_length'], {(): 5})
+        self.assertNotIn('unknown_total', values)
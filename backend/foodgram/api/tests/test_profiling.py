@@ -0,0 +1,107 @@
+import time
+
+from api.models import Recipes, Tags
+from api.profiling import StackSampler, collect_timings, profiled, timed
+from api.serializers import ShortRecipeSerializer
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class ProfilingMixinTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            'staff@example.com', 'staff', 'Имя', 'Фамилия', 'password',
+            is_staff=True,
+        )
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.user,
+            image='recipes/image.png',
+        )
+        recipe.tags.set([tag])
+
+    def get(self, user, query):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_staff_gets_report(self):
+        report = self.get(self.staff, 'profile=1&tags=breakfast')
+        self.assertEqual(report['profiler'], 'cProfile')
+        self.assertEqual(report['status_code'], 200)
+        self.assertGreater(report['sql']['count'], 0)
+        self.assertIn('cumulative', report['profile'])
+        self.assertIn(
+            'RecipeFilter.tags',
+            [timing['name'] for timing in report['timings']],
+        )
+
+    def test_other_users_get_the_response(self):
+        data = self.get(self.user, 'profile=1')
+        self.assertNotIn('profile', data)
+        self.assertEqual(data['count'], 1)
+
+
+class TimingsTest(TestCase):
+
+    def test_disabled_outside_collect(self):
+        calls = []
+        function = profiled('work')(lambda: calls.append(1))
+        with timed('block'):
+            function()
+        self.assertEqual(calls, [1])
+
+    def test_collect(self):
+        function = profiled('work')(lambda: time.sleep(0.001))
+        with collect_timings() as timings:
+            function()
+            function()
+            with timed('block'):
+                pass
+        report = {item['name']: item for item in timings.report()}
+        self.assertEqual(report['work']['calls'], 2)
+        self.assertEqual(report['block']['calls'], 1)
+        self.assertEqual(timings.report()[0]['name'], 'work')
+
+    def test_serializer_fields_are_timed_without_changing_output(self):
+        author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=author,
+            image='recipes/image.png',
+        )
+        expected = ShortRecipeSerializer(recipe).data
+        with collect_timings() as timings:
+            self.assertEqual(ShortRecipeSerializer(recipe).data, expected)
+        self.assertEqual(
+            {item['name'] for item in timings.report()},
+            {
+                f'ShortRecipeSerializer.{name}'
+                for name in ('id', 'name', 'image', 'cooking_time')
+            },
+        )
+
+
+class StackSamplerTest(TestCase):
+
+    def test_collapsed_stacks(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        sampler.stop()
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        _, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn('test_collapsed_stacks', sampler.collapsed())
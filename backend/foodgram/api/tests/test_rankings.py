@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from api.models import ChangeLog, ListFavorite, Recipes
+from api.rankings import update_recipe_rankings
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+from users.models import User
+
+
+class RecipeRankingsTest(TestCase):
+    """Популярность и тренды по журналу избранного и списков покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.old_fan, cls.new_fan = (
+            User.objects.create_user(
+                f'{name}@example.com', name, 'Имя', 'Фамилия', 'password'
+            )
+            for name in ('old', 'new')
+        )
+        cls.recipe, cls.other = (
+            Recipes.objects.create(
+                name=name, text='Текст', cooking_time=10, author=cls.author,
+                image='recipes/image.png',
+            )
+            for name in ('Рецепт', 'Другой рецепт')
+        )
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def change(self, action, user, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            if action == 'add':
+                ListFavorite.objects.create(user=user, recipe=recipe)
+            else:
+                ListFavorite.objects.filter(user=user, recipe=recipe).delete()
+        # Записи моложе SYNC_SETTLE_SECONDS пересчёт ещё не видит.
+        ChangeLog.objects.update(created_at=F('created_at') - timedelta(
+            minutes=1
+        ))
+
+    def run_rankings(self, days=0):
+        update_recipe_rankings(now=self.now + timedelta(days=days))
+        return {
+            recipe.id: recipe
+            for recipe in Recipes.all_objects.all()
+        }
+
+    def test_popularity_counts_current_rows(self):
+        self.run_rankings()
+        for _ in range(3):
+            self.change('add', self.old_fan, self.recipe)
+            self.change('remove', self.old_fan, self.recipe)
+        self.change('add', self.new_fan, self.recipe)
+        recipes = self.run_rankings(1)
+        self.assertEqual(recipes[self.recipe.id].popularity, 1)
+
+    def test_removing_old_interaction_keeps_recent_trend(self):
+        self.run_rankings()
+        self.change('add', self.old_fan, self.recipe)
+        self.run_rankings()
+        self.change('add', self.new_fan, self.recipe)
+        self.change('add', self.new_fan, self.other)
+        before = self.run_rankings(30)
+        self.change('remove', self.old_fan, self.recipe)
+        recipes = self.run_rankings(30)
+        recipe, other = recipes[self.recipe.id], recipes[self.other.id]
+        self.assertEqual((recipe.popularity, other.popularity), (1, 1))
+        self.assertEqual(
+            recipe.trending_score, before[self.recipe.id].trending_score
+        )
+        self.assertGreaterEqual(recipe.trending_score, other.trending_score)
+        self.assertGreater(other.trending_score, 0)
+
+    def test_full_recount(self):
+        self.change('add', self.old_fan, self.recipe)
+        # Было 5 и 5, стало 1 и 0.
+        Recipes.all_objects.update(popularity=5)
+        self.assertEqual(update_recipe_rankings(now=self.now, full=True), 9)
+        self.assertEqual(
+            Recipes.all_objects.get(id=self.recipe.id).popularity, 1
+        )
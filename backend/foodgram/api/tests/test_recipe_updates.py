@@ -0,0 +1,107 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from api.fields import ContentHashImageField
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def image_data(color):
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), color).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class RecipeUpdateTest(TestCase):
+    """Обновление рецепта не разбирает ту же картинку и пишет разницу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        unit = Units.objects.create(name='г')
+        cls.flour, cls.milk, cls.eggs = (
+            Ingredients.objects.create(name=name, measurement_unit=unit)
+            for name in ('Мука', 'Молоко', 'Яйца')
+        )
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        response = self.client.post('/api/recipes/', {
+            'name': 'Блины', 'text': 'Текст', 'cooking_time': 10,
+            'image': image_data('red'), 'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.flour.id, 'amount': 200},
+                {'id': self.milk.id, 'amount': 300},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.recipe = Recipes.objects.get(pk=response.data['id'])
+
+    def patch(self, data):
+        return self.client.patch(
+            f'/api/recipes/{self.recipe.id}/', data, format='json'
+        )
+
+    def test_same_image_is_not_decoded(self):
+        for image in (self.recipe.image.url, image_data('red')):
+            with self.subTest(image=image[:30]):
+                with mock.patch.object(
+                    ContentHashImageField, 'decoder'
+                ) as decoder:
+                    response = self.patch({'image': image})
+                self.assertEqual(response.status_code, 200)
+                decoder.to_internal_value.assert_not_called()
+
+    def test_new_image_is_saved(self):
+        response = self.patch({'image': image_data('blue')})
+        self.assertEqual(response.status_code, 200)
+        old = self.recipe.image.name
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, old)
+
+    def test_partial_update_without_relations(self):
+        response = self.patch({'name': 'Оладьи'})
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Оладьи')
+        self.assertEqual(self.recipe.recipeingredient.count(), 2)
+
+    def test_empty_relations_are_rejected(self):
+        for data in ({'tags': []}, {'ingredients': []}, {'image': ''}):
+            with self.subTest(data=data):
+                self.assertEqual(self.patch(data).status_code, 400)
+
+    def test_ingredients_diff(self):
+        flour = ListIngredients.objects.get(
+            recipe=self.recipe, ingredient=self.flour
+        )
+        response = self.patch({'ingredients': [
+            {'id': self.flour.id, 'amount': 250},
+            {'id': self.eggs.id, 'amount': 2},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        rows = {
+            row.ingredient_id: row
+            for row in ListIngredients.objects.filter(recipe=self.recipe)
+        }
+        self.assertEqual(set(rows), {self.flour.id, self.eggs.id})
+        self.assertEqual(rows[self.flour.id].pk, flour.pk)
+        self.assertEqual(rows[self.flour.id].amount, 250)
+        self.assertEqual(rows[self.eggs.id].amount, 2)
@@ -0,0 +1,96 @@
+from api.models import Ingredients, ListIngredients, Recipes, Tags, Units
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import ListSubscriptions, User
+
+
+class SparseFieldsTest(TestCase):
+    """?fields= и ?expand= на чтении рецептов и пользователей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            'viewer@example.com', 'viewer', 'Имя', 'Фамилия', 'password'
+        )
+        cls.author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit=Units.objects.create(name='г')
+        )
+        cls.recipe = Recipes.objects.create(
+            name='Блины', text='Текст', cooking_time=10, author=cls.author,
+            image='recipes/image.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+        ListIngredients.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=100
+        )
+        ListSubscriptions.objects.create(
+            author=cls.viewer, subscription_on=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_recipe_relations_as_ids(self):
+        recipe = self.get(
+            '/api/recipes/',
+            fields='id,author,tags,ingredients,is_favorited,unknown',
+        )['results'][0]
+        self.assertEqual(recipe, {
+            'id': self.recipe.id,
+            'tags': [self.tag.id],
+            'author': self.author.id,
+            'ingredients': [{'id': self.ingredient.id, 'amount': 100}],
+            'is_favorited': False,
+        })
+
+    def test_recipe_expand(self):
+        recipe = self.get(
+            '/api/recipes/', fields='author,tags', expand='author,tags'
+        )['results'][0]
+        self.assertEqual(recipe['tags'][0]['slug'], 'breakfast')
+        self.assertEqual(recipe['author']['username'], 'author')
+        self.assertTrue(recipe['author']['is_subscribed'])
+
+    def test_without_fields_nothing_changes(self):
+        recipe = self.get('/api/recipes/', expand='author')['results'][0]
+        self.assertEqual(recipe['author']['id'], self.author.id)
+        self.assertIn('text', recipe)
+
+    def test_subscriptions(self):
+        author = self.get(
+            '/api/users/subscriptions/', fields='username,recipes'
+        )['results'][0]
+        self.assertEqual(
+            author, {'username': 'author', 'recipes': [self.recipe.id]}
+        )
+        author = self.get(
+            '/api/users/subscriptions/', fields='recipes', expand='recipes'
+        )['results'][0]
+        self.assertEqual(author['recipes'][0]['name'], 'Блины')
+
+    def test_me_profile_cache_keeps_full_payload(self):
+        token = Token.objects.create(user=self.viewer)
+        self.client.force_authenticate()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(
+            self.get('/api/users/me/', fields='id'), {'id': self.viewer.id}
+        )
+        self.assertIn('email', self.get('/api/users/me/'))
+        self.assertEqual(
+            self.get('/api/users/me/', fields='username'),
+            {'username': 'viewer'},
+        )
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from api.models import Recipes
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from users.models import User
+
+from foodgram.storage import content_storage
+
+
+class StorageTestMixin:
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def save(self, name, content):
+        return content_storage.save(name, ContentFile(content))
+
+    def age(self, name, seconds):
+        stamp = time.time() - seconds
+        os.utime(content_storage.path(name), (stamp, stamp))
+
+
+class ContentAddressedStorageTest(StorageTestMixin, TestCase):
+
+    def test_same_content_saved_once(self):
+        first = self.save('recipes/a.PNG', b'image')
+        second = self.save('recipes/b.png', b'image')
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith('.png'))
+        directory = os.path.dirname(content_storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_different_content_different_names(self):
+        self.assertNotEqual(
+            self.save('recipes/a.png', b'one'),
+            self.save('recipes/a.png', b'two'),
+        )
+
+    def test_resave_refreshes_mtime(self):
+        name = self.save('recipes/a.png', b'image')
+        self.age(name, 3600)
+        self.save('recipes/b.png', b'image')
+        self.assertGreater(
+            os.path.getmtime(content_storage.path(name)), time.time() - 60
+        )
+
+    def test_delete_keeps_shared_file(self):
+        name = self.save('recipes/a.png', b'image')
+        content_storage.delete(name)
+        self.assertTrue(content_storage.exists(name))
+        content_storage.purge(name)
+        self.assertFalse(content_storage.exists(name))
+
+
+class CollectOrphanMediaTest(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        self.referenced = self.save('recipes/images/a.png', b'referenced')
+        Recipes.objects.create(
+            name='Рецепт', text='Текст', cooking_time=10, author=author,
+            image=self.referenced,
+        )
+        self.orphan = self.save('recipes/images/a.png', b'orphan')
+        self.fresh = self.save('recipes/images/a.png', b'fresh')
+        self.age(self.referenced, 2 * 24 * 3600)
+        self.age(self.orphan, 2 * 24 * 3600)
+
+    def collect(self, *args):
+        call_command('collect_orphan_media', *args, stdout=StringIO())
+
+    def test_removes_old_unreferenced_files(self):
+        self.collect()
+        self.assertTrue(content_storage.exists(self.referenced))
+        self.assertTrue(content_storage.exists(self.fresh))
+        self.assertFalse(content_storage.exists(self.orphan))
+
+    def test_dry_run(self):
+        self.collect('--dry-run')
+        self.assertTrue(content_storage.exists(self.orphan))
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from api.changelog import collect_changes
+from api.models import ChangeLog, ListFavorite, Recipes
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class DeltaSyncTest(TestCase):
+    """GET /api/recipes/sync/?since=<курсор>."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        cls.other = User.objects.create_user(
+            'other@example.com', 'other', 'Имя', 'Фамилия', 'password'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def change(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = func(*args, **kwargs)
+        # Записи моложе SYNC_SETTLE_SECONDS синхронизация откладывает.
+        ChangeLog.objects.update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+        return result
+
+    def create_recipe(self, name):
+        return self.change(
+            Recipes.objects.create, name=name, text='Текст',
+            cooking_time=10, author=self.other, image='recipes/image.png',
+        )
+
+    def sync(self, since=None):
+        path = '/api/recipes/sync/'
+        if since is not None:
+            path += f'?since={since}'
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_without_cursor_requests_reset(self):
+        self.create_recipe('Блины')
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['cursor'], ChangeLog.objects.latest('id').id)
+
+    def test_changes_after_cursor(self):
+        kept = self.create_recipe('Блины')
+        removed = self.create_recipe('Оладьи')
+        removed_id = removed.id
+        cursor = self.sync()['cursor']
+        self.change(ListFavorite.objects.create, user=self.user, recipe=kept)
+        self.change(ListFavorite.objects.create, user=self.other, recipe=kept)
+        self.change(removed.delete)
+        added = self.create_recipe('Сырники')
+
+        data = self.sync(cursor)
+
+        self.assertFalse(data['reset'])
+        self.assertEqual(
+            [recipe['id'] for recipe in data['recipes']['changed']],
+            [added.id],
+        )
+        self.assertEqual(data['recipes']['deleted'], [removed_id])
+        self.assertEqual(
+            data['favorites'], {'added': [kept.id], 'removed': []}
+        )
+        self.assertEqual(self.sync(data['cursor'])['recipes'], {
+            'changed': [], 'deleted': [],
+        })
+
+    def test_removed_from_list(self):
+        recipe = self.create_recipe('Блины')
+        favorite = self.change(
+            ListFavorite.objects.create, user=self.user, recipe=recipe
+        )
+        cursor = self.sync()['cursor']
+        self.change(favorite.delete)
+        self.assertEqual(
+            self.sync(cursor)['favorites'],
+            {'added': [], 'removed': [recipe.id]},
+        )
+
+    def test_fresh_changes_wait(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipes.objects.create(
+                name='Блины', text='Текст', cooking_time=10,
+                author=self.other, image='recipes/image.png',
+            )
+        data = self.sync(cursor)
+        self.assertEqual(data['cursor'], cursor)
+        self.assertEqual(data['recipes']['changed'], [])
+
+    def test_batches(self):
+        for name in ('Блины', 'Оладьи', 'Сырники'):
+            self.create_recipe(name)
+        batch = collect_changes(0, self.user, limit=2)
+        self.assertTrue(batch['has_more'])
+        rest = collect_changes(batch['cursor'], self.user, limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(
+            len(batch['changes']['recipe'] | rest['changes']['recipe']), 3
+        )
+
+    def test_expired_cursor_requests_reset(self):
+        self.create_recipe('Блины')
+        self.create_recipe('Оладьи')
+        ChangeLog.objects.filter(
+            id=ChangeLog.objects.earliest('id').id
+        ).delete()
+        self.assertTrue(self.sync(0)['reset'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/sync/?since=-1')
+        self.assertEqual(response.status_code, 400)
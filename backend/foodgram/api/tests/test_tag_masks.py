@@ -0,0 +1,110 @@
+from api.constants import MAX_TAG_BITS
+from api.models import Recipes, Tags
+from api.tag_masks import (backfill_tag_bits, rebuild_tags_masks,
+                           sync_tags_mask, tag_bit)
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class TagMaskFilterTest(TestCase):
+    """Фильтры tags, tags_all и exclude_tags по битовой маске."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            'author@example.com', 'author', 'Имя', 'Фамилия', 'password'
+        )
+        cls.breakfast, cls.lunch, cls.dinner = (
+            Tags.objects.create(name=name, slug=slug)
+            for name, slug in (
+                ('Завтрак', 'breakfast'), ('Обед', 'lunch'),
+                ('Ужин', 'dinner'),
+            )
+        )
+        cls.recipes = {}
+        for name, tags in (
+            ('omelette', [cls.breakfast]),
+            ('soup', [cls.lunch, cls.dinner]),
+            ('porridge', [cls.breakfast, cls.lunch]),
+            ('plain', []),
+        ):
+            recipe = Recipes.objects.create(
+                name=name, text='Текст', cooking_time=10, author=author,
+                image='recipes/image.png',
+            )
+            recipe.tags.set(tags)
+            sync_tags_mask(recipe)
+            cls.recipes[name] = recipe
+
+    def names(self, query):
+        response = APIClient().get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['name'] for recipe in response.data['results'])
+
+    def test_any(self):
+        self.assertEqual(
+            self.names('tags=breakfast&tags=dinner'),
+            ['omelette', 'porridge', 'soup'],
+        )
+
+    def test_all(self):
+        self.assertEqual(
+            self.names('tags_all=breakfast&tags_all=lunch'), ['porridge']
+        )
+
+    def test_none(self):
+        self.assertEqual(
+            self.names('exclude_tags=breakfast'), ['plain', 'soup']
+        )
+
+    def test_unknown_slug_is_rejected(self):
+        response = APIClient().get('/api/recipes/?tags=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleted_tag_clears_its_bit(self):
+        bit = self.lunch.bit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lunch.delete()
+        for mask in Recipes.objects.values_list('tags_mask', flat=True):
+            self.assertFalse(mask & tag_bit(bit))
+
+    def test_rebuild_matches_relations(self):
+        Recipes.objects.update(tags_mask=0)
+        rebuild_tags_masks(Recipes.objects.all())
+        soup = Recipes.objects.get(pk=self.recipes['soup'].pk)
+        self.assertEqual(
+            soup.tags_mask, tag_bit(self.lunch.bit) | tag_bit(self.dinner.bit)
+        )
+
+
+class TagBitsTest(TestCase):
+
+    def test_bits_are_unique_and_reused(self):
+        first = Tags.objects.create(name='Первый', slug='first')
+        second = Tags.objects.create(name='Второй', slug='second')
+        self.assertNotEqual(first.bit, second.bit)
+        bit = first.bit
+        first.delete()
+        tag = Tags.objects.create(name='Новый', slug='new')
+        self.assertEqual(tag.bit, bit)
+
+    def test_limit(self):
+        Tags.objects.bulk_create(
+            Tags(name=f'Тег {bit}', slug=f'tag{bit}', bit=bit)
+            for bit in range(MAX_TAG_BITS)
+        )
+        with self.assertRaises(ValidationError):
+            Tags.objects.create(name='Лишний', slug='extra')
+
+    def test_backfill(self):
+        tag = Tags.objects.create(name='Тег', slug='tag')
+        Tags.objects.filter(pk=tag.pk).update(bit=None)
+        self.assertEqual(backfill_tag_bits(), 0)
+        tag.refresh_from_db()
+        self.assertIsNotNone(tag.bit)
+
+    def test_tag_without_bit(self):
+        with self.assertRaises(ValueError):
+            tag_bit(None)
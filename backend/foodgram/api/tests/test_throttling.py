@@ -0,0 +1,137 @@
+import shutil
+import tempfile
+
+from api import throttling
+from api.throttling import (CacheConcurrencyLimiter, FileConcurrencyLimiter,
+                            charge)
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+
+def admission_control(limiter, slots_dir=None):
+    return {
+        'BUCKETS': {},
+        'LIMITER': limiter,
+        'SLOTS_DIR': slots_dir,
+        'CONCURRENCY': {'ingredients.list': 2},
+        'QUEUE_TIMEOUT': 0.05,
+        'RETRY_AFTER': 3,
+    }
+
+
+class ConcurrencyLimitMixin:
+    """Слоты заняты запросами другого воркера: их держит свой limiter."""
+
+    def other_worker(self):
+        raise NotImplementedError
+
+    def test_over_limit_gets_429_with_retry_after(self):
+        other = self.other_worker()
+        slots = [other.try_acquire('ingredients.list', 2) for _ in range(2)]
+        self.assertNotIn(None, slots)
+
+        response = self.client.get('/api/ingredients/')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        for slot in slots:
+            other.release(slot)
+
+        response = self.client.get('/api/ingredients/')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_slot_released_after_response(self):
+        other = self.other_worker()
+        slot = other.try_acquire('ingredients.list', 2)
+        for _ in range(3):
+            self.assertEqual(
+                self.client.get('/api/ingredients/').status_code, 200
+            )
+        self.assertIsNotNone(other.try_acquire('ingredients.list', 2))
+        other.release(slot)
+
+
+class FileConcurrencyLimiterTest(ConcurrencyLimitMixin, TestCase):
+
+    def setUp(self):
+        self.slots_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.slots_dir)
+        settings = override_settings(ADMISSION_CONTROL=admission_control(
+            'api.throttling.FileConcurrencyLimiter', self.slots_dir
+        ))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Экземпляр с каталогом по умолчанию мог остаться от других тестов.
+        throttling._limiters.clear()
+        self.addCleanup(throttling._limiters.clear)
+
+    def other_worker(self):
+        return FileConcurrencyLimiter(self.slots_dir)
+
+
+class CacheConcurrencyLimiterTest(ConcurrencyLimitMixin, TestCase):
+
+    def setUp(self):
+        settings = override_settings(ADMISSION_CONTROL=admission_control(
+            'api.throttling.CacheConcurrencyLimiter'
+        ))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(cache.clear)
+
+    def other_worker(self):
+        return CacheConcurrencyLimiter()
+
+
+class ChargeTest(TestCase):
+
+    def test_rejected_request_spends_nothing(self):
+        buckets = [('user', 5, 1, 3), ('endpoint', 2, 1, 3)]
+
+        states, wait = charge({}, buckets, now=100)
+
+        self.assertEqual(wait, 1)
+        self.assertEqual(states, {'user': (5, 100), 'endpoint': (2, 100)})
+
+    def test_accepted_request_charges_every_bucket(self):
+        buckets = [('user', 5, 1, 2), ('endpoint', 10, 1, 2)]
+
+        states, wait = charge({'user': (1, 97)}, buckets, now=100)
+
+        self.assertEqual(wait, 0)
+        self.assertEqual(states, {'user': (2, 100), 'endpoint': (8, 100)})
+
+
+class ActionCostThrottleTest(TestCase):
+
+    def setUp(self):
+        settings = override_settings(ADMISSION_CONTROL={
+            'STORAGE': 'api.throttling.InMemoryBucketStorage',
+            'BUCKETS': {'ingredients.list': {
+                'USER': (2, 0.01), 'ENDPOINT': (100, 1),
+            }},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        throttling._storage = None
+        self.addCleanup(setattr, throttling, '_storage', None)
+
+    def test_budget_exhausted_gets_429(self):
+        for _ in range(2):
+            self.assertEqual(
+                self.client.get('/api/ingredients/').status_code, 200
+            )
+
+        response = self.client.get('/api/ingredients/')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+
+    def test_buckets_are_per_client(self):
+        for _ in range(2):
+            self.client.get('/api/ingredients/')
+        response = self.client.get(
+            '/api/ingredients/', REMOTE_ADDR='10.0.0.2'
+        )
+        self.assertEqual(response.status_code, 200)
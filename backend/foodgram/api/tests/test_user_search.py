@@ -0,0 +1,82 @@
+from api.user_search import NgramIndex, ngram_index, trigrams
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import ListSubscriptions, User
+
+
+class UserSearchTest(TestCase):
+    """GET /api/users/search/?q=..."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            username: User.objects.create_user(
+                f'{username}@example.com', username, first, last, 'password'
+            )
+            for username, first, last in (
+                ('ivanov', 'Иван', 'Иванов'),
+                ('ivan_chef', 'Иван', 'Поваров'),
+                ('petrov', 'Пётр', 'Петров'),
+                ('fan', 'Анна', 'Смирнова'),
+            )
+        }
+        ListSubscriptions.objects.create(
+            author=cls.users['fan'], subscription_on=cls.users['ivan_chef']
+        )
+
+    def setUp(self):
+        ngram_index.grams = None
+        self.addCleanup(setattr, ngram_index, 'grams', None)
+
+    def search(self, query, status=200):
+        response = APIClient().get('/api/users/search/', {'q': query})
+        self.assertEqual(response.status_code, status)
+        return response.data
+
+    def usernames(self, query):
+        return [user['username'] for user in self.search(query)]
+
+    def test_prefix_matches_ranked_by_followers(self):
+        self.assertEqual(self.usernames('Ivan'), ['ivan_chef', 'ivanov'])
+
+    def test_names_are_searched(self):
+        self.assertEqual(self.usernames('петр'), ['petrov'])
+
+    def test_typo(self):
+        self.assertIn('ivanov', self.usernames('ivanof'))
+
+    def test_short_query(self):
+        self.search('iv', status=400)
+
+    def test_limit(self):
+        response = APIClient().get(
+            '/api/users/search/', {'q': 'ivan', 'limit': 1}
+        )
+        self.assertEqual(len(response.data), 1)
+
+    def test_index_follows_user_changes(self):
+        self.usernames('ivan')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                'ivanova@example.com', 'ivanova', 'Мария', 'Иванова',
+                'password',
+            )
+            user = self.users['ivanov']
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.usernames('ivan'), ['ivan_chef', 'ivanova'])
+
+
+class NgramIndexTest(TestCase):
+
+    def test_trigrams_like_pg_trgm(self):
+        self.assertEqual(trigrams('Ab'), {'  a', ' ab', 'ab '})
+
+    def test_remove(self):
+        User.objects.create_user(
+            'user@example.com', 'user', 'Имя', 'Фамилия', 'password'
+        )
+        index = NgramIndex()
+        user_id = index.candidates('user', 10)[0][0]
+        index.remove(user_id)
+        self.assertEqual(index.candidates('user', 10), [])
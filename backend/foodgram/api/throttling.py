@@ -0,0 +1,304 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .cache import LocalTTLCache
+from .metrics import counter
+
+throttled_requests = counter(
+    'foodgram_throttled_requests_total',
+    'Запросы, отклонённые по бюджету или лимиту параллельности.',
+)
+queued_requests = counter(
+    'foodgram_queued_requests_total',
+    'Запросы, ожидавшие свободного слота тяжёлого действия.',
+)
+
+
+def get_scope(view):
+    return f'{getattr(view, "basename", None)}.{getattr(view, "action", None)}'
+
+
+def get_config():
+    return getattr(settings, 'ADMISSION_CONTROL', {})
+
+
+def refill(state, capacity, rate, now):
+    tokens, stamp = state or (capacity, now)
+    return min(capacity, tokens + (now - stamp) * rate)
+
+
+def charge(states, buckets, now):
+    """Списывает токены сразу со всех корзин или ни с одной.
+
+    ``buckets`` - кортежи (ключ, ёмкость, пополнение, стоимость). Возвращает
+    новые состояния корзин и ожидание в секундах (0, если списано).
+    Отклонённый запрос не тратит токены общей корзины действия.
+    """
+    tokens = {
+        key: refill(states.get(key), capacity, rate, now)
+        for key, capacity, rate, _ in buckets
+    }
+    waits = [
+        (cost - tokens[key]) / rate
+        for key, _, rate, cost in buckets if tokens[key] < cost
+    ]
+    if not waits:
+        for key, _, _, cost in buckets:
+            tokens[key] -= cost
+    return {key: (value, now) for key, value in tokens.items()}, max(
+        waits, default=0
+    )
+
+
+def idle_timeout(buckets):
+    """Через сколько секунд простоя корзины снова полны."""
+    return int(max(capacity / rate for _, capacity, rate, _ in buckets)) + 1
+
+
+class InMemoryBucketStorage:
+    """Хранилище token bucket в памяти процесса.
+
+    Корзины хранятся в LRU с временем жизни: ключ по пользователю или IP
+    исчезает после простоя, за который корзина всё равно бы наполнилась.
+    """
+
+    def __init__(self, max_size=100000, ttl=None, **options):
+        buckets = [
+            (None, capacity, rate, 0)
+            for config in get_config().get('BUCKETS', {}).values()
+            for capacity, rate in config.values()
+        ]
+        self.buckets = LocalTTLCache(
+            max_size, ttl or (idle_timeout(buckets) if buckets else 60)
+        )
+        self.lock = threading.Lock()
+
+    def consume(self, buckets, now):
+        """Списывает токены со всех корзин, возвращает ожидание или 0."""
+        with self.lock:
+            states, wait = charge(
+                {key: self.buckets.get(key) for key, *_ in buckets},
+                buckets, now,
+            )
+            for key, state in states.items():
+                self.buckets.set(key, state)
+        return wait
+
+
+class CacheBucketStorage:
+    """Хранилище token bucket в общем кеше Django.
+
+    Проверка и списание по всем корзинам действия идут под блокировкой
+    ``cache.add`` (атомарна в Redis и Memcached). Если блокировку не
+    удалось взять за LOCK_WAIT секунд, запрос пропускается без списания:
+    ограничитель нагрузки не должен сам становиться точкой отказа.
+    """
+
+    lock_timeout = 1
+    lock_wait = 0.05
+
+    def __init__(self, alias='default', **options):
+        self.cache = caches[alias]
+
+    @contextmanager
+    def locked(self, name):
+        key = f'throttle-lock:{name}'
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(key, 1, self.lock_timeout):
+            if time.monotonic() > deadline:
+                yield False
+                return
+            time.sleep(0.001)
+        try:
+            yield True
+        finally:
+            self.cache.delete(key)
+
+    def consume(self, buckets, now):
+        keys = {key: f'throttle:{key}' for key, *_ in buckets}
+        # Последний ключ - общая корзина действия, если она задана.
+        with self.locked(buckets[-1][0]) as acquired:
+            if not acquired:
+                return 0
+            stored = self.cache.get_many(list(keys.values()))
+            states, wait = charge(
+                {key: stored.get(name) for key, name in keys.items()},
+                buckets, now,
+            )
+            self.cache.set_many(
+                {keys[key]: state for key, state in states.items()},
+                idle_timeout(buckets),
+            )
+        return wait
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = import_string(get_config().get(
+            'STORAGE', 'api.throttling.InMemoryBucketStorage'
+        ))()
+    return _storage
+
+
+class ActionCostThrottle(BaseThrottle):
+    """Token bucket для действий viewset с учётом стоимости запроса.
+
+    Бюджеты задаются в ADMISSION_CONTROL['BUCKETS'] по ключу
+    ``<basename>.<action>``: ``USER`` - на пользователя (или IP),
+    ``ENDPOINT`` - общий на действие. Стоимость запроса возвращает
+    ``view.get_throttle_cost(request)``, по умолчанию 1.
+    """
+
+    def allow_request(self, request, view):
+        scope = get_scope(view)
+        buckets = get_config().get('BUCKETS', {}).get(scope)
+        if not buckets:
+            return True
+        get_cost = getattr(view, 'get_throttle_cost', None)
+        cost = get_cost(request) if get_cost else 1
+        user = request.user
+        ident = (
+            f'user:{user.pk}' if user and user.is_authenticated
+            else f'ip:{self.get_ident(request)}'
+        )
+        keys = {'USER': f'{scope}:{ident}', 'ENDPOINT': scope}
+        self.wait_seconds = get_storage().consume([
+            (key, *buckets[name], min(cost, buckets[name][0]))
+            for name, key in keys.items() if name in buckets
+        ], time.time())
+        if self.wait_seconds:
+            throttled_requests.inc(scope=scope, reason='budget')
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class FileConcurrencyLimiter:
+    """Слоты тяжёлых действий на хосте: flock на файлах слотов.
+
+    Все воркеры gunicorn хоста делят каталог SLOTS_DIR, поэтому лимит
+    действует на хост, а не на процесс. Блокировку снимает ядро при
+    закрытии файла или гибели процесса, так что слоты не утекают.
+    """
+
+    def __init__(self, directory=None, **options):
+        self.directory = directory or get_config().get('SLOTS_DIR') or (
+            os.path.join(tempfile.gettempdir(), 'foodgram-admission')
+        )
+        os.makedirs(self.directory, exist_ok=True)
+
+    def try_acquire(self, scope, limit):
+        """Занимает свободный слот, возвращает его или None."""
+        for slot in range(limit):
+            file = open(os.path.join(self.directory, f'{scope}.{slot}'), 'a')
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                continue
+            return file
+        return None
+
+    def release(self, slot):
+        slot.close()
+
+
+class CacheConcurrencyLimiter:
+    """Слоты тяжёлых действий в общем кеше Django - лимит на весь сервис.
+
+    Слот - ключ, занятый через ``cache.add`` (атомарна в Redis и
+    Memcached). Слот упавшего процесса освобождается через SLOT_TIMEOUT
+    секунд, поэтому он должен быть больше таймаута воркера.
+    """
+
+    def __init__(self, alias='default', **options):
+        self.cache = caches[alias]
+        self.timeout = get_config().get('SLOT_TIMEOUT', 60)
+
+    def try_acquire(self, scope, limit):
+        for slot in range(limit):
+            key = f'admission:{scope}:{slot}'
+            if self.cache.add(key, 1, self.timeout):
+                return key
+        return None
+
+    def release(self, slot):
+        self.cache.delete(slot)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter():
+    path = get_config().get(
+        'LIMITER', 'api.throttling.FileConcurrencyLimiter'
+    )
+    with _limiters_lock:
+        if path not in _limiters:
+            _limiters[path] = import_string(path)()
+        return _limiters[path]
+
+
+def acquire_slot(limiter, scope, limit, timeout):
+    """Ждёт свободный слот не дольше ``timeout`` секунд."""
+    deadline = time.monotonic() + timeout
+    while True:
+        slot = limiter.try_acquire(scope, limit)
+        if slot is not None or time.monotonic() >= deadline:
+            return slot
+        time.sleep(0.01)
+
+
+class AdmissionControlMixin:
+    """Ограничивает число одновременных тяжёлых действий.
+
+    Лимиты берутся из ADMISSION_CONTROL['CONCURRENCY'], слоты хранит
+    ADMISSION_CONTROL['LIMITER']: по умолчанию общий для всех воркеров
+    хоста, CacheConcurrencyLimiter - для всего сервиса. Запрос ждёт
+    свободный слот не дольше QUEUE_TIMEOUT, затем получает 429 с
+    заголовком Retry-After.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scope = get_scope(self)
+        config = get_config()
+        limit = config.get('CONCURRENCY', {}).get(scope)
+        if not limit:
+            return
+        limiter = get_limiter()
+        slot = limiter.try_acquire(scope, limit)
+        if slot is None:
+            queued_requests.inc(scope=scope)
+            slot = acquire_slot(
+                limiter, scope, limit, config.get('QUEUE_TIMEOUT', 0)
+            )
+            if slot is None:
+                throttled_requests.inc(scope=scope, reason='concurrency')
+                raise Throttled(wait=config.get('RETRY_AFTER', 1))
+        self.admission_slot = (limiter, slot)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        admission_slot = getattr(self, 'admission_slot', None)
+        if admission_slot is not None:
+            self.admission_slot = None
+            limiter, slot = admission_slot
+            limiter.release(slot)
+        return super().finalize_response(request, response, *args, **kwargs)
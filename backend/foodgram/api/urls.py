@@ -1,19 +1,26 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUsersViewSet, IngredientsViewSet, RecipesViewSet,
-                    TagsViewSet)
+from .views import (BatchView, CustomUsersViewSet, DjoserUsersViewSet,
+                    EventTicketView, IngredientsViewSet, MealPlanViewSet,
+                    RecipesViewSet, TagsViewSet)
 
 app_name = 'api'
 
 router_v1 = DefaultRouter()
 router_v1.register('users', CustomUsersViewSet, basename='users')
+# Маршруты djoser (регистрация, профиль, удаление) после своих действий.
+router_v1.register('users', DjoserUsersViewSet, basename='user')
 router_v1.register('tags', TagsViewSet, basename='tags')
 router_v1.register('ingredients', IngredientsViewSet, basename='ingredients')
 router_v1.register('recipes', RecipesViewSet, basename='recipes')
+router_v1.register('meal-plans', MealPlanViewSet, basename='meal-plans')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
+    path(
+        'events/ticket/', EventTicketView.as_view(), name='events-ticket'
+    ),
     path('', include(router_v1.urls)),
-    path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
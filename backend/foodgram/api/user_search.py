@@ -0,0 +1,181 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count
+from users.models import ListSubscriptions, User
+
+from .constants import (USER_SEARCH_CANDIDATES, USER_SEARCH_MIN_LENGTH,
+                        USER_SEARCH_SIMILARITY)
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+# То же выражение стоит в GIN-индексе, иначе PostgreSQL его не применит.
+SEARCH_EXPRESSION = (
+    "lower(username || ' ' || first_name || ' ' || last_name)"
+)
+INDEX_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS user_search_trgm_idx '
+    f'ON {{table}} USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS user_username_prefix_idx '
+    'ON {table} (lower(username) text_pattern_ops)',
+)
+CANDIDATES_SQL = f'''
+    SELECT id, {SEARCH_EXPRESSION} LIKE %(prefix)s
+        OR {SEARCH_EXPRESSION} LIKE %(word_prefix)s,
+        word_similarity(%(query)s, {SEARCH_EXPRESSION})
+    FROM {{table}}
+    WHERE is_active AND NOT is_hidden AND (
+        %(query)s <%% {SEARCH_EXPRESSION}
+        OR {SEARCH_EXPRESSION} LIKE %(prefix)s
+        OR {SEARCH_EXPRESSION} LIKE %(word_prefix)s
+        OR lower(username) LIKE %(prefix)s
+    )
+    ORDER BY 2 DESC, 3 DESC
+    LIMIT %(limit)s
+'''
+
+
+def escape_like(value):
+    return re.sub(r'([\\%_])', r'\\\1', value)
+
+
+def trigrams(text):
+    """Триграммы слов, как их считает pg_trgm."""
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def postgres_candidates(query, limit):
+    """Кандидаты по триграммному и префиксному индексам PostgreSQL."""
+    like = escape_like(query)
+    with connection.cursor() as cursor:
+        cursor.execute(CANDIDATES_SQL.format(table=User._meta.db_table), {
+            'query': query,
+            'prefix': like + '%',
+            'word_prefix': '% ' + like + '%',
+            'limit': limit,
+        })
+        return cursor.fetchall()
+
+
+class NgramIndex:
+    """Индекс триграмм и слов в памяти процесса для SQLite.
+
+    Строится при первом поиске. Изменённые пользователи (события USER на
+    шине) переиндексируются перед следующим поиском.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.grams = None
+        self.dirty = set()
+
+    def load(self):
+        self.grams, self.words, self.entries = {}, [], {}
+        # Список слов сортируется один раз: insort на каждой строке делал
+        # бы построение квадратичным.
+        self.add_rows(self.fetch(User.objects.all()), insert=False)
+        self.words.sort()
+
+    def fetch(self, queryset):
+        return queryset.filter(is_active=True).values_list(
+            'id', *SEARCH_FIELDS
+        ).iterator()
+
+    def add_rows(self, rows, insert=True):
+        for user_id, *values in rows:
+            text = ' '.join(values).lower()
+            grams = trigrams(text)
+            words = [(word, user_id) for word in set(text.split())]
+            self.entries[user_id] = (grams, words)
+            for gram in grams:
+                self.grams.setdefault(gram, set()).add(user_id)
+            if not insert:
+                self.words.extend(words)
+                continue
+            for word in words:
+                insort(self.words, word)
+
+    def remove(self, user_id):
+        grams, words = self.entries.pop(user_id, ((), ()))
+        for gram in grams:
+            self.grams[gram].discard(user_id)
+        for word in words:
+            position = bisect_left(self.words, word)
+            if position < len(self.words) and self.words[position] == word:
+                del self.words[position]
+
+    def invalidate(self, user_ids):
+        with self.lock:
+            self.dirty.update(user_ids)
+
+    def refresh(self):
+        if self.grams is None:
+            self.dirty.clear()
+            self.load()
+        elif self.dirty:
+            user_ids, self.dirty = self.dirty, set()
+            for user_id in user_ids:
+                self.remove(user_id)
+            self.add_rows(self.fetch(User.objects.filter(id__in=user_ids)))
+
+    def candidates(self, query, limit):
+        with self.lock:
+            self.refresh()
+            prefix = set()
+            position = bisect_left(self.words, (query, 0))
+            while (
+                position < len(self.words) and len(prefix) < limit
+                and self.words[position][0].startswith(query)
+            ):
+                prefix.add(self.words[position][1])
+                position += 1
+            query_grams = trigrams(query)
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self.grams.get(gram, ()))
+            rows = []
+            for user_id in prefix | shared.keys():
+                # Доля триграмм запроса, найденных в тексте, - близко к
+                # word_similarity из pg_trgm.
+                score = shared[user_id] / (len(query_grams) or 1)
+                if user_id in prefix or score >= USER_SEARCH_SIMILARITY:
+                    rows.append((user_id, user_id in prefix, score))
+        rows.sort(key=lambda row: (not row[1], -row[2]))
+        return rows[:limit]
+
+
+ngram_index = NgramIndex()
+
+
+def search_users(query, limit):
+    """Id найденных пользователей: префиксные совпадения, затем похожие.
+
+    Внутри группы выше те, у кого больше подписчиков. Подписчики считаются
+    одним GROUP BY только по кандидатам, общий COUNT(*) не нужен. Запросы
+    короче USER_SEARCH_MIN_LENGTH не ищутся: у них нет полной триграммы, и
+    индексы почти не сужают выборку.
+    """
+    query = query.strip().lower()
+    if len(query) < USER_SEARCH_MIN_LENGTH:
+        return []
+    if connection.vendor == 'postgresql':
+        rows = postgres_candidates(query, USER_SEARCH_CANDIDATES)
+    else:
+        rows = ngram_index.candidates(query, USER_SEARCH_CANDIDATES)
+    followers = dict(
+        ListSubscriptions.objects.filter(
+            subscription_on_id__in=[row[0] for row in rows]
+        ).values_list('subscription_on_id').annotate(count=Count('id'))
+        .order_by()
+    )
+    rows = sorted(rows, key=lambda row: (
+        not row[1], -followers.get(row[0], 0), -row[2], row[0]
+    ))
+    return [row[0] for row in rows[:limit]]
@@ -0,0 +1,46 @@
+import threading
+
+from .changelog import USER_LISTS
+
+
+class ViewerState:
+    """Избранное, список покупок и подписки зрителя на время пакета.
+
+    Под-запросы пакета спрашивают одни и те же рецепты и авторов: каждый
+    объект читается из базы один раз. После под-запроса на запись
+    состояние сбрасывается.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.known = {}
+        self.lock = threading.Lock()
+
+    def marked(self, model, object_ids):
+        _, user_field, object_field = USER_LISTS[model]
+        with self.lock:
+            known = self.known.setdefault(model, {})
+            missing = set(object_ids) - known.keys()
+        if missing:
+            present = set(model.objects.filter(**{
+                user_field: self.user.id, f'{object_field}__in': missing,
+            }).values_list(object_field, flat=True))
+            with self.lock:
+                known.update(
+                    (object_id, object_id in present) for object_id in missing
+                )
+        return {object_id for object_id in object_ids if known[object_id]}
+
+    def clear(self):
+        with self.lock:
+            self.known.clear()
+
+
+def marked_ids(request, model, object_ids):
+    """Объекты из списка ``model`` (USER_LISTS) текущего зрителя."""
+    if request is None or request.user.is_anonymous:
+        return set()
+    state = getattr(request, 'viewer_state', None)
+    if state is not None and state.user.pk == request.user.pk:
+        return state.marked(model, object_ids)
+    return ViewerState(request.user).marked(model, object_ids)
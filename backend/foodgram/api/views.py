@@ -1,28 +1,65 @@
-from django.db.models import Sum
 from django.http import HttpResponse
+from djoser.views import UserViewSet
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.models import ListSubscriptions
 
 from foodgram.settings import ALLOWED_HOSTS
 
+from .authentication import token_cache
+from .author_cards import author_cards, render_card
+from .batch import run_batch
+from .changelog import (SYNC_LISTS, collect_changes, is_expired, latest_cursor,
+                        user_list_state)
+from .conditional import make_etag, not_modified, recipe_stamps, set_validators
+from .constants import EVENTS_TICKET_SECONDS, RECIPES_PER_THROTTLE_COST
+from .deletion import schedule_deletion
+from .events import issue_ticket
+from .facets import get_facets
+from .fast_serializers import RecipesFastSerializer, recipe_rows
 from .filtres import NameFilter, RecipeFilter
-from .models import (Ingredients, ListFavorite, ListIngredients, Recipes,
+from .invalidation import RECIPE
+from .jobs import job_queue
+from .metrics import CONTENT_TYPE, render_metrics
+from .models import (Ingredients, ListFavorite, Recipes,
                      ShoppingCartIngredients, Tags, User)
 from .pagination import LimitNumber
 from .permissions import RecipePermissions
-from .serializers import (FavoriteSerializer, IngredientsSerializer,
-                          ListSubscriptionsSerialaizer,
-                          ListSubscriptionsSerialaizerGet, RecipesSerializer,
-                          RecipesSerializerGet,
-                          ShoppingCartIngredientsSerializer, TagsSerializer,
-                          UserAvatarSerializer, UserSerializer)
+from .profiling import ProfilingMixin
+from .serializers import (BatchSerializer, FavoriteSerializer,
+                          IngredientsSerializer, ListSubscriptionsSerialaizer,
+                          ListSubscriptionsSerialaizerGet, MealPlanSerializer,
+                          RecipesSerializer, RecipesSerializerGet,
+                          ShoppingCartIngredientsSerializer, SyncSerializer,
+                          TagsSerializer, UserAvatarSerializer,
+                          UserSearchSerializer, UserSerializer)
+from .shopping_list import (SHOPPING_LIST_JOB, build_printable, meal_plan_data,
+                            shopping_list_items)
+from .sparse import query_flag, sparse_params
+from .throttling import AdmissionControlMixin
+from .user_search import search_users
+from .viewer_state import marked_ids
 
 
-class CustomUsersViewSet(viewsets.GenericViewSet):
+class DjoserUsersViewSet(UserViewSet):
+    """Пользователи djoser; удаление - через фоновую очистку.
+
+    Проверка current_password и выход остаются как в djoser, но вместо
+    каскада в одной транзакции пользователь скрывается и ставится в
+    очередь run_deletions.
+    """
+
+    def perform_destroy(self, instance):
+        schedule_deletion(instance)
+
+
+class CustomUsersViewSet(
+    ProfilingMixin, AdmissionControlMixin, viewsets.GenericViewSet
+):
     """Управление пользователями."""
 
     queryset = User.objects.all()
@@ -30,6 +67,12 @@ class CustomUsersViewSet(viewsets.GenericViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
 
+    def get_throttle_cost(self, request):
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if self.action != 'subscriptions' or not recipes_limit.isdigit():
+            return 1
+        return 1 + int(recipes_limit) // RECIPES_PER_THROTTLE_COST
+
     @action(
         detail=False,
         methods=['GET'],
@@ -37,8 +80,37 @@ class CustomUsersViewSet(viewsets.GenericViewSet):
         url_path='me'
     )
     def me(self, request):
-        serializer = UserSerializer(request.user, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        key = getattr(request.auth, 'key', None)
+        host = request.get_host()
+        fields = sparse_params(request)[0]
+        data = key and token_cache.get_profile(key, host)
+        if not data:
+            data = UserSerializer(
+                request.user, context={"request": request}
+            ).data
+            # В кеше профиля только полный ответ.
+            if key and fields is None:
+                token_cache.set_profile(key, host, data)
+        if fields is not None:
+            data = {
+                name: value for name, value in data.items() if name in fields
+            }
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['GET'], url_path='search')
+    def search(self, request):
+        """Поиск по username, имени и фамилии без COUNT(*) и пагинации."""
+        params = UserSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        user_ids = search_users(
+            params.validated_data['q'], params.validated_data['limit']
+        )
+        cards = author_cards.get_cards(user_ids)
+        subscribed = marked_ids(request, ListSubscriptions, user_ids)
+        return Response([
+            render_card(cards[user_id], request, user_id in subscribed)
+            for user_id in user_ids if user_id in cards
+        ])
 
     @action(
         detail=False,
@@ -73,7 +145,7 @@ class CustomUsersViewSet(viewsets.GenericViewSet):
     )
     def subscribe(self, request, pk=None):
         author = request.user
-        subscription_on = get_object_or_404(User, id=pk)
+        subscription_on = get_object_or_404(self.get_queryset(), id=pk)
         sibscribe = ListSubscriptions.objects.filter(
             author=author.id,
             subscription_on=subscription_on.id
@@ -109,7 +181,7 @@ class CustomUsersViewSet(viewsets.GenericViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(ProfilingMixin, viewsets.ReadOnlyModelViewSet):
     """Класс получения тегов."""
 
     queryset = Tags.objects.all()
@@ -117,7 +189,9 @@ class TagsViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(
+    ProfilingMixin, AdmissionControlMixin, viewsets.ReadOnlyModelViewSet
+):
     """Класс получения списка и отдельного ингредиента."""
 
     queryset = Ingredients.objects.all()
@@ -126,7 +200,9 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(
+    ProfilingMixin, AdmissionControlMixin, viewsets.ModelViewSet
+):
     """Управление рецептами."""
 
     queryset = Recipes.objects.all()
@@ -134,11 +210,129 @@ class RecipesViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     permission_classes = [RecipePermissions]
 
+    def perform_destroy(self, instance):
+        schedule_deletion(instance)
+
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return RecipesSerializerGet
         return RecipesSerializer
 
+    def list(self, request, *args, **kwargs):
+        filtered = self.filter_queryset(self.get_queryset())
+        fields, expand = sparse_params(request)
+        stamps = recipe_stamps(filtered, request.user, fields, expand)
+        page = self.paginate_queryset(stamps)
+        stamps = list(stamps) if page is None else page
+        etag = make_etag(
+            request, None if page is None else self.paginator.count, stamps
+        )
+        with_facets = query_flag(request, 'facets') and page is not None
+        if not with_facets:
+            response = not_modified(request, etag)
+            if response is not None:
+                return set_validators(response, etag)
+        ids = [stamp[0] for stamp in stamps]
+        rows = {
+            row['id']: row for row in recipe_rows(
+                self.get_queryset().filter(pk__in=ids), fields
+            )
+        }
+        serializer = RecipesFastSerializer(
+            [rows[pk] for pk in ids if pk in rows],
+            many=True, context=self.get_serializer_context()
+        )
+        if page is None:
+            response = Response(serializer.data)
+        else:
+            response = self.get_paginated_response(serializer.data)
+        if with_facets:
+            response.data['facets'] = get_facets(filtered, request)
+            return response
+        return set_validators(response, etag)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        pagination_class=None,
+    )
+    def facets(self, request):
+        facets = get_facets(
+            self.filter_queryset(self.get_queryset()), request
+        )
+        if facets is None:
+            return Response(status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(facets)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        pagination_class=None,
+    )
+    def sync(self, request):
+        """Изменения после курсора ``since`` для мобильных клиентов.
+
+        Без курсора или с курсором старше очищенного журнала отдаёт только
+        текущий курсор и ``reset``: клиенту нужна полная загрузка.
+        """
+        params = SyncSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data.get('since')
+        if since is None or is_expired(since):
+            return Response({
+                'cursor': latest_cursor(), 'has_more': False, 'reset': True,
+            })
+        batch = collect_changes(since, request.user)
+        changes = batch['changes']
+        recipe_ids = changes.get(RECIPE, set())
+        rows = list(recipe_rows(
+            self.get_queryset().filter(pk__in=recipe_ids),
+            sparse_params(request)[0],
+        ))
+        data = {
+            'cursor': batch['cursor'],
+            'has_more': batch['has_more'],
+            'reset': False,
+            'recipes': {
+                'changed': RecipesFastSerializer(
+                    rows, many=True, context=self.get_serializer_context()
+                ).data,
+                'deleted': sorted(recipe_ids - {row['id'] for row in rows}),
+            },
+        }
+        for kind, name in SYNC_LISTS:
+            data[name] = user_list_state(
+                kind, request.user, changes.get(kind, set())
+            )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        filtered = self.filter_queryset(self.get_queryset())
+        fields, expand = sparse_params(request)
+        stamp = get_object_or_404(
+            recipe_stamps(filtered, request.user, fields, expand),
+            pk=kwargs['pk']
+        )
+        # Рецепт читается через .values(), поэтому права на объект
+        # проверяются на экземпляре из id и автора, до ответа 304.
+        self.check_object_permissions(
+            request, Recipes(id=stamp[0], author_id=stamp[3])
+        )
+        etag = make_etag(request, stamp)
+        # Для анонимов ответ зависит только от рецепта, и дату изменения
+        # можно отдавать как Last-Modified.
+        last_modified = stamp[2] if request.user.is_anonymous else None
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            row = get_object_or_404(
+                recipe_rows(self.get_queryset(), fields),
+                pk=kwargs['pk']
+            )
+            response = Response(RecipesFastSerializer(
+                row, context=self.get_serializer_context()
+            ).data)
+        return set_validators(response, etag, last_modified)
+
     @action(
         detail=False,
         methods=['GET'],
@@ -148,20 +342,14 @@ class RecipesViewSet(viewsets.ModelViewSet):
         user = request.user
         if not user.user_shopping.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        list_recipes = (
-            ListIngredients.objects.filter(
-                recipe__recipe_download__user=user
-            )
-            .values('ingredient__name', 'ingredient__measurement_unit__name')
-            .annotate(amount=Sum('amount'))
-        )
+        list_recipes = shopping_list_items(user.user_shopping.all())
         filename = f'{user.email}ingredients.txt'
         content = ''
         content += "\n".join(
             [
-                f'{ingredient["ingredient__name"]} -'
+                f'{ingredient["name"]} -'
                 f' {ingredient["amount"]}'
-                f' {ingredient["ingredient__measurement_unit__name"]}'
+                f' {ingredient["measurement_unit"]}'
                 for ingredient in list_recipes
             ]
         )
@@ -169,9 +357,50 @@ class RecipesViewSet(viewsets.ModelViewSet):
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=[IsAuthenticated],
+        url_path='download_shopping_cart/jobs',
+    )
+    def shopping_list_jobs(self, request):
+        if not request.user.user_shopping.filter(
+            recipe__is_hidden=False
+        ).exists():
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        job = job_queue.submit(
+            SHOPPING_LIST_JOB, request.user.id, build_printable,
+            request.user.id,
+        )
+        return Response(
+            self.job_data(request, job), status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        url_path=r'download_shopping_cart/jobs/(?P<job_id>[0-9a-f]+)',
+    )
+    def shopping_list_job(self, request, job_id):
+        job = job_queue.get(job_id)
+        if job is None or job['owner_id'] != request.user.id:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(self.job_data(request, job))
+
+    def job_data(self, request, job):
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'url': job['result'] and request.build_absolute_uri(
+                job['result']
+            ),
+            'error': job['error'],
+        }
+
     @action(
         detail=True,
-        methods=['POST', 'DELETE'],
+        methods=['POST', 'PATCH', 'DELETE'],
         permission_classes=[IsAuthenticated, ],
     )
     def shopping_cart(self, request, pk):
@@ -183,11 +412,23 @@ class RecipesViewSet(viewsets.ModelViewSet):
         )
         if request.method == 'POST':
             serializer = ShoppingCartIngredientsSerializer(
-                data={'user': user.id, 'recipe': recipe.id}
+                data={
+                    'user': user.id, 'recipe': recipe.id,
+                    'servings': request.data.get('servings', 1),
+                }
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if request.method == 'PATCH':
+            serializer = ShoppingCartIngredientsSerializer(
+                get_object_or_404(shopping_cart),
+                data={'servings': request.data.get('servings')},
+                partial=True,
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data)
         if shopping_cart.exists():
             shopping_cart.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -229,3 +470,55 @@ class RecipesViewSet(viewsets.ModelViewSet):
             {'short-link': f'https://{ALLOWED_HOSTS[0]}/api/recipes/{pk}/'},
             status=status.HTTP_200_OK
         )
+
+
+class MealPlanViewSet(ProfilingMixin, viewsets.ModelViewSet):
+    """Планы питания пользователя."""
+
+    serializer_class = MealPlanSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return self.request.user.meal_plans.prefetch_related('entries')
+
+    @action(detail=True, methods=['GET'])
+    def shopping_list(self, request, pk):
+        """Общий список покупок по всем рецептам плана с учётом порций."""
+        return Response(meal_plan_data(self.get_object()))
+
+
+class BatchView(ProfilingMixin, APIView):
+    """Несколько запросов к API за один round-trip.
+
+    Под-запросы выполняются в процессе с аутентификацией пакета, без
+    повторного прохода middleware. У каждого ответа свой статус.
+    """
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'responses': run_batch(
+            request, serializer.validated_data['requests'], type(self)
+        )})
+
+
+class EventTicketView(APIView):
+    """Одноразовый билет для EventSource на /api/events/?ticket=..."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        ticket = issue_ticket(request.user)
+        return Response(
+            {'ticket': ticket.key, 'expires_in': EVENTS_TICKET_SECONDS},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+def metrics_view(request):
+    """Метрики всех воркеров в текстовом формате Prometheus.
+
+    nginx не проксирует /metrics: их забирают напрямую с backend:8000.
+    """
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -4,4 +4,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Django и долгоживущий поток SSE /api/events/ мимо Django.
+
+    ASGI-обработчик Django 3.2 не умеет отдавать ответ частями, поэтому
+    события обслуживает отдельное приложение.
+    """
+    from api.events import EVENTS_PATH, sse_application
+
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await sse_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -32,6 +33,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.InvalidationMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -65,6 +67,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -99,11 +110,18 @@ LOGIN_URL = 'login'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ActionCostThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100
 }
@@ -124,3 +142,81 @@ DJOSER = {
 }
 
 AUTH_USER_MODEL = 'users.User'
+
+# Бюджеты: (ёмкость, пополнение в секунду), стоимость запроса - в токенах.
+ADMISSION_CONTROL = {
+    'STORAGE': os.getenv(
+        'THROTTLE_STORAGE', 'api.throttling.InMemoryBucketStorage'
+    ),
+    'BUCKETS': {
+        'recipes.download_shopping_cart': {'USER': (5, 0.1), 'ENDPOINT': (50, 5)},
+        'users.subscriptions': {'USER': (30, 1), 'ENDPOINT': (300, 30)},
+        'ingredients.list': {'USER': (60, 2), 'ENDPOINT': (600, 60)},
+    },
+    # Лимит одновременных запросов на хост (все воркеры gunicorn);
+    # api.throttling.CacheConcurrencyLimiter с Redis - на весь сервис.
+    'LIMITER': os.getenv(
+        'ADMISSION_LIMITER', 'api.throttling.FileConcurrencyLimiter'
+    ),
+    'SLOTS_DIR': os.getenv('ADMISSION_SLOTS_DIR') or None,
+    'CONCURRENCY': {
+        'recipes.download_shopping_cart': 4,
+        'users.subscriptions': 8,
+        'ingredients.list': 8,
+    },
+    'QUEUE_TIMEOUT': 0.5,
+    'RETRY_AFTER': 1,
+}
+
+# Кеш токенов: время жизни в памяти процесса и в общем кеше (секунды).
+TOKEN_CACHE = {
+    'LOCAL_TTL': 30,
+    'SHARED_TTL': 300,
+    'MAX_SIZE': 10000,
+    'SHARED_CACHE': os.getenv('TOKEN_SHARED_CACHE') or None,
+}
+
+# Фоновые задачи: потоки в процессе и время хранения статусов (секунды).
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_RESULT_TIMEOUT = 3600
+
+# Шина инвалидации. С несколькими процессами нужен
+# INVALIDATION_TRANSPORT=api.invalidation.PostgresTransport: иначе сбросы
+# карточек авторов и индекса поиска пользователей видит только процесс,
+# где изменились данные.
+INVALIDATION = {
+    'TRANSPORT': os.getenv(
+        'INVALIDATION_TRANSPORT', 'api.invalidation.LocalTransport'
+    ),
+}
+
+# Карточки авторов: статическая часть UserSerializer без is_subscribed.
+# SHARED_CACHE - только общий для процессов кеш (Redis, Memcached): сброс
+# удаляет запись из него, а LocMem у каждого процесса свой, и другие
+# воркеры отдавали бы старую карточку до SHARED_TTL.
+AUTHOR_CARDS = {
+    'LOCAL_TTL': 60,
+    'SHARED_TTL': 3600,
+    'MAX_SIZE': 20000,
+    'SHARED_CACHE': os.getenv('AUTHOR_CARDS_SHARED_CACHE') or None,
+}
+
+# Поиск дублей при создании рецепта: off, warn (создать и вернуть
+# possible_duplicates) или block (ошибка валидации).
+RECIPE_DEDUP = {
+    'MODE': os.getenv('RECIPE_DEDUP_MODE', 'warn'),
+    'THRESHOLD': float(os.getenv('RECIPE_DEDUP_THRESHOLD', 0.8)),
+}
+
+# SSE-события списков пользователя. Для нескольких процессов:
+# EVENTS_TRANSPORT=api.events.PostgresEventTransport.
+EVENTS = {
+    'TRANSPORT': os.getenv('EVENTS_TRANSPORT', 'api.events.LocalEventTransport'),
+}
+
+# Метрики /metrics. Под gunicorn с несколькими воркерами нужен общий
+# каталог для снимков воркеров; CMD образа очищает его перед запуском.
+METRICS = {
+    'MULTIPROCESS_DIR': os.getenv('METRICS_MULTIPROCESS_DIR') or None,
+    'FLUSH_INTERVAL': 5,
+}
@@ -0,0 +1,49 @@
+"""Настройки воркеров, которые обслуживают только /api/.
+
+Без админки, сессий, сообщений, статики и Browsable API: такие воркеры
+быстрее стартуют и не импортируют api/admin.py. Админку обслуживают
+воркеры с обычными настройками foodgram.settings.
+
+    DJANGO_SETTINGS_MODULE=foodgram.settings_api gunicorn foodgram.wsgi
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+API_ONLY_EXCLUDED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)
+API_ONLY_EXCLUDED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in API_ONLY_EXCLUDED_APPS
+]
+
+# Пользователя определяют классы аутентификации DRF, сессии не нужны.
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in API_ONLY_EXCLUDED_MIDDLEWARE
+]
+
+# Шаблоны нужны только для печатного списка покупок.
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {'context_processors': []},
+    },
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['api.renderers.FastJSONRenderer'],
+}
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_HASH_LENGTH = 64
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - SHA-256 его содержимого.
+
+    Одинаковые файлы сохраняются один раз: повторная загрузка получает то
+    же имя и не пишет на диск. Файл может быть общим для нескольких
+    записей, поэтому ``delete`` ничего не удаляет - файлы без ссылок
+    убирает команда collect_orphan_media через ``purge``. Повторное
+    сохранение обновляет mtime файла, а сборщик не трогает недавно
+    изменённые файлы.
+    """
+
+    def content_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+        dirname, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(dirname, digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Новая ссылка на старый файл: свежий mtime не даёт
+            # collect_orphan_media удалить его, если сборщик прочитал
+            # ссылки до коммита этой записи.
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+            else:
+                return name
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f'{full_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as file:
+            for chunk in content.chunks():
+                file.write(chunk)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        os.replace(tmp_path, full_path)
+        return name
+
+    def delete(self, name):
+        pass
+
+    def purge(self, name):
+        super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
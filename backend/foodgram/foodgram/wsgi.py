@@ -10,7 +10,13 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# URLconf со всеми views и сериализаторами загружается сразу, а не на первом
+# запросе. С gunicorn --preload это происходит один раз в мастер-процессе,
+# и новые воркеры после fork готовы к работе.
+get_resolver().url_patterns
@@ -3,6 +3,8 @@ from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
 from django.core.validators import RegexValidator, validate_email
 from django.db import models
 
+from foodgram.storage import content_storage
+
 from .constans import CHAR_MAX_LENGTH, EMAIL_MAX_LENGTH
 
 
@@ -61,6 +63,13 @@ class UserManager(BaseUserManager):
         )
 
 
+class VisibleUserManager(UserManager):
+    """Пользователи без скрытых: удалённые ждут фоновой очистки."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """Кастомная модель пользователя."""
 
@@ -91,17 +100,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     avatar = models.ImageField(
         blank=True,
         upload_to='users/images/',
+        storage=content_storage,
         null=True,
         default=None,
     )
     is_active = models.BooleanField(default=True, blank=True)
     is_staff = models.BooleanField(default=False, blank=True)
+    is_hidden = models.BooleanField(
+        'Скрыт до удаления', default=False, editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
-    objects = UserManager()
+    objects = VisibleUserManager()
+    # Менеджер по умолчанию видит всех: на нём вход и проверка
+    # уникальности email и username.
+    all_objects = UserManager()
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('username',)